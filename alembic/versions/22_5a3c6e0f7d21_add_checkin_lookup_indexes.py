@@ -0,0 +1,36 @@
+"""Add trigram indexes for the check-in desk lookup
+
+Revision ID: 5a3c6e0f7d21
+Revises: 4cb574d6501a
+Create Date: 2026-10-17 10:12:31.402871
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5a3c6e0f7d21'
+down_revision = '4cb574d6501a'
+
+from alembic import op
+import sqlalchemy as sa
+
+# The expressions match the ones Person.find_for_checkin() searches on,
+# so ILIKE 'q%' and '%@q%' can use them.
+indexes = [
+    ('person_lastname_trgm_idx', 'person', 'lastname'),
+    ('person_fullname_trgm_idx', 'person', "(firstname || ' ' || lastname)"),
+    ('person_email_address_trgm_idx', 'person', 'email_address'),
+    ('person_id_trgm_idx', 'person', 'CAST(id AS VARCHAR)'),
+    ('fulfilment_group_code_trgm_idx', 'fulfilment_group', 'code'),
+    ('fulfilment_code_trgm_idx', 'fulfilment', 'code'),
+]
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, expression in indexes:
+        op.execute("CREATE INDEX %s ON %s USING gin ((%s) gin_trgm_ops)" % (name, table, expression))
+
+
+def downgrade():
+    # The extension is left, something else may use it
+    for name, table, expression in indexes:
+        op.execute("DROP INDEX %s" % name)
@@ -0,0 +1,22 @@
+"""Add version to fulfilment
+
+Revision ID: 2f8e1b9c4a6d
+Revises: 5a3c6e0f7d21
+Create Date: 2026-10-17 11:02:48.118634
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2f8e1b9c4a6d'
+down_revision = '5a3c6e0f7d21'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('fulfilment', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    op.drop_column('fulfilment', 'version')
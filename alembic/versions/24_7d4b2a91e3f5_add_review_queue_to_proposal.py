@@ -0,0 +1,30 @@
+"""Add review_count and last_assigned to proposal for handing out reviews
+
+Revision ID: 7d4b2a91e3f5
+Revises: 2f8e1b9c4a6d
+Create Date: 2026-10-17 11:47:05.520913
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '7d4b2a91e3f5'
+down_revision = '2f8e1b9c4a6d'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('proposal', sa.Column('review_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('proposal', sa.Column('last_assigned', sa.DateTime(), nullable=True))
+    op.execute("""UPDATE proposal
+                  SET review_count = (SELECT count(*) FROM review WHERE review.proposal_id = proposal.id)""")
+    # In the order Proposal.find_next_proposal() wants them
+    op.execute("""CREATE INDEX proposal_review_queue_idx
+                  ON proposal (proposal_type_id, review_count, last_assigned NULLS FIRST, id)""")
+
+
+def downgrade():
+    op.execute("DROP INDEX proposal_review_queue_idx")
+    op.drop_column('proposal', 'last_assigned')
+    op.drop_column('proposal', 'review_count')
@@ -0,0 +1,45 @@
+"""Add proposal_review_stats and proposal_score_count for the review summary and reports
+
+Revision ID: 9c1e4f7a2b83
+Revises: 7d4b2a91e3f5
+Create Date: 2026-10-17 14:02:31.184207
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '9c1e4f7a2b83'
+down_revision = '7d4b2a91e3f5'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('proposal_review_stats',
+        sa.Column('proposal_id', sa.Integer(), sa.ForeignKey('proposal.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('reviews', sa.Integer(), nullable=False),
+        sa.Column('declined', sa.Integer(), nullable=False),
+        sa.Column('average', sa.Numeric(), nullable=True),
+        sa.Column('max_score', sa.Integer(), nullable=True),
+        sa.Column('min_score', sa.Integer(), nullable=True),
+    )
+    op.create_table('proposal_score_count',
+        sa.Column('proposal_id', sa.Integer(), sa.ForeignKey('proposal.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('score', sa.Integer(), primary_key=True),
+        sa.Column('reviewers', sa.Integer(), nullable=False),
+    )
+    # The same as ProposalReviewStats.refresh() of every proposal
+    op.execute("""INSERT INTO proposal_review_stats (proposal_id, reviews, declined, average, max_score, min_score)
+                  SELECT proposal_id, COUNT(score), COUNT(*) - COUNT(score), AVG(score), MAX(score), MIN(score)
+                  FROM review
+                  GROUP BY proposal_id""")
+    op.execute("""INSERT INTO proposal_score_count (proposal_id, score, reviewers)
+                  SELECT proposal_id, score, COUNT(*)
+                  FROM review
+                  WHERE score IS NOT NULL
+                  GROUP BY proposal_id, score""")
+
+
+def downgrade():
+    op.drop_table('proposal_score_count')
+    op.drop_table('proposal_review_stats')
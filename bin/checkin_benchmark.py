@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Benchmark the check-in desk lookup, Person.find_for_checkin().
+
+Replays recorded desk queries, one per line of the file given. Lines from
+a web server access log work too, the q= of each /checkin/lookup request
+is used and other requests are skipped. Each desk replays every query in its
+own thread, the way several desks type at once on opening morning:
+
+    python bin/checkin_benchmark.py --config production.ini --desks 4 queries.txt
+    python bin/checkin_benchmark.py --config production.ini --explain access.log
+
+--explain prints the query plan for the first query, to check the trigram
+indexes are being used.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import urlparse
+
+from pyramid.paster import get_app
+
+
+def read_queries(f):
+    queries = []
+    for line in f:
+        line = line.rstrip('\r\n')
+        if '/checkin/lookup' in line:
+            url = line.split('/checkin/lookup', 1)[1].split(' ', 1)[0]
+            q = urlparse.parse_qs(urlparse.urlparse(url).query).get('q')
+            if q:
+                queries.append(q[0].decode('utf-8'))
+        elif line and ' HTTP/' not in line:
+            # A query on its own, other requests in a log are skipped
+            queries.append(line.decode('utf-8'))
+    return queries
+
+
+def percentile(times, fraction):
+    return times[min(len(times) - 1, int(len(times) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the check-in desk lookup')
+    parser.add_argument('--config', default='development.ini', help='ini file of the site')
+    parser.add_argument('--desks', type=int, default=1, help='desks replaying the queries at once')
+    parser.add_argument('--repeat', type=int, default=1, help='times each desk replays the queries')
+    parser.add_argument('--explain', action='store_true', help='print the plan of the first query')
+    parser.add_argument('queries', type=argparse.FileType('r'), help='file of queries or access log')
+    args = parser.parse_args()
+
+    queries = read_queries(args.queries)
+    if not queries:
+        parser.error('no queries in %s' % args.queries.name)
+
+    # Sets up the config and database as the site has them
+    get_app(os.path.abspath(args.config), 'main')
+
+    from zkpylons.model import meta, Person
+
+    if args.explain:
+        compiled = Person.checkin_query(queries[0]).compile(dialect=meta.engine.dialect)
+        for (line,) in meta.engine.execute('EXPLAIN ANALYZE ' + str(compiled), compiled.params):
+            print line
+
+    times = []
+    lock = threading.Lock()
+    def desk():
+        mine = []
+        try:
+            for i in range(args.repeat):
+                for q in queries:
+                    start = time.time()
+                    Person.find_for_checkin(q)
+                    mine.append(time.time() - start)
+        finally:
+            meta.Session.remove()
+        with lock:
+            times.extend(mine)
+
+    start = time.time()
+    threads = [threading.Thread(target=desk) for i in range(args.desks)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    times.sort()
+    print "%d lookups by %d desks in %.2f s, %.0f lookups/s" % (len(times), args.desks, elapsed, len(times) / elapsed)
+    print "median %.1f ms, 95%% %.1f ms, 99%% %.1f ms, max %.1f ms" % (
+        percentile(times, 0.5) * 1000, percentile(times, 0.95) * 1000,
+        percentile(times, 0.99) * 1000, times[-1] * 1000)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
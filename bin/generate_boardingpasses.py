@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""Make the boarding pass PDF of every fulfilment group.
+
+Groups whose PDF is up to date are skipped, so this can be run again after
+changes, or after it was interrupted, and only does what is left:
+
+    python bin/generate_boardingpasses.py --config production.ini --processes 8
+
+The PDFs go in boardingpass/ at the top of the tree unless --output is
+given. See zkpylons/lib/boardingpass.py.
+"""
+import argparse
+import os
+import sys
+
+from pyramid.paster import get_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate boarding pass PDFs')
+    parser.add_argument('--config', default='development.ini', help='ini file of the site')
+    parser.add_argument('--output', help='directory for the PDFs')
+    parser.add_argument('--processes', type=int, help='PDFs made at once, by default one per CPU')
+    parser.add_argument('--force', action='store_true', help='make every PDF, even if up to date')
+    args = parser.parse_args()
+
+    # Sets up the config, templates and database as the site has them
+    get_app(os.path.abspath(args.config), 'main')
+
+    from zkpylons.lib.boardingpass import BoardingPassJob
+
+    def report(message):
+        print message
+        sys.stdout.flush()
+
+    job = BoardingPassJob(output_dir=args.output, processes=args.processes)
+    progress = job.run(force=args.force, report=report)
+    return 1 if progress.failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Benchmark the PDF renderers in zkpylons.lib.pdfgen.
+
+Renders the same document a number of times with each renderer, one at a
+time and then as a batch, and prints the time per document. By default the
+document is a made up page of text and boxes; give an SVG file, or an XML
+file and the XSL style sheet that turns it into SVG, to time a real one:
+
+    python bin/pdf_benchmark.py --count 20
+    python bin/pdf_benchmark.py --xml invoice.xml --xsl zkpylons/templates/invoice/pdf.xsl
+
+Renderers that can't run here, e.g. cairosvg when CairoSVG isn't
+installed, are skipped.
+"""
+import argparse
+import sys
+import time
+
+from lxml import etree
+
+from zkpylons.lib import pdfgen
+
+
+def sample_svg():
+    rows = []
+    for i in range(40):
+        y = 40 + i * 18
+        rows.append('<rect x="40" y="%d" width="515" height="16" fill="%s"/>' % (y, i % 2 and '#eeeeee' or '#ffffff'))
+        rows.append('<text x="44" y="%d" font-family="sans-serif" font-size="11">Line %d of the sample document</text>' % (y + 12, i))
+    return ('<?xml version="1.0"?>\n'
+            '<svg xmlns="http://www.w3.org/2000/svg" width="595" height="842">%s</svg>' % ''.join(rows))
+
+
+def timed(f, *args):
+    start = time.time()
+    result = f(*args)
+    return time.time() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the PDF renderers')
+    parser.add_argument('--count', type=int, default=10, help='documents to render with each renderer')
+    parser.add_argument('--svg', help='SVG file to render')
+    parser.add_argument('--xml', help='XML file to transform with --xsl and render')
+    parser.add_argument('--xsl', help='XSL style sheet for --xml')
+    parser.add_argument('--renderer', action='append', choices=sorted(pdfgen.renderers),
+                        help='only this renderer, may be given more than once')
+    args = parser.parse_args()
+
+    if args.xml:
+        if not args.xsl:
+            parser.error('--xml needs --xsl')
+        xml_s = open(args.xml).read()
+        elapsed, transform = timed(etree.XSLT, etree.parse(args.xsl))
+        print "compile XSLT        %8.1f ms" % (elapsed * 1000)
+        elapsed, svg = timed(lambda: [pdfgen.generate_svg(xml_s, args.xsl) for i in range(args.count)])
+        print "transform (cached)  %8.1f ms/doc" % (elapsed * 1000 / args.count)
+        svg = svg[0]
+    elif args.svg:
+        svg = open(args.svg).read()
+    else:
+        svg = sample_svg()
+
+    for name in args.renderer or sorted(pdfgen.renderers):
+        try:
+            renderer = pdfgen.renderers[name]()
+            # Start up and check it works before timing it
+            first, pdf_data = timed(renderer.render, svg)
+        except pdfgen.RendererError, e:
+            print "%-19s skipped: %s" % (name, e)
+            continue
+        try:
+            single, results = timed(lambda: [renderer.render(svg) for i in range(args.count)])
+            batch, results = timed(renderer.render_many, [svg] * args.count)
+        finally:
+            renderer.close()
+        print "%-19s %8.1f ms/doc one at a time, %8.1f ms/doc batched, first %.1f ms, %d bytes" % (
+            name, single * 1000 / args.count, batch * 1000 / args.count, first * 1000, len(pdf_data))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""Rebuild the photo competition index from the photo files.
+
+The index is kept up to date by uploads and deletes, and rebuilt
+automatically if it is missing or unreadable. Run this after changing the
+photo directory by hand, or if the index is suspected to be wrong:
+
+    python bin/photocomp_reindex.py --config production.ini
+"""
+import argparse
+import sys
+
+from ConfigParser import ConfigParser
+
+from sqlalchemy import create_engine
+
+from zkpylons.model import meta, init_model
+from zkpylons.lib.photocomp import PhotoCompEntry, PhotoCompIndex, get_open_date
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the photo competition index')
+    parser.add_argument('--config', default='development.ini', help='ini file to take sqlalchemy.url from')
+    parser.add_argument('--url', help='database url, overrides --config')
+    parser.add_argument('--path', help='photo directory, instead of the configured photocomp_path')
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        ini = ConfigParser()
+        ini.read(args.config)
+        url = ini.get('app:main', 'sqlalchemy.url')
+    init_model(create_engine(url))
+
+    db_dir = args.path or PhotoCompEntry.get_db_dir()
+    index = PhotoCompIndex(db_dir)
+    index.rebuild(get_open_date())
+    meta.Session.remove()
+
+    print "%s: %d entries" % (index.path, len(index))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
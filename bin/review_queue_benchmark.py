@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""Simulate reviewers working through the proposals, to time handing out
+reviews with Proposal.find_next_proposal() and see how evenly they spread.
+
+Made up proposals and reviewers are added to the database of the site in
+a transaction that is rolled back at the end, so use a development copy:
+
+    python bin/review_queue_benchmark.py --config development.ini --proposals 600 --reviewers 25
+
+Reviewers work in rounds. Each round they all ask for their next proposal
+before any of them submits a review, as happens when they work at the same
+time, then each reviews the proposal they were given. That is done with
+find_next_proposal() and with the query it replaced, which sorts every
+proposal of the type by its number of reviews each time, and the time per
+proposal handed out and the spread of reviews are printed for both.
+"""
+import argparse
+import os
+import sys
+import time
+
+import sqlalchemy as sa
+from pyramid.paster import get_app
+
+
+# The query Proposal.find_next_proposal() used to run
+OLD_QUERY = """
+      SELECT
+          p.id
+      FROM
+          (SELECT id
+           FROM proposal
+           WHERE id <> :id
+             AND status_id <> :withdrawn_id
+             AND proposal_type_id = :type_id
+           EXCEPT
+               SELECT proposal_id AS id
+               FROM review
+               WHERE review.reviewer_id = :reviewer_id) AS p
+      LEFT JOIN
+              review AS r
+                      ON(p.id=r.proposal_id)
+      GROUP BY
+              p.id
+      ORDER BY COUNT(r.reviewer_id), RANDOM()
+      LIMIT 1
+"""
+
+
+def simulate(name, next_proposal, reviewers, proposal_ids, rounds):
+    from zkpylons.model import meta, Review
+
+    savepoint = meta.Session.begin_nested()
+    times = []
+    shared = 0
+    current = dict((reviewer.id, proposal_ids[0]) for reviewer in reviewers)
+    for i in range(rounds):
+        given = []
+        for reviewer in reviewers:
+            start = time.time()
+            next_id = next_proposal(current[reviewer.id], reviewer.id)
+            times.append(time.time() - start)
+            if next_id is not None:
+                given.append((reviewer, next_id))
+        if not given:
+            break
+        shared += len(given) - len(set(next_id for (reviewer, next_id) in given))
+        for reviewer, next_id in given:
+            meta.Session.add(Review(proposal_id=next_id, reviewer_id=reviewer.id, score=1,
+                                    miniconf='', comment='simulated', private_comment=''))
+            current[reviewer.id] = next_id
+        meta.Session.flush()
+
+    counts = [count for (count,) in meta.Session.query(sa.func.count(Review.id))
+              .filter(Review.proposal_id.in_(proposal_ids)).group_by(Review.proposal_id)]
+    counts += [0] * (len(proposal_ids) - len(counts))
+    savepoint.rollback()
+
+    times.sort()
+    print "%-4s %7.2f ms median, %7.2f ms max per proposal handed out" % (
+        name, times[len(times) // 2] * 1000, times[-1] * 1000)
+    print "%-4s %d to %d reviews per proposal, %d given to another reviewer in the same round" % (
+        '', min(counts), max(counts), shared)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate handing out proposals to review')
+    parser.add_argument('--config', default='development.ini', help='ini file of the site')
+    parser.add_argument('--proposals', type=int, default=300, help='proposals to make up')
+    parser.add_argument('--reviewers', type=int, default=20, help='reviewers to make up')
+    parser.add_argument('--rounds', type=int, default=30, help='proposals each reviewer reviews')
+    args = parser.parse_args()
+
+    # Sets up the config and database as the site has them
+    get_app(os.path.abspath(args.config), 'main')
+
+    from zkpylons.model import meta, Person, Proposal, ProposalStatus, ProposalType
+    from zkpylons.model import TravelAssistanceType, AccommodationAssistanceType, TargetAudience
+
+    status = ProposalStatus.find_by_name('Pending Review') or ProposalStatus.find_all()[0]
+    withdrawn = ProposalStatus.find_by_name('Withdrawn')
+    proposal_type = ProposalType(name='Benchmark %d' % os.getpid())
+    travel = TravelAssistanceType.find_all()[0]
+    accommodation = AccommodationAssistanceType.find_all()[0]
+    audience = TargetAudience.find_all()[0]
+
+    proposals = [Proposal(title='Proposal %d' % i, abstract='', private_abstract='', technical_requirements='',
+                          project='', video_release=True, slides_release=True, type=proposal_type, status=status,
+                          travel_assistance=travel, accommodation_assistance=accommodation, audience=audience)
+                 for i in range(args.proposals)]
+    reviewers = [Person(email_address='reviewer%d.%d@benchmark.invalid' % (i, os.getpid()))
+                 for i in range(args.reviewers)]
+    meta.Session.add_all(proposals + reviewers)
+    meta.Session.flush()
+    proposal_ids = [p.id for p in proposals]
+
+    def old(id, reviewer_id):
+        row = meta.Session.execute(sa.text(OLD_QUERY), {'id': id, 'type_id': proposal_type.id,
+            'withdrawn_id': withdrawn.id, 'reviewer_id': reviewer_id}).first()
+        return row and row.id
+
+    def new(id, reviewer_id):
+        return Proposal.find_next_proposal(id, proposal_type.id, reviewer_id)
+
+    print "%d proposals, %d reviewers, %d rounds" % (args.proposals, args.reviewers, args.rounds)
+    try:
+        simulate('old', old, reviewers, proposal_ids, args.rounds)
+        simulate('new', new, reviewers, proposal_ids, args.rounds)
+    finally:
+        meta.Session.rollback()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""Load test for concurrent ticket reservations.
+
+Fires a burst of registrations at once against a Postgres database. Each one
+takes the same path as RegistrationController._create_invoice: lock the
+ceilings with StockLevels.lock(), check the products against the locked
+levels, add the invoice and commit. Afterwards it checks that no ceiling has
+more invoiced than its max_sold.
+
+Run from the top of the tree against a scratch database, by default the one
+in test.ini:
+
+    python bin/stock_load_test.py --registrations 500 --threads 50
+
+The rows it creates are deleted again afterwards unless --keep is given.
+"""
+import argparse
+import datetime
+import random
+import sys
+import threading
+import time
+import uuid
+
+from ConfigParser import ConfigParser
+
+from sqlalchemy import create_engine
+
+from zk.model import meta, init_model
+from zk.model import Person, ProductCategory, Product, Ceiling, Invoice, InvoiceItem, StockLevels
+
+
+def setup(tag, ceiling_sizes):
+    """Create a category with a product per ceiling, plus one product under
+    every ceiling, and return their ids."""
+    session = meta.Session
+    category = ProductCategory(name='loadtest %s' % tag, description='Stock load test', display='qty', display_order=0)
+    session.add(category)
+
+    ceilings = []
+    for i, size in enumerate(ceiling_sizes):
+        ceilings.append(Ceiling(name='loadtest %s %d' % (tag, i), max_sold=size))
+    session.add_all(ceilings)
+
+    products = []
+    for i, ceiling in enumerate(ceilings):
+        products.append(Product(category=category, description='loadtest %d' % i, cost=0, active=True, ceilings=[ceiling]))
+    # Selling this one uses up stock in every ceiling at once
+    products.append(Product(category=category, description='loadtest all', cost=0, active=True, ceilings=ceilings))
+    session.add_all(products)
+    session.commit()
+
+    return [c.id for c in ceilings], [p.id for p in products]
+
+
+def register(tag, n, product_ids, results):
+    """One registration, as RegistrationController._create_invoice does it."""
+    session = meta.Session
+    try:
+        wanted = random.sample(product_ids, random.randint(1, 2))
+        products = [Product.find_by_id(id) for id in wanted]
+        person = Person(email_address='loadtest-%s-%d@example.com' % (tag, n))
+        session.add(person)
+        session.flush()
+
+        levels = StockLevels.lock(products)
+        invoice = Invoice(person=person, manual=False, due_date=datetime.datetime.now() + datetime.timedelta(days=1))
+        for product in products:
+            qty = random.randint(1, 3)
+            if not product.available(True, qty, levels):
+                session.rollback()
+                results.append('unavailable')
+                return
+            levels.reserve(product, qty)
+            invoice.items.append(InvoiceItem(product=product, description=product.description, qty=qty, cost=product.cost))
+
+        session.add(invoice)
+        session.commit()
+        results.append('sold')
+    except Exception, e:
+        session.rollback()
+        results.append('error: %s' % e)
+    finally:
+        meta.Session.remove()
+
+
+def check(ceiling_ids):
+    levels = StockLevels.load()
+    ok = True
+    for ceiling in meta.Session.query(Ceiling).filter(Ceiling.id.in_(ceiling_ids)).order_by(Ceiling.id):
+        invoiced = levels.ceiling(ceiling.id).invoiced_all
+        print "%-30s max_sold %4d invoiced %4d" % (ceiling.name, ceiling.max_sold, invoiced)
+        if invoiced > ceiling.max_sold:
+            print "  OVERSOLD by %d" % (invoiced - ceiling.max_sold)
+            ok = False
+    return ok
+
+
+def cleanup(tag, ceiling_ids, product_ids):
+    session = meta.Session
+    people = session.query(Person).filter(Person.email_address.like('loadtest-%s-%%' % tag)).all()
+    for person in people:
+        session.delete(person) # invoices and their items cascade
+    session.flush()
+    for product in session.query(Product).filter(Product.id.in_(product_ids)):
+        category = product.category
+        session.delete(product)
+    session.flush()
+    session.delete(category)
+    for ceiling in session.query(Ceiling).filter(Ceiling.id.in_(ceiling_ids)):
+        session.delete(ceiling)
+    session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent ticket reservation load test')
+    parser.add_argument('--config', default='test.ini', help='ini file to take sqlalchemy.url from')
+    parser.add_argument('--url', help='database url, overrides --config')
+    parser.add_argument('--registrations', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=50)
+    parser.add_argument('--ceilings', type=int, nargs='+', default=[50, 20, 5], metavar='MAX_SOLD')
+    parser.add_argument('--keep', action='store_true', help="don't delete the test rows")
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        ini = ConfigParser()
+        ini.read(args.config)
+        url = ini.get('app:main', 'sqlalchemy.url')
+
+    engine = create_engine(url, pool_size=args.threads, max_overflow=0)
+    init_model(engine)
+
+    tag = uuid.uuid4().hex[:8]
+    ceiling_ids, product_ids = setup(tag, args.ceilings)
+    meta.Session.remove()
+
+    results = []
+    pending = range(args.registrations)
+    lock = threading.Lock()
+    start = threading.Event()
+
+    def worker():
+        start.wait()
+        while True:
+            with lock:
+                if not pending:
+                    return
+                n = pending.pop()
+            register(tag, n, product_ids, results)
+
+    threads = [threading.Thread(target=worker) for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    began = time.time()
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - began
+
+    print "%d registrations on %d threads in %.2fs" % (args.registrations, args.threads, elapsed)
+    for outcome in sorted(set(results)):
+        print "  %-20s %d" % (outcome, results.count(outcome))
+
+    ok = check(ceiling_ids)
+    ok = ok and not [r for r in results if r.startswith('error')]
+
+    if not args.keep:
+        cleanup(tag, ceiling_ids, product_ids)
+    meta.Session.remove()
+
+    print "PASS" if ok else "FAIL"
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,6 +11,7 @@ import proposal
 import person_proposal_map
 import attachment
 import review
+import review_stats
 import db_content
 import volunteer
 import voucher
@@ -18,6 +19,8 @@ import invoice
 import invoice_item
 import payment
 import ceiling
+import stock
+import sales
 import fulfilment
 import product
 import product_ceiling_map
@@ -43,6 +46,7 @@ from social_network import SocialNetwork
 from proposal import Proposal, ProposalStatus, ProposalType, TravelAssistanceType, AccommodationAssistanceType, TargetAudience
 from attachment import Attachment
 from review import Review, Stream
+from review_stats import ProposalReviewStats, ProposalScoreCount
 from travel import Travel
 from funding import Funding, FundingType, FundingStatus
 from funding_attachment import FundingAttachment
@@ -51,12 +55,14 @@ from funding_review import FundingReview
 from product import Product, ProductInclude
 from product_category import ProductCategory
 from ceiling import Ceiling
+from stock import StockLevels
 
 from payment_allocation import PaymentAllocation
 from invoice import Invoice
 from invoice_item import InvoiceItem
 from payment import Payment
 from payment_received import PaymentReceived
+from sales import SalesTimeseries
 
 from fulfilment import Fulfilment, FulfilmentItem, FulfilmentType, FulfilmentStatus, FulfilmentGroup
 
@@ -70,6 +76,7 @@ from event    import Event
 from event_type import EventType
 from time_slot import TimeSlot
 from schedule import Schedule
+from programme import Programme
 
 from voucher import Voucher, VoucherProduct
 from special_offer import SpecialOffer
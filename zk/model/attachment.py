@@ -18,7 +18,8 @@ class Attachment(Base):
     proposal_id =  sa.Column(sa.types.Integer, sa.ForeignKey('proposal.id'), nullable=False)
     filename = sa.Column(sa.types.Text, key='_filename', nullable=False, default='attachment')
     content_type = sa.Column(sa.types.Text, key='_content_type', nullable=False, default='application/octet-stream')
-    content = sa.Column(sa.types.Binary, nullable=False)
+    # Only loaded when used, see size
+    content = sa.orm.deferred(sa.Column(sa.types.Binary, nullable=False))
     creation_timestamp = sa.Column(sa.types.DateTime, nullable=False, default=sa.func.current_timestamp())
     last_creation_timestamp = sa.Column(sa.types.DateTime, nullable=False, default=sa.func.current_timestamp(), onupdate=sa.func.current_timestamp())
 
@@ -45,3 +46,5 @@ class Attachment(Base):
     def find_all(cls):
         return Session.query(Attachment).order_by(Attachment.id).all()
 
+# Length of the content in bytes, without loading it
+Attachment.size = sa.orm.column_property(sa.func.length(Attachment.__table__.c.content))
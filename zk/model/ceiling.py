@@ -4,7 +4,6 @@ import sqlalchemy as sa
 from meta import Base
 
 from pylons.controllers.util import abort
-from beaker.cache import CacheManager
 
 from role import Role
 from person_role_map import person_role_map
@@ -26,35 +25,27 @@ class Ceiling(Base):
     max_sold = sa.Column(sa.types.Integer, nullable=True)
     available_from = sa.Column(sa.types.DateTime, nullable=True)
     available_until = sa.Column(sa.types.DateTime, nullable=True)
-    cache = CacheManager()
 
     # relations
     parent = sa.orm.relation(lambda: Ceiling, backref='children', remote_side=[id])
 
-    def qty_sold(self):
-        qty = 0
-        for p in self.products:
-            qty += p.qty_sold()
-        return qty
+    def stock(self, levels=None):
+        """The StockLevel summed over this ceiling's products, taken from
+        ``levels`` or else StockLevels.current()."""
+        if levels is None:
+            from stock import StockLevels
+            levels = StockLevels.current()
+        return levels.ceiling(self.id)
 
-    def qty_invoiced(self, date=True):
-        # date: bool? only count items that are not overdue
-
-        @self.cache.cache(self.id, expire=600)
-        def cached(self, date=True):
-            qty = 0
+    def qty_sold(self, levels=None):
+        return self.stock(levels).sold
 
-            for p in self.products:
-                qty += p.qty_invoiced(date)
-            return qty
-
-        return cached(self, date)
+    def qty_invoiced(self, date=True, levels=None):
+        # date: bool? only count items that are not overdue
+        return self.stock(levels).qty_invoiced(date)
 
-    def qty_free(self):
-        qty = 0
-        for p in self.products:
-            qty += p.qty_free()
-        return qty
+    def qty_free(self, levels=None):
+        return self.stock(levels).free
 
     def percent_sold(self):
         if self.max_sold == None:
@@ -73,27 +64,27 @@ class Ceiling(Base):
     def remaining(self):
         return self.max_sold - self.qty_sold()
 
-    def soldout(self):
+    def soldout(self, levels=None):
         if self.max_sold != None:
-            return self.qty_invoiced() >= self.max_sold
+            return self.qty_invoiced(levels=levels) >= self.max_sold
         return False
 
-    def enough_left(self, qty):
+    def enough_left(self, qty, levels=None):
         if self.max_sold != None:
-            return (self.qty_invoiced() + qty) > self.max_sold
+            return (self.qty_invoiced(levels=levels) + qty) > self.max_sold
         return False
 
-    def available(self, stock=True, qty=0):
+    def available(self, stock=True, qty=0, levels=None):
         # bool stock: care about if the product is in stock (ie sold out?)
-        if stock and self.soldout():
+        if stock and self.soldout(levels):
             return False
-        elif qty > 0 and self.enough_left(qty):
+        elif qty > 0 and self.enough_left(qty, levels):
             return False
         elif self.available_from is not None and self.available_from >= datetime.datetime.now():
             return False
         elif self.available_until is not None and self.available_until <= datetime.datetime.now():
             return False
-        elif self.parent is not None and self.parent != self and self.parent.available():
+        elif self.parent is not None and self.parent != self and self.parent.available(levels=levels):
             return False
         else:
             return True
@@ -1,11 +1,20 @@
 """ Configuration key store, elements such as event_city or contact_email """
 import sqlalchemy as sa
+from sqlalchemy import event, orm
 from sqlalchemy.dialects.postgresql import JSON # Required - unsure why
 from meta import Session, Base
 
+from lib.cache import VersionedCache, mark_changed, invalidate_changed, forget_changed
+
+import copy
+import itertools
 import logging
 log = logging.getLogger(__name__)
 
+# Snapshot of the whole config table keyed by (category, key). Invalidated
+# whenever a commit touches a Config row, see _mark_changed below.
+config_cache = VersionedCache('config')
+
 class Config(Base):
     __tablename__ = 'config'
     category    = sa.Column(sa.types.String, primary_key=True)
@@ -18,16 +27,33 @@ class Config(Base):
 
     @classmethod
     def get(cls, key, category=default_category):
-        """ Get an entry from the config key store. """
+        """ Get an entry from the config key store.
+
+        Served from an in-memory snapshot of the table, which is reloaded
+        once any process commits a change to it.
+        """
 
-        fetch = Session.query(cls).get((category, key))
+        snapshot = config_cache.get('snapshot', cls._load_snapshot)
 
-        if (not fetch):
+        if (category, key) not in snapshot:
             log.warning("Config request for missing key: %s, %s", category, key)
+            # Missing entries are returned as an empty string
+            # This is the least obvious when directly exposed to the user
+            return ""
+
+        value = snapshot[(category, key)]
+        if isinstance(value, (dict, list)):
+            # Callers must not be able to alter the shared snapshot
+            value = copy.deepcopy(value)
+        return value
+
+    @classmethod
+    def preload(cls):
+        config_cache.get('snapshot', cls._load_snapshot)
 
-        # Missing entries are returned as an empty string
-        # This is the least obvious when directly exposed to the user
-        return fetch.value if fetch else ""
+    @classmethod
+    def _load_snapshot(cls):
+        return dict(((category, key), value) for category, key, value in Session.query(cls.category, cls.key, cls.value))
 
     @classmethod
     def find_all(cls):
@@ -40,3 +66,24 @@ class Config(Base):
     @classmethod
     def find_by_category(cls, category):
         return Session.query(cls).filter(cls.category == category).all()
+
+
+def _mark_changed(session, flush_context):
+    # Compare table names, zk.model and zkpylons.model each map their own
+    # Config class
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if getattr(obj, '__tablename__', None) == Config.__tablename__:
+            mark_changed(session, config_cache)
+            return
+
+def _invalidate_if_changed(session):
+    # Only once committed, otherwise another process could reload the old
+    # values and keep them under the new version
+    invalidate_changed(session, config_cache)
+
+def _forget_changes(session):
+    forget_changed(session, config_cache)
+
+event.listen(orm.Session, 'after_flush', _mark_changed)
+event.listen(orm.Session, 'after_commit', _invalidate_if_changed)
+event.listen(orm.Session, 'after_rollback', _forget_changes)
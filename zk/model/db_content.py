@@ -10,9 +10,15 @@ from person_role_map import person_role_map
 
 from meta import Session
 
+from lib.cache import VersionedCache
+
 import datetime
 import random
 
+# The news, press and banner items shown down the side of every page.
+# Entries expire so newly published items show up without an edit.
+sidebar_cache = VersionedCache('db_content_sidebar', expire=60)
+
 class DbContentType(Base):
     """Stores both account login details and personal information.
     """
@@ -122,3 +128,41 @@ class DbContent(Base):
     def find_all(cls):
         return Session.query(DbContent).order_by(DbContent.id).all()
 
+    @classmethod
+    def find_sidebar(cls):
+        """Returns the content shown down the side of every page as a dict
+        with 'news', 'news_all', 'press' and 'banner' lists. A key is missing
+        if the content type doesn't exist.
+
+        The lists are cached between requests, call invalidate_sidebar()
+        after changing content.
+        """
+        return sidebar_cache.get('sidebar', cls._load_sidebar)
+
+    @classmethod
+    def invalidate_sidebar(cls):
+        sidebar_cache.invalidate()
+
+    @classmethod
+    def _load_sidebar(cls):
+        types = dict((t.name, t.id) for t in Session.query(DbContentType).filter(DbContentType.name.in_(['News', 'In the press', 'Banner'])))
+        now = datetime.datetime.now()
+
+        def published(type_name):
+            return Session.query(DbContent).filter_by(type_id=types[type_name]).filter(DbContent.publish_timestamp <= now).order_by(DbContent.creation_timestamp.desc())
+
+        sidebar = {}
+        if 'News' in types:
+            sidebar['news_all'] = published('News').all() #use all to find featured items
+            sidebar['news'] = sidebar['news_all'][:4]
+        if 'In the press' in types:
+            sidebar['press'] = published('In the press').limit(4).all()
+        if 'Banner' in types:
+            sidebar['banner'] = published('Banner').limit(5).all()
+
+        # Detach the items so they outlive this request's session
+        for items in sidebar.values():
+            for item in items:
+                if item in Session:
+                    Session.expunge(item)
+        return sidebar
@@ -148,6 +148,10 @@ class Fulfilment(Base):
         default=sa.func.current_timestamp())
     last_modification_timestamp = sa.Column(sa.types.DateTime, nullable=False,
         default=sa.func.current_timestamp(), onupdate=sa.func.current_timestamp())
+    # Goes up with every update, which fails if it was changed since it was loaded
+    version = sa.Column(sa.types.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
     # mapped attributes
     is_void = sa.orm.column_property(
@@ -185,6 +189,13 @@ class Fulfilment(Base):
             abort(404, "No such fulfilment object")
         return result
 
+    @classmethod
+    def find_by_ids(cls, id_list):
+        """The fulfilments with their items, in one query"""
+        if not id_list:
+            return []
+        return Session.query(cls).filter(cls.id.in_(id_list)).options(sa.orm.joinedload('items')).all()
+
     @classmethod
     def find_all(cls):
         return Session.query(cls).order_by(cls.id).all()
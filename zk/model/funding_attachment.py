@@ -19,7 +19,8 @@ class FundingAttachment(Base):
     filename = sa.Column(sa.types.Text, key='_filename', nullable=False, default='attachment')
     content_type = sa.Column(sa.types.Text, key='_content_type', nullable=False, default='application/octet-stream')
 
-    content = sa.Column(sa.types.Binary, nullable=False)
+    # Only loaded when used, see size
+    content = sa.orm.deferred(sa.Column(sa.types.Binary, nullable=False))
 
     creation_timestamp = sa.Column(sa.types.DateTime, nullable=False, default=sa.func.current_timestamp())
     last_creation_timestamp = sa.Column(sa.types.DateTime, nullable=False, default=sa.func.current_timestamp(), onupdate=sa.func.current_timestamp())
@@ -46,3 +47,5 @@ class FundingAttachment(Base):
     def find_all(cls):
         return Session.query(FundingAttachment).order_by(FundingAttachment.id).all()
 
+# Length of the content in bytes, without loading it
+FundingAttachment.size = sa.orm.column_property(sa.func.length(FundingAttachment.__table__.c.content))
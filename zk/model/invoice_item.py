@@ -36,3 +36,22 @@ class InvoiceItem(Base):
 
     def __repr__(self):
         return '<InvoiceItem id=%r description=%r qty=%r cost=%r>' % (self.id, self.description, self.qty, self.cost)
+
+    @classmethod
+    def find_paid_by_people(cls, person_ids):
+        """The items of the paid, non-void invoices of the people in one
+        query, as a dict of lists keyed by person id"""
+        from invoice import Invoice
+
+        items = dict((id, []) for id in person_ids)
+        if not items:
+            return items
+        query = (Session.query(Invoice.person_id, cls)
+            .join(cls, cls.invoice_id == Invoice.id)
+            .filter(Invoice.person_id.in_(items.keys()))
+            .filter(Invoice.is_paid)
+            .filter(sa.not_(Invoice.is_void))
+            .order_by(Invoice.id, cls.id))
+        for person_id, item in query:
+            items[person_id].append(item)
+        return items
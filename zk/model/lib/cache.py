@@ -0,0 +1,116 @@
+"""Process local caches that can be invalidated across processes.
+
+Every cache is tied to a named version kept as a small file under the Pylons
+``cache_dir``. Bumping the version after committing a change replaces the
+file, and each worker notices on its next lookup at the cost of a stat()
+call. Without a ``cache_dir`` (e.g. in the model tests) the version is only
+tracked within the process.
+"""
+import os
+import tempfile
+import time
+
+from pylons import config
+
+
+class SharedVersion(object):
+    """A version counter visible to every process sharing ``cache_dir``."""
+
+    def __init__(self, name):
+        self.name = name
+        self._local = 0
+
+    def _path(self):
+        cache_dir = config.get('cache_dir')
+        if not cache_dir:
+            return None
+        return os.path.join(cache_dir, 'versions', self.name)
+
+    def current(self):
+        path = self._path()
+        if path is None:
+            return (self._local,)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return (self._local, None)
+        return (self._local, st.st_ino, st.st_mtime)
+
+    def bump(self):
+        self._local += 1
+        path = self._path()
+        if path is None:
+            return
+
+        dirname = os.path.dirname(path)
+        try:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            # Write then rename so the file is replaced atomically and
+            # always gets a new inode, even within the mtime granularity
+            fd, tmp = tempfile.mkstemp(dir=dirname, prefix='.' + self.name)
+            os.write(fd, repr(time.time()))
+            os.close(fd)
+            os.rename(tmp, path)
+        except OSError:
+            # The local version has still changed, other processes will
+            # catch up when their entries expire
+            pass
+
+
+class VersionedCache(object):
+    """Values computed on demand and kept until the named version changes or
+    they are older than ``expire`` seconds (never, if ``None``).
+
+    Values are shared between requests, so anything cached must not depend
+    on a database session, expunge ORM objects before returning them.
+    """
+
+    def __init__(self, name, expire=None):
+        self.version = SharedVersion(name)
+        self.expire = expire
+        self._values = {}
+
+    def get(self, key, createfunc):
+        version = self.version.current()
+        now = time.time()
+
+        entry = self._values.get(key)
+        if entry is not None:
+            value, entry_version, created = entry
+            if entry_version == version and (self.expire is None or now - created < self.expire):
+                return value
+
+        value = createfunc()
+        self._values[key] = (value, version, now)
+        return value
+
+    def invalidate(self):
+        self._values = {}
+        self.version.bump()
+
+
+# Caches to invalidate once a session commits, flagged by the after_flush
+# listeners of the models they cache. zk.model and zkpylons.model are two
+# copies of the same modules, each registering its own listeners on every
+# Session with its own caches, so each cache has its own flag.
+
+def mark_changed(session, *caches):
+    """Flag the caches to be invalidated when the session commits"""
+    session.info.setdefault('changed_caches', set()).update(caches)
+
+def is_changed(session, cache):
+    return cache in session.info.get('changed_caches', ())
+
+def invalidate_changed(session, *caches):
+    """Invalidate those of the caches flagged in the session"""
+    changed = session.info.get('changed_caches')
+    for cache in caches:
+        if changed and cache in changed:
+            changed.discard(cache)
+            cache.invalidate()
+
+def forget_changed(session, *caches):
+    changed = session.info.get('changed_caches')
+    if changed:
+        changed.difference_update(caches)
@@ -16,6 +16,7 @@ from special_registration import SpecialRegistration
 
 import binascii
 import datetime
+import json
 import hashlib
 import random
 import os
@@ -140,23 +141,35 @@ class Person(Base):
         return False
 
     def is_speaker(self):
+        status = self._status()
+        if status is not None:
+            return status.speaker
         # Check is they have the 'copresenter' role, this means they are not a 'real' speaker
         if self.has_role("copresenter"): return False
         return reduce(lambda a, b: a or (b.accepted and b.type.name != 'Miniconf'), self.proposals, False) or False
         # note: the "or False" at the end converts a None into a False
 
     def is_miniconf_org(self):
+        status = self._status()
+        if status is not None:
+            return status.miniconf_org
         return reduce(lambda a, b: a or (b.accepted and b.type.name == 'Miniconf'), self.proposals, False) or False
         # note: the "or False" at the end converts a None into a False
 
     def has_role(self, name):
         name = name.lower()
+        # Roles that don't exist can be ruled out without loading self.roles
+        if not Role.exists(name):
+            return False
         for role in self.roles:
           if role.name.lower() == name:
             return True
         return False
 
     def is_volunteer(self):
+        status = self._status()
+        if status is not None:
+            return status.volunteer
         if self.volunteer and self.volunteer.accepted is not None:
             return self.volunteer.accepted
         return False
@@ -195,12 +208,18 @@ class Person(Base):
         return None
 
     def has_valid_invoice(self):
+        status = self._status()
+        if status is not None:
+            return status.valid_invoice
         for invoice in self.invoices:
             if not invoice.is_void:
                 return True
         return False
 
     def has_paid_ticket(self):
+        status = self._status()
+        if status is not None:
+            return status.paid_ticket
         for invoice in self.invoices:
             if invoice.is_paid and not invoice.is_void:
                 for item in invoice.items:
@@ -209,6 +228,9 @@ class Person(Base):
         return False
 
     def ticket_type(self):
+        status = self._status()
+        if status is not None:
+            return status.ticket_type
         for invoice in self.invoices:
             if not invoice.is_void:
                 for item in invoice.items:
@@ -220,6 +242,9 @@ class Person(Base):
                         return str
 
     def paid(self):
+        status = self._status()
+        if status is not None:
+            return status.paid
         status = False
         for invoice in self.invoices:
             if not invoice.is_void:
@@ -229,6 +254,26 @@ class Person(Base):
                     return False
         return status
 
+    def _status(self):
+        """The PersonStatus attached by load_status(), if any"""
+        return getattr(self, '_person_status', None)
+
+    @classmethod
+    def load_status(cls, people):
+        """Work out is_speaker(), is_miniconf_org(), is_volunteer(),
+        has_valid_invoice(), has_paid_ticket(), ticket_type() and paid() for
+        all of the people at once and attach the results to them.
+
+        Takes a constant number of queries however many people there are,
+        use it before looping over many people calling those methods. The
+        results are a snapshot, they don't follow later changes made to
+        those people in the same request. Returns the people.
+        """
+        statuses = PersonStatus.load([person.id for person in people])
+        for person in people:
+            person._person_status = statuses[person.id]
+        return people
+
     def fetch_social_networks(self):
         self.social_network = dict()
 
@@ -267,6 +312,65 @@ class Person(Base):
             abort(404, "No such person object")
         return result
 
+    @classmethod
+    def find_for_checkin(cls, q, limit=5):
+        """(id, description) of the first people, in order of description,
+        whose name, email, id, boarding pass or badge code starts with q"""
+        return Session.execute(cls.checkin_query(q, limit)).fetchall()
+
+    @classmethod
+    def checkin_query(cls, q, limit=5):
+        """The select behind find_for_checkin().
+
+        Each kind of match is limited on its own before they are combined,
+        so every part can be answered from the trigram indexes added in
+        alembic revision 5a3c6e0f7d21 without sorting all the matches.
+        """
+        from fulfilment import Fulfilment, FulfilmentGroup
+
+        id_text = sa.cast(cls.id, sa.String)
+        parts = [
+            sa.select([cls.id.label('id'), sa.func.concat(cls.fullname, " - ", cls.email_address).label('pretty')])
+                .where(sa.or_(
+                    cls.lastname.ilike(q + '%'),
+                    cls.fullname.ilike(q + '%'),
+                    cls.email_address.ilike(q + '%'),
+                    cls.email_address.ilike('%@' + q + '%'))),
+            sa.select([cls.id.label('id'), sa.func.concat(FulfilmentGroup.code, " - ", cls.fullname).label('pretty')])
+                .where(FulfilmentGroup.person_id == cls.id)
+                .where(FulfilmentGroup.code.ilike(q + '%')),
+            sa.select([cls.id.label('id'), sa.func.concat(Fulfilment.code, " - ", cls.fullname).label('pretty')])
+                .where(Fulfilment.person_id == cls.id)
+                .where(Fulfilment.code.ilike(q + '%')),
+        ]
+        # Only digits can match an id
+        if q.isdigit():
+            parts.append(sa.select([cls.id.label('id'), sa.func.concat(id_text, " - ", cls.fullname).label('pretty')])
+                .where(id_text.like(q + '%')))
+
+        parts = [p.order_by('pretty').limit(limit).alias() for p in parts]
+        union = sa.union(*[sa.select([p.c.id, p.c.pretty]) for p in parts]).alias()
+        return sa.select([union.c.id, union.c.pretty]).order_by(union.c.pretty).limit(limit)
+
+    _checkin_data_sql = None
+
+    @classmethod
+    def checkin_data(cls, person_ids):
+        """What the rego desk shows of each person: every column of the
+        person but the password and url hashes, with their rego notes and their fulfilments and fulfilment
+        items, in one query. Returns a dict keyed by person id."""
+        if not person_ids:
+            return {}
+        if cls._checkin_data_sql is None:
+            cls._checkin_data_sql = sa.text(_checkin_data_sql())
+        result = {}
+        for person_id, data in Session.execute(cls._checkin_data_sql, {'ids': list(person_ids)}):
+            # Older psycopg2 doesn't decode json itself
+            if isinstance(data, basestring):
+                data = json.loads(data)
+            result[person_id] = data
+        return result
+
     def avatar_url(self):
         return libravatar_url(email=self.email_address, https=True, default='mm')
 
@@ -274,3 +378,135 @@ class Person(Base):
     def find_review_summary(cls):
         from review import Review
         return Review.stats_query().join(cls).add_entity(cls).group_by(cls)
+
+
+class PersonStatus(object):
+    """The status flags of one person, as worked out by the Person methods
+    of the same names."""
+    def __init__(self):
+        self.speaker = False
+        self.miniconf_org = False
+        self.volunteer = False
+        self.valid_invoice = False
+        self.paid_ticket = False
+        self.ticket_type = None
+        self.paid = False
+
+    @classmethod
+    def load(cls, person_ids):
+        """Returns a dict of PersonStatus keyed by person id"""
+        from proposal import Proposal, ProposalStatus, ProposalType
+        from person_proposal_map import person_proposal_map
+        from volunteer import Volunteer
+        from invoice import Invoice
+        from invoice_item import InvoiceItem
+        from product import Product
+        from product_category import ProductCategory
+
+        statuses = dict((id, cls()) for id in person_ids)
+        if not statuses:
+            return statuses
+        ids = statuses.keys()
+
+        copresenters = set(person_id for (person_id,) in Session.query(person_role_map.c.person_id)
+            .join(Role, Role.id == person_role_map.c.role_id)
+            .filter(sa.func.lower(Role.name) == 'copresenter')
+            .filter(person_role_map.c.person_id.in_(ids)))
+
+        accepted = (Session.query(person_proposal_map.c.person_id, ProposalType.name)
+            .join(Proposal, Proposal.id == person_proposal_map.c.proposal_id)
+            .join(ProposalStatus, ProposalStatus.id == Proposal.status_id)
+            .join(ProposalType, ProposalType.id == Proposal.proposal_type_id)
+            .filter(ProposalStatus.name == 'Accepted')
+            .filter(person_proposal_map.c.person_id.in_(ids))
+            .distinct())
+        for person_id, type_name in accepted:
+            if type_name == 'Miniconf':
+                statuses[person_id].miniconf_org = True
+            elif person_id not in copresenters:
+                statuses[person_id].speaker = True
+
+        for person_id, volunteer_accepted in Session.query(Volunteer.person_id, Volunteer.accepted).filter(Volunteer.person_id.in_(ids)):
+            statuses[person_id].volunteer = volunteer_accepted or False
+
+        # Unpaid invoices make paid() False whatever else the person has
+        unpaid = set()
+        invoices = {}
+        for invoice_id, person_id, is_void, is_paid in (Session.query(Invoice.id, Invoice.person_id, Invoice.is_void, Invoice.is_paid)
+                .filter(Invoice.person_id.in_(ids)).order_by(Invoice.id)):
+            if is_void:
+                continue
+            status = statuses[person_id]
+            status.valid_invoice = True
+            invoices[invoice_id] = (status, is_paid)
+            if is_paid:
+                status.paid = True
+            else:
+                unpaid.add(person_id)
+        for person_id in unpaid:
+            statuses[person_id].paid = False
+
+        tickets = (Session.query(InvoiceItem.invoice_id, InvoiceItem.description)
+            .join(Invoice, Invoice.id == InvoiceItem.invoice_id)
+            .join(Product, Product.id == InvoiceItem.product_id)
+            .join(ProductCategory, ProductCategory.id == Product.category_id)
+            .filter(ProductCategory.name == 'Ticket')
+            .filter(Invoice.person_id.in_(ids))
+            .order_by(InvoiceItem.invoice_id, InvoiceItem.id))
+        for invoice_id, description in tickets:
+            if invoice_id not in invoices:
+                continue
+            status, is_paid = invoices[invoice_id]
+            if is_paid:
+                status.paid_ticket = True
+            if status.ticket_type is None:
+                # Strip off any mention of "Ticket".
+                status.ticket_type = description.replace('Ticket - ', '').replace(' Ticket', '')
+
+        return statuses
+
+
+def _json_object(alias, table, extra=(), exclude=()):
+    """SQL for a json_build_object() of every column of the table but the
+    excluded ones, and the extra (key, SQL) pairs. Timestamps are
+    dd/mm/yyyy, as the rego desk has always had them."""
+    fields = []
+    for column in table.columns:
+        if column.name in exclude:
+            continue
+        value = '%s.%s' % (alias, column.name)
+        if isinstance(column.type, sa.types.DateTime):
+            value = "to_char(%s, 'DD/MM/YYYY')" % value
+        fields.append((column.name, value))
+    fields.extend(extra)
+    return 'json_build_object(%s)' % ', '.join("'%s', %s" % field for field in fields)
+
+def _checkin_data_sql():
+    from rego_note import RegoNote
+    from fulfilment import Fulfilment, FulfilmentItem
+
+    items = """(SELECT coalesce(json_agg(%s ORDER BY fi.id), '[]')
+                FROM fulfilment_item fi
+                JOIN product pr ON pr.id = fi.product_id
+                JOIN product_category c ON c.id = pr.category_id
+                WHERE fi.fulfilment_id = f.id)""" % _json_object('fi', FulfilmentItem.__table__, [
+        ('description', "concat(c.name, ' - ', pr.description)")])
+    fulfilments = """(SELECT coalesce(json_agg(%s ORDER BY f.id), '[]')
+                      FROM fulfilment f
+                      JOIN fulfilment_status fs ON fs.id = f.status_id
+                      JOIN fulfilment_type ft ON ft.id = f.type_id
+                      WHERE f.person_id = p.id)""" % _json_object('f', Fulfilment.__table__, [
+        ('fulfilment_status', 'fs.name'),
+        ('fulfilment_type', 'ft.name'),
+        ('fulfilment_items', items)])
+    notes = """(SELECT coalesce(json_agg(%s ORDER BY rn.id), '[]')
+                FROM rego_note rn
+                JOIN registration r ON r.id = rn.rego_id
+                WHERE r.person_id = p.id)""" % _json_object('rn', RegoNote.__table__)
+    return """SELECT p.id, %s
+              FROM person p
+              WHERE p.id = ANY(:ids)""" % _json_object('p', Person.__table__, [
+        ('notes', notes),
+        ('fulfilments', fulfilments)],
+        # Never sent to the desk
+        exclude=('password_hash', 'password_salt', 'url_hash'))
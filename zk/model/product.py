@@ -52,28 +52,24 @@ class Product(Base):
     def find_by_category(cls, id):
         return Session.query(Product).filter_by(category_id=id).order_by(Product.display_order).order_by(Product.cost)
 
-    def qty_free(self):
-        qty = 0
-        for ii in self.invoice_items:
-            if not ii.invoice.void and ii.invoice.is_paid:
-                qty += ii.free_qty
-        return qty
-
-    def qty_sold(self):
-        qty = 0
-        for ii in self.invoice_items:
-            if not ii.invoice.void and ii.invoice.is_paid:
-                qty += (ii.qty - ii.free_qty)
-        return qty
-
-    def qty_invoiced(self, date=True):
+    def stock(self, levels=None):
+        """The StockLevel of this product, taken from ``levels`` or else
+        StockLevels.current()."""
+        if levels is None:
+            from stock import StockLevels
+            levels = StockLevels.current()
+        return levels.product(self.id)
+
+    def qty_free(self, levels=None):
+        return self.stock(levels).free
+
+    def qty_sold(self, levels=None):
+        return self.stock(levels).sold
+
+    def qty_invoiced(self, date=True, levels=None):
         # date: bool? only count items that are not overdue
-        qty = 0
-        for ii in self.invoice_items:
-            # also count sold items as invoiced since they are valid
-            if not ii.invoice.void and ((ii.invoice.is_paid or not ii.invoice.is_overdue or not date)):
-                qty += ii.qty
-        return qty
+        # also count sold items as invoiced since they are valid
+        return self.stock(levels).qty_invoiced(date)
 
     def remaining(self):
         max_ceiling = None
@@ -82,11 +78,11 @@ class Product(Base):
                 max_ceiling = c.remaining
         return max_ceiling
 
-    def available(self, stock=True, qty=0):
+    def available(self, stock=True, qty=0, levels=None):
     # bool stock: care about if the product is in stock (ie sold out?)
         if self.active:
            for c in self.ceilings:
-                if not c.available(stock, qty):
+                if not c.available(stock, qty, levels):
                     return False
            return True
         else:
@@ -0,0 +1,91 @@
+"""The schedule of one day laid out as the programme grid"""
+import sqlalchemy as sa
+
+from meta import Session
+
+from schedule import Schedule, programme_cache
+from time_slot import TimeSlot
+
+from datetime import datetime, time, timedelta
+
+class ProgrammeRow(object):
+    """One ``Programme.increment`` of the day.
+
+    ``time_slot`` is the primary time slot starting at this time, if any.
+    ``schedules`` maps location ids to the schedules starting at this time
+    in that location, unless an exclusive event starts, in which case it
+    is ``exclusive`` with its time slot and schedules, main room first.
+    """
+    def __init__(self, time):
+        self.time = time
+        self.time_slot = None
+        self.exclusive = None
+        self.exclusive_time_slot = None
+        self.exclusive_schedules = []
+        self.schedules = {}
+
+class Programme(object):
+    # Granularity of the time scale down the side of the grid
+    increment = timedelta(minutes=5)
+
+    def __init__(self, date, time_slots):
+        self.date = date
+        self.time_slots = time_slots
+
+        rows = {}
+        for time_slot in time_slots:
+            t = time_slot.start_time
+            while t < time_slot.end_time:
+                if t not in rows:
+                    rows[t] = ProgrammeRow(t)
+                t += self.increment
+
+        locations = {}
+        for time_slot in time_slots:
+            row = rows[time_slot.start_time]
+            if time_slot.primary:
+                row.time_slot = time_slot
+            exclusive_event = time_slot.exclusive_event()
+            for schedule in time_slot.schedule:
+                if exclusive_event:
+                    row.exclusive = exclusive_event
+                    row.exclusive_time_slot = time_slot
+                    if schedule.event == exclusive_event:
+                        row.exclusive_schedules.append(schedule)
+                else:
+                    row.schedules[schedule.location_id] = schedule
+                if not schedule.event.exclusive:
+                    locations[schedule.location_id] = schedule.location
+
+        for row in rows.itervalues():
+            row.exclusive_schedules.sort(key=lambda s: bool(s.overflow))
+
+        self.rows = [rows[t] for t in sorted(rows)]
+        self.locations = sorted(locations.itervalues(), key=lambda l: (l.display_order, l.id))
+
+    @classmethod
+    def load(cls, date):
+        """The programme for the date, loaded in a single query"""
+        start = datetime.combine(date, time.min)
+        end = datetime.combine(date, time.max)
+        time_slots = Session.query(TimeSlot).options(
+                sa.orm.eagerload_all('schedule.location'),
+                sa.orm.eagerload_all('schedule.event.type'),
+                sa.orm.eagerload_all('schedule.event.proposal.people'),
+            ).filter(TimeSlot.start_time.between(start, end)).order_by(TimeSlot.start_time).all()
+        return cls(date, time_slots)
+
+    @classmethod
+    def scheduled_dates(cls):
+        """The dates that have time slots, cached until the schedule changes"""
+        return programme_cache.get('scheduled_dates', TimeSlot.find_scheduled_dates)
+
+    @classmethod
+    def cached(cls, key, create):
+        """Anything derived from the programme, such as a rendered table,
+        kept until the schedule changes"""
+        return programme_cache.get(key, create)
+
+    @classmethod
+    def invalidate(cls):
+        programme_cache.invalidate()
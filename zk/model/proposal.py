@@ -173,6 +173,10 @@ class Proposal(Base):
     creation_timestamp = sa.Column(sa.types.DateTime, nullable=False, default=sa.func.current_timestamp())
     last_modification_timestamp = sa.Column(sa.types.DateTime, nullable=False, default=sa.func.current_timestamp(), onupdate=sa.func.current_timestamp())
 
+    # for handing out reviews, see find_next_proposal()
+    review_count = sa.Column(sa.types.Integer, nullable=False, default=0, server_default='0')
+    last_assigned = sa.Column(sa.types.DateTime, nullable=True)
+
     # relations
     type = sa.orm.relation(ProposalType, backref='proposals')
     stream = sa.orm.relation(Stream)
@@ -281,29 +285,45 @@ class Proposal(Base):
     # TODO: add an optional filter for removing the signed in user's proposals
     @classmethod
     def find_next_proposal(cls, id, type_id, signed_in_person_id):
+        """The id of the proposal of the type for the person to review next,
+        other than proposal id, or None if they have reviewed them all.
+
+        That is the one with the fewest reviews of those they haven't
+        reviewed. Of proposals with the same number of reviews, the one
+        handed out longest ago goes first, and handing it out marks it, so
+        reviewers working at the same time are given different proposals.
+        Proposals being handed out by another request are skipped rather
+        than waited for.
+
+        review_count is kept up to date as reviews are added and deleted,
+        and indexed with the type and last_assigned, so this reads from the
+        start of the index instead of counting the reviews of every
+        proposal of the type.
+        """
         withdrawn = ProposalStatus.find_by_name('Withdrawn')
-        next = Session.query(Proposal).from_statement("""
-              SELECT
-                  p.id
-              FROM
-                  (SELECT id
-                   FROM proposal
-                   WHERE id <> %d
-                     AND status_id <> %d
-                     AND proposal_type_id = %d
-                   EXCEPT
-                       SELECT proposal_id AS id
-                       FROM review
-                       WHERE review.reviewer_id = %d) AS p
-              LEFT JOIN
-                      review AS r
-                              ON(p.id=r.proposal_id)
-              GROUP BY
-                      p.id
-              ORDER BY COUNT(r.reviewer_id), RANDOM()
-              LIMIT 1
-        """ % (id, withdrawn.id, type_id, signed_in_person_id))
-        next = next.first()
+        params = {'id': id, 'type_id': type_id, 'withdrawn_id': withdrawn.id, 'reviewer_id': signed_in_person_id}
+        candidates = """
+                  SELECT p.id
+                  FROM proposal p
+                  WHERE p.proposal_type_id = :type_id
+                    AND p.id <> :id
+                    AND p.status_id <> :withdrawn_id
+                    AND NOT EXISTS (SELECT 1
+                                    FROM review r
+                                    WHERE r.proposal_id = p.id
+                                      AND r.reviewer_id = :reviewer_id)
+                  ORDER BY p.review_count, p.last_assigned NULLS FIRST, p.id
+                  LIMIT 1
+        """
+        next = Session.execute(sa.text("""
+              UPDATE proposal
+              SET last_assigned = clock_timestamp()
+              WHERE id = (%s FOR UPDATE SKIP LOCKED)
+              RETURNING id
+        """ % candidates), params).first()
+        if next is None:
+            # Everything left may just be being handed out to others
+            next = Session.execute(sa.text(candidates), params).first()
         if next is not None:
             return next.id
         else:
@@ -312,5 +332,5 @@ class Proposal(Base):
 
     @classmethod
     def find_review_summary(cls):
-        from review import Review
-        return Review.stats_query().join(cls).add_entity(cls).group_by(cls)
+        from review_stats import ProposalReviewStats as stats
+        return Session.query(cls, stats.reviews.label('reviews'), stats.declined.label('declined'), stats.average.label('average')).join(stats, stats.proposal_id == cls.id)
@@ -70,6 +70,96 @@ class Registration(Base):
     def find_by_ids(cls, id_list):
         return Session.query(Registration).filter(Registration.id.in_(id_list)).all()
 
+    @classmethod
+    def find_for_export(cls, id_list):
+        """The registrations, with everything the CSV export shows of them
+        loaded up front"""
+        return Session.query(Registration).filter(Registration.id.in_(id_list)).options(
+                sa.orm.subqueryload_all('products.product.category'),
+                sa.orm.subqueryload_all('person.invoices.items'),
+                sa.orm.subqueryload_all('person.roles'),
+            ).all()
+
     @classmethod
     def find_all(cls):
         return Session.query(Registration).order_by(Registration.id).all()
+
+    @classmethod
+    def load_person_status(cls, registrations):
+        """Load the people of the registrations in one query, with their
+        status flags from Person.load_status(). Returns the registrations."""
+        person_ids = [r.person_id for r in registrations if r.person_id is not None]
+        if person_ids:
+            Person.load_status(Session.query(Person).filter(Person.id.in_(person_ids)).all())
+        return registrations
+
+    # Invoice item descriptions that pick out each type of badge
+    badge_descriptions = {
+        'concession': ['Concession%'],
+        'hobby': ['%Hobbyist%', '%Hobbiest%'],
+        'professional': ['%Professional%', 'Karoro%'],
+        'press': ['Press%'],
+        'organiser': ['Organiser%'],
+        'monday_tuesday': ['%Monday + Tuesday%'],
+    }
+
+    @classmethod
+    def find_for_badges(cls, badge_type='all'):
+        """Registrations of people with a paid ticket whose badge hasn't
+        been printed, ordered by name. Unless badge_type is 'all' only those
+        with that type of badge are returned."""
+        from invoice import Invoice
+        from invoice_item import InvoiceItem
+        from product import Product
+        from product_category import ProductCategory
+        from proposal import Proposal, ProposalStatus, ProposalType
+        from person_proposal_map import person_proposal_map
+        from person_role_map import person_role_map
+        from role import Role
+        from volunteer import Volunteer
+
+        def paid_item(*criteria):
+            return sa.exists().where(sa.and_(
+                InvoiceItem.invoice_id == Invoice.id,
+                Invoice.person_id == Person.id,
+                Invoice.is_paid,
+                sa.not_(Invoice.is_void),
+                *criteria))
+
+        def accepted_proposal(type_criterion):
+            return sa.exists().where(sa.and_(
+                person_proposal_map.c.person_id == Person.id,
+                Proposal.id == person_proposal_map.c.proposal_id,
+                ProposalStatus.id == Proposal.status_id,
+                ProposalType.id == Proposal.proposal_type_id,
+                ProposalStatus.name == 'Accepted',
+                type_criterion))
+
+        copresenter = sa.exists().where(sa.and_(
+            person_role_map.c.person_id == Person.id,
+            Role.id == person_role_map.c.role_id,
+            sa.func.lower(Role.name) == 'copresenter'))
+
+        query = (Session.query(cls)
+            .join(Person, Person.id == cls.person_id)
+            .options(sa.orm.contains_eager(cls.person), sa.orm.subqueryload('person.roles'))
+            .filter(sa.or_(Person.badge_printed == False, Person.badge_printed == None))
+            .filter(paid_item(
+                Product.id == InvoiceItem.product_id,
+                ProductCategory.id == Product.category_id,
+                ProductCategory.name == 'Ticket')))
+
+        if badge_type in cls.badge_descriptions:
+            query = query.filter(paid_item(sa.or_(*[InvoiceItem.description.like(pattern)
+                                                    for pattern in cls.badge_descriptions[badge_type]])))
+        elif badge_type == 'speaker':
+            query = query.filter(accepted_proposal(ProposalType.name != 'Miniconf')).filter(~copresenter)
+        elif badge_type == 'mc_organiser':
+            query = query.filter(accepted_proposal(ProposalType.name == 'Miniconf'))
+        elif badge_type == 'volunteer':
+            query = query.filter(sa.exists().where(sa.and_(
+                Volunteer.person_id == Person.id, Volunteer.accepted == True)))
+        elif badge_type != 'all':
+            return []
+
+        return query.order_by(sa.func.lower(Person.lastname), sa.func.lower(Person.firstname), cls.id).all()
@@ -1,5 +1,6 @@
 """The application's model objects"""
 import sqlalchemy as sa
+from sqlalchemy import event
 
 from meta import Base
 
@@ -73,3 +74,34 @@ class Review(Base):
     @classmethod
     def stats_query(cls):
         return Session.query(sa.func.count(cls.score).label('reviews'), (sa.func.count(1)-sa.func.count(cls.score)).label('declined'), sa.func.avg(cls.score).label('average'))
+
+
+# Proposal.review_count follows the reviews as they are added, deleted and
+# moved between proposals, in the same flush, for Proposal.find_next_proposal()
+_proposal = sa.table('proposal', sa.column('id'), sa.column('review_count'))
+
+def _add_to_count(connection, proposal_id, change):
+    connection.execute(_proposal.update()
+        .where(_proposal.c.id == proposal_id)
+        .values(review_count=_proposal.c.review_count + change))
+
+def _count_review(change):
+    def count(mapper, connection, review):
+        _add_to_count(connection, review.proposal_id, change)
+    return count
+
+def _move_review(mapper, connection, review):
+    history = sa.orm.attributes.get_history(review, 'proposal_id')
+    if not history.added:
+        return
+    old_ids = [id for id in history.deleted if id is not None]
+    if not old_ids:
+        # The old proposal_id wasn't loaded, but the proposal may have been
+        old_ids = [p.id for p in sa.orm.attributes.get_history(review, 'proposal').deleted if p is not None]
+    if old_ids and old_ids[0] != review.proposal_id:
+        _add_to_count(connection, old_ids[0], -1)
+        _add_to_count(connection, review.proposal_id, 1)
+
+event.listen(Review, 'after_insert', _count_review(1))
+event.listen(Review, 'after_delete', _count_review(-1))
+event.listen(Review, 'after_update', _move_review)
@@ -0,0 +1,91 @@
+"""Review statistics of each proposal, kept in tables of their own.
+
+The review summary and the proposals_by_* reports read these instead of
+aggregating every review each time. After each flush that adds, changes or
+deletes reviews, the rows of just those proposals are worked out again
+from their reviews, in the same transaction.
+"""
+import sqlalchemy as sa
+from sqlalchemy import event, orm
+
+from meta import Base, Session
+
+from proposal import Proposal
+from review import Review
+
+class ProposalReviewStats(Base):
+    """The number of scored and declined reviews of a proposal with reviews,
+    and the average, max and min of their scores"""
+    __tablename__ = 'proposal_review_stats'
+
+    proposal_id = sa.Column(sa.types.Integer, sa.ForeignKey('proposal.id', ondelete='CASCADE'), primary_key=True)
+    reviews = sa.Column(sa.types.Integer, nullable=False)
+    declined = sa.Column(sa.types.Integer, nullable=False)
+    average = sa.Column(sa.types.Numeric)
+    max_score = sa.Column(sa.types.Integer)
+    min_score = sa.Column(sa.types.Integer)
+
+    proposal = sa.orm.relation(Proposal, backref=sa.orm.backref('review_stats', uselist=False, passive_deletes=True))
+
+    def __repr__(self):
+        return '<ProposalReviewStats proposal_id=%r reviews=%r average=%r>' % (self.proposal_id, self.reviews, self.average)
+
+    @classmethod
+    def refresh(cls, proposal_ids=None, connection=None):
+        """Work out the rows of the proposals again, or of every proposal"""
+        if connection is None:
+            connection = Session.connection()
+        if proposal_ids is None:
+            where, params = '', {}
+        else:
+            if not proposal_ids:
+                return
+            where, params = 'WHERE proposal_id = ANY(:ids)', {'ids': sorted(proposal_ids)}
+            # Refreshes of the same proposal wait for each other, rather
+            # than both inserting its row
+            connection.execute(sa.text("SELECT id FROM proposal WHERE id = ANY(:ids) ORDER BY id FOR UPDATE"), params)
+        for sql in _refresh_sql:
+            connection.execute(sa.text(sql % {'where': where}), params)
+
+
+class ProposalScoreCount(Base):
+    """The number of reviewers who gave a proposal each score, for ranking
+    proposals by how strongly they were scored"""
+    __tablename__ = 'proposal_score_count'
+
+    proposal_id = sa.Column(sa.types.Integer, sa.ForeignKey('proposal.id', ondelete='CASCADE'), primary_key=True)
+    score = sa.Column(sa.types.Integer, primary_key=True)
+    reviewers = sa.Column(sa.types.Integer, nullable=False)
+
+    def __repr__(self):
+        return '<ProposalScoreCount proposal_id=%r score=%r reviewers=%r>' % (self.proposal_id, self.score, self.reviewers)
+
+
+_refresh_sql = [
+    "DELETE FROM proposal_review_stats %(where)s",
+    """INSERT INTO proposal_review_stats (proposal_id, reviews, declined, average, max_score, min_score)
+       SELECT proposal_id, COUNT(score), COUNT(*) - COUNT(score), AVG(score), MAX(score), MIN(score)
+       FROM review %(where)s
+       GROUP BY proposal_id""",
+    "DELETE FROM proposal_score_count %(where)s",
+    """INSERT INTO proposal_score_count (proposal_id, score, reviewers)
+       SELECT proposal_id, score, COUNT(*)
+       FROM (SELECT proposal_id, score FROM review %(where)s) AS review
+       WHERE score IS NOT NULL
+       GROUP BY proposal_id, score""",
+]
+
+
+def _flushed(session, flush_context):
+    proposal_ids = set()
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, Review):
+            # The proposals a review was moved from as well as to
+            proposal_ids.update(orm.attributes.get_history(obj, 'proposal_id').sum())
+            proposal_ids.update(p.id for p in orm.attributes.get_history(obj, 'proposal').sum() if p is not None)
+            proposal_ids.add(obj.proposal_id)
+    proposal_ids.discard(None)
+    if proposal_ids:
+        ProposalReviewStats.refresh(proposal_ids, session.connection())
+
+event.listen(orm.Session, 'after_flush', _flushed)
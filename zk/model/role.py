@@ -1,10 +1,19 @@
 """The application's model objects"""
 import sqlalchemy as sa
+from sqlalchemy import event, orm
 
 from meta import Base
 from pylons.controllers.util import abort
 from meta import Session
 
+from lib.cache import VersionedCache, mark_changed, is_changed, invalidate_changed, forget_changed
+
+import itertools
+
+# The role names, reloaded by every process once any commits a change to
+# the role table
+role_cache = VersionedCache('role_catalogue')
+
 class Role(Base):
     """Stores the roles used for authorisation
     """
@@ -35,5 +44,61 @@ class Role(Base):
     def find_all(self):
         return Session.query(Role).order_by(Role.name).all()
 
+    @classmethod
+    def exists(self, name):
+        """Checks the role name against the in-memory catalogue, no query in
+        the common case. Names are case insensitive."""
+        return catalogue.exists(name)
+
+    @classmethod
+    def refresh_catalogue(self):
+        """Reload the role catalogue, in every process. Committing a change
+        to a role does this too."""
+        catalogue.load()
+
     def __repr__(self):
         return '<Role id="%s" name="%s" pretty_name="%s" display_order="%s">' % (self.id, self.name, self.pretty_name, self.display_order)
+
+
+class RoleCatalogue(object):
+    """Index of the role names in the database, shared by the process.
+
+    Kept until a process commits a change to the roles or calls load(),
+    which every other process sees through the shared cache version. A
+    session that has flushed a change to the roles reads the names from
+    its own transaction instead, until it commits or rolls back.
+    """
+
+    def _names(self):
+        return frozenset(name.lower() for (name,) in Session.query(Role.name))
+
+    def names(self):
+        if is_changed(Session(), role_cache):
+            return self._names()
+        return role_cache.get('names', self._names)
+
+    def load(self):
+        role_cache.invalidate()
+        self.names()
+
+    def exists(self, name):
+        return name.lower() in self.names()
+
+catalogue = RoleCatalogue()
+
+
+def _flushed(session, flush_context):
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if getattr(obj, '__tablename__', None) == Role.__tablename__:
+            mark_changed(session, role_cache)
+            return
+
+def _committed(session):
+    invalidate_changed(session, role_cache)
+
+def _rolled_back(session):
+    forget_changed(session, role_cache)
+
+event.listen(orm.Session, 'after_flush', _flushed)
+event.listen(orm.Session, 'after_commit', _committed)
+event.listen(orm.Session, 'after_rollback', _rolled_back)
@@ -0,0 +1,188 @@
+"""Sales of paid invoices over time, computed by the database"""
+import sqlalchemy as sa
+
+from meta import Session
+
+from invoice import Invoice
+from invoice_item import InvoiceItem
+from payment_received import PaymentReceived
+from product import Product
+from product_category import ProductCategory
+
+import datetime
+
+class Sales(object):
+    """Sales on one day, of a product, a category or everything.
+
+    ``revenue`` is in cents. ``invoices`` is the number of invoices paid
+    that day, only known for whole days.
+    """
+    def __init__(self, date, category=None, product=None, qty=0, revenue=0, invoices=None):
+        self.date = date
+        self.category = category
+        self.product = product
+        self.qty = qty
+        self.revenue = revenue
+        self.invoices = invoices
+        # Filled in by cumulative() and rolling()
+        self.cumulative = {}
+        self.rolling = {}
+
+    def add(self, other):
+        self.qty += other.qty
+        self.revenue += other.revenue
+
+    def __repr__(self):
+        return '<Sales date=%r category=%r product=%r qty=%r revenue=%r invoices=%r>' % (self.date, self.category, self.product, self.qty, self.revenue, self.invoices)
+
+class SalesCategory(object):
+    def __init__(self, id, name, display_order):
+        self.id = id
+        self.name = name
+        self.display_order = display_order
+
+class SalesProduct(object):
+    def __init__(self, id, description, display_order):
+        self.id = id
+        self.description = description
+        self.display_order = display_order
+
+class SalesTimeseries(object):
+    """Quantities and revenue of paid invoices by day and product.
+
+    An invoice counts once it is paid, on the day of its first approved
+    payment, or the day it was created if there was nothing to pay. All
+    the views come from the one grouped query in load().
+    """
+    def __init__(self, rows, invoices_by_date):
+        # Sales by product (None for items without one), ordered by date
+        self.rows = rows
+        self.invoices_by_date = invoices_by_date
+
+    @classmethod
+    def query(cls):
+        """One row per day and product, with the number of invoices paid
+        that day, paid quantity (less free items) and revenue."""
+        ii = InvoiceItem.__table__
+        invoice = Invoice.__table__
+        pr = PaymentReceived.__table__
+        product = Product.__table__
+        category = ProductCategory.__table__
+
+        # Same definition of paid as Invoice.is_paid
+        totals = sa.select([ii.c.invoice_id, sa.func.sum(ii.c.cost * ii.c.qty).label('total')]).group_by(ii.c.invoice_id).alias('totals')
+        payments = sa.select([
+                pr.c.invoice_id,
+                sa.func.sum(pr.c.amount_paid).label('paid'),
+                sa.func.min(pr.c.creation_timestamp).label('first_paid'),
+            ]).where(pr.c.approved == True).group_by(pr.c.invoice_id).alias('payments')
+        total = sa.func.coalesce(totals.c.total, 0)
+        paid_date = sa.func.date(sa.case([(total == 0, invoice.c.creation_timestamp)], else_=payments.c.first_paid))
+
+        paid = sa.select([
+                invoice.c.id,
+                paid_date.label('date'),
+                sa.func.count().over(partition_by=paid_date).label('invoices_that_day'),
+            ],
+            from_obj=invoice.outerjoin(totals, totals.c.invoice_id == invoice.c.id)
+                            .outerjoin(payments, payments.c.invoice_id == invoice.c.id)
+        ).where(sa.and_(invoice.c.void == None, total == sa.func.coalesce(payments.c.paid, 0))).alias('paid')
+
+        sold = ii.c.qty - ii.c.free_qty
+        return sa.select([
+                paid.c.date,
+                paid.c.invoices_that_day,
+                category.c.id.label('category_id'),
+                category.c.name.label('category_name'),
+                category.c.display_order.label('category_order'),
+                product.c.id.label('product_id'),
+                product.c.description.label('product_description'),
+                product.c.display_order.label('product_order'),
+                sa.func.coalesce(sa.func.sum(sold), 0).label('qty'),
+                sa.func.coalesce(sa.func.sum(ii.c.cost * sold), 0).label('revenue'),
+            ],
+            from_obj=paid.outerjoin(ii, ii.c.invoice_id == paid.c.id)
+                         .outerjoin(product, product.c.id == ii.c.product_id)
+                         .outerjoin(category, category.c.id == product.c.category_id)
+        ).group_by(paid.c.date, paid.c.invoices_that_day,
+                   category.c.id, category.c.name, category.c.display_order,
+                   product.c.id, product.c.description, product.c.display_order
+        ).order_by(paid.c.date, category.c.display_order, product.c.display_order, product.c.id)
+
+    @classmethod
+    def load(cls):
+        categories = {}
+        products = {}
+        rows = []
+        invoices_by_date = {}
+        for row in Session.execute(cls.query()):
+            invoices_by_date[row.date] = row.invoices_that_day
+            category = product = None
+            if row.product_id is not None:
+                if row.category_id not in categories:
+                    categories[row.category_id] = SalesCategory(row.category_id, row.category_name, row.category_order)
+                category = categories[row.category_id]
+                if row.product_id not in products:
+                    products[row.product_id] = SalesProduct(row.product_id, row.product_description, row.product_order)
+                product = products[row.product_id]
+            rows.append(Sales(row.date, category, product, row.qty, row.revenue))
+        return cls(rows, invoices_by_date)
+
+    def by_product(self, category=None):
+        """Sales of each product by day, optionally only those in the
+        named category"""
+        return [s for s in self.rows if s.product is not None and (category is None or s.category.name == category)]
+
+    def by_category(self):
+        """Sales of each category by day"""
+        result = []
+        totals = {}
+        for s in self.rows:
+            if s.category is None:
+                continue
+            key = (s.date, s.category.id)
+            if key not in totals:
+                totals[key] = Sales(s.date, s.category)
+                result.append(totals[key])
+            totals[key].add(s)
+        return result
+
+    def by_date(self):
+        """Sales of everything, including items without a product, by day"""
+        result = []
+        totals = {}
+        for s in self.rows:
+            if s.date not in totals:
+                totals[s.date] = Sales(s.date, invoices=self.invoices_by_date[s.date])
+                result.append(totals[s.date])
+            totals[s.date].add(s)
+        return result
+
+
+def _series_key(s):
+    return (s.category and s.category.id, s.product and s.product.id)
+
+def cumulative(sales, fields=('qty', 'revenue')):
+    """Fill in each Sales' ``cumulative`` with running totals of the fields,
+    kept separately for each product or category. Returns the sales."""
+    running = {}
+    for s in sales:
+        totals = running.setdefault(_series_key(s), dict((f, 0) for f in fields))
+        for f in fields:
+            totals[f] += getattr(s, f)
+        s.cumulative = dict(totals)
+    return sales
+
+def rolling(sales, days, fields=('qty', 'revenue')):
+    """Fill in each Sales' ``rolling`` with the totals of the fields over
+    the ``days`` days up to and including its date, for each product or
+    category. Returns the sales."""
+    window = datetime.timedelta(days=days)
+    history = {}
+    for s in sales:
+        recent = history.setdefault(_series_key(s), [])
+        recent.append(s)
+        while s.date - recent[0].date >= window:
+            del recent[0]
+        s.rolling = dict((f, sum(getattr(r, f) for r in recent)) for f in fields)
+    return sales
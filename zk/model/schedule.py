@@ -1,6 +1,11 @@
 """The application's model objects"""
 from datetime import datetime, date, time
+import hashlib
+import itertools
+import time as _time
+
 import sqlalchemy as sa
+from sqlalchemy import event, orm
 
 from meta import Base
 
@@ -8,6 +13,16 @@ from pylons.controllers.util import abort
 
 from meta import Session
 
+from lib.cache import VersionedCache, mark_changed, invalidate_changed, forget_changed
+
+# Tables whose rows appear in the published schedule feeds and programme
+schedule_tables = frozenset(['schedule', 'event', 'event_type', 'time_slot', 'location', 'proposal', 'person', 'config'])
+
+# Rendered feeds, and programme tables (see programme.py), rebuilt after a
+# commit changes any of the tables above
+feed_cache = VersionedCache('schedule_feed')
+programme_cache = VersionedCache('programme')
+
 class Schedule(Base):
     __tablename__ = 'schedule'
     __table_args__ = (
@@ -33,6 +48,11 @@ class Schedule(Base):
     def find_all(cls):
         return Session.query(Schedule).order_by(Schedule.id).all()
 
+    @classmethod
+    def find_all_for_feed(cls):
+        """All schedules, with everything the feeds show loaded up front"""
+        return Session.query(Schedule).options(sa.orm.eagerload('time_slot'), sa.orm.eagerload('location'), sa.orm.eagerload_all('event.proposal.people')).order_by(Schedule.id).all()
+
     @classmethod
 
     def find_by_id(cls, id, abort_404 = True, published = True):
@@ -54,3 +74,38 @@ class Schedule(Base):
         end     = datetime.combine(date,time.max)
 
         return Session.query(Schedule).options(sa.orm.eagerload_all('time_slot.schedule'), sa.orm.eagerload('location'), sa.orm.eagerload_all('event.proposal.people')).join(TimeSlot).filter(TimeSlot.start_time.between(start,end)).order_by(TimeSlot.start_time).all()
+
+
+class ScheduleFeed(object):
+    """A rendered schedule feed, with the validators to serve it with"""
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.last_modified = int(_time.time())
+
+    @classmethod
+    def get(cls, key, build):
+        """The feed stored under key, calling build() to render it when
+        there isn't an up to date one"""
+        return feed_cache.get(key, build)
+
+    @classmethod
+    def invalidate(cls):
+        feed_cache.invalidate()
+
+
+def _flushed(session, flush_context):
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if getattr(obj, '__tablename__', None) in schedule_tables:
+            mark_changed(session, feed_cache, programme_cache)
+            return
+
+def _committed(session):
+    invalidate_changed(session, feed_cache, programme_cache)
+
+def _rolled_back(session):
+    forget_changed(session, feed_cache, programme_cache)
+
+event.listen(orm.Session, 'after_flush', _flushed)
+event.listen(orm.Session, 'after_commit', _committed)
+event.listen(orm.Session, 'after_rollback', _rolled_back)
@@ -0,0 +1,192 @@
+"""Stock levels of products and ceilings, computed by the database"""
+import sqlalchemy as sa
+from sqlalchemy import event, orm
+
+from meta import Session
+
+from lib.cache import VersionedCache, mark_changed, is_changed, invalidate_changed, forget_changed
+
+from invoice import Invoice
+from invoice_item import InvoiceItem
+from payment_received import PaymentReceived
+from product_ceiling_map import product_ceiling_map
+
+import datetime
+import itertools
+
+# Changes to rows of these tables can alter the stock levels
+stock_tables = frozenset(['invoice', 'invoice_item', 'payment_received', 'product', 'ceiling'])
+
+# Committed stock levels shared by every request in the process. A commit
+# that touches the tables above invalidates it in every process; the expiry
+# lets invoices that have become overdue drop out of the invoiced counts.
+stock_cache = VersionedCache('stock', expire=60)
+
+class StockLevel(object):
+    """Quantities of a product, or of all the products under a ceiling.
+
+    ``invoiced`` only counts invoices that are paid or not yet overdue while
+    ``invoiced_all`` counts every invoice that hasn't been voided.
+    """
+    def __init__(self, sold=0, free=0, invoiced=0, invoiced_all=0):
+        self.sold = sold
+        self.free = free
+        self.invoiced = invoiced
+        self.invoiced_all = invoiced_all
+
+    def qty_invoiced(self, date=True):
+        if date:
+            return self.invoiced
+        return self.invoiced_all
+
+    def add(self, other):
+        self.sold += other.sold
+        self.free += other.free
+        self.invoiced += other.invoiced
+        self.invoiced_all += other.invoiced_all
+
+    def __repr__(self):
+        return '<StockLevel sold=%r free=%r invoiced=%r invoiced_all=%r>' % (self.sold, self.free, self.invoiced, self.invoiced_all)
+
+class StockLevels(object):
+    """Stock levels for every product and ceiling.
+
+    Loaded in a single grouped query by load(). Use current() to share the
+    committed levels between requests and processes.
+    """
+    def __init__(self, products, ceilings):
+        self.products = products
+        self.ceilings = ceilings
+
+    def product(self, product_id):
+        return self.products.get(product_id) or StockLevel()
+
+    def ceiling(self, ceiling_id):
+        return self.ceilings.get(ceiling_id) or StockLevel()
+
+    def reserve(self, product, qty):
+        """Count ``qty`` more of the product, and its ceilings, as invoiced so
+        later checks against these levels include it. Only for levels from
+        lock() or load(), never the shared ones from current()."""
+        levels = [self.products.setdefault(product.id, StockLevel())]
+        levels.extend(self.ceilings.setdefault(ceiling.id, StockLevel()) for ceiling in product.ceilings)
+        for level in levels:
+            level.invoiced += qty
+            level.invoiced_all += qty
+
+    @classmethod
+    def query(cls, now=None):
+        """The per product quantities, one row per product and ceiling the
+        product is under (ceiling_id is NULL for products under none)."""
+        if now is None:
+            now = datetime.datetime.now()
+
+        ii = InvoiceItem.__table__
+        invoice = Invoice.__table__
+        pr = PaymentReceived.__table__
+
+        # Same definition of paid as Invoice.is_paid
+        totals = sa.select([ii.c.invoice_id, sa.func.sum(ii.c.cost * ii.c.qty).label('total')]).group_by(ii.c.invoice_id).alias('totals')
+        payments = sa.select([pr.c.invoice_id, sa.func.sum(pr.c.amount_paid).label('paid')]).where(pr.c.approved == True).group_by(pr.c.invoice_id).alias('payments')
+        paid = sa.func.coalesce(totals.c.total, 0) == sa.func.coalesce(payments.c.paid, 0)
+        current = sa.or_(paid, invoice.c.due_date >= now)
+
+        def qty_where(condition, qty):
+            return sa.func.coalesce(sa.func.sum(sa.case([(condition, qty)], else_=0)), 0)
+
+        per_product = sa.select([
+                ii.c.product_id,
+                qty_where(paid, ii.c.qty - ii.c.free_qty).label('sold'),
+                qty_where(paid, ii.c.free_qty).label('free'),
+                qty_where(current, ii.c.qty).label('invoiced'),
+                sa.func.coalesce(sa.func.sum(ii.c.qty), 0).label('invoiced_all'),
+            ],
+            from_obj=ii.join(invoice, invoice.c.id == ii.c.invoice_id)
+                       .outerjoin(totals, totals.c.invoice_id == invoice.c.id)
+                       .outerjoin(payments, payments.c.invoice_id == invoice.c.id)
+        ).where(sa.and_(invoice.c.void == None, ii.c.product_id != None)).group_by(ii.c.product_id).alias('per_product')
+
+        return sa.select([per_product, product_ceiling_map.c.ceiling_id],
+            from_obj=per_product.outerjoin(product_ceiling_map, product_ceiling_map.c.product_id == per_product.c.product_id))
+
+    @classmethod
+    def load(cls, now=None):
+        products = {}
+        ceilings = {}
+        for row in Session.execute(cls.query(now)):
+            if row.product_id not in products:
+                products[row.product_id] = StockLevel(row.sold, row.free, row.invoiced, row.invoiced_all)
+            if row.ceiling_id is not None:
+                ceilings.setdefault(row.ceiling_id, StockLevel()).add(products[row.product_id])
+        return cls(products, ceilings)
+
+    @classmethod
+    def current(cls):
+        """The stock levels as seen by the current session.
+
+        Committed levels come from the shared cache. Once the session has
+        flushed a change to invoices, payments, products or ceilings the
+        levels are loaded from its own transaction instead, until it
+        commits or rolls back.
+        """
+        session = Session()
+        levels = getattr(session, '_stock_levels', None)
+        if levels is None:
+            if is_changed(session, stock_cache):
+                levels = cls.load()
+            else:
+                levels = stock_cache.get('levels', cls.load)
+            session._stock_levels = levels
+        return levels
+
+    @classmethod
+    def lock(cls, products):
+        """Lock the ceilings of the products, and their parents, until the
+        end of the transaction and return levels freshly loaded under the
+        lock. Check and reserve() stock against these before adding invoice
+        items so concurrent registrations can't both take the last of it.
+
+        Ceilings are locked in id order so concurrent callers can't
+        deadlock each other.
+        """
+        from ceiling import Ceiling
+
+        ids = set()
+        for product in products:
+            for ceiling in product.ceilings:
+                while ceiling is not None and ceiling.id not in ids:
+                    ids.add(ceiling.id)
+                    ceiling = ceiling.parent
+
+        if ids:
+            Session.query(Ceiling.id).filter(Ceiling.id.in_(ids)).order_by(Ceiling.id).with_lockmode('update').all()
+
+        levels = cls.load()
+        Session()._stock_levels = levels
+        return levels
+
+    @classmethod
+    def invalidate(cls):
+        stock_cache.invalidate()
+
+
+def _flushed(session, flush_context):
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if getattr(obj, '__tablename__', None) in stock_tables:
+            session._stock_levels = None
+            mark_changed(session, stock_cache)
+            return
+
+def _committed(session):
+    # Invalidate only once committed, otherwise another process could cache
+    # the old levels under the new version
+    session._stock_levels = None
+    invalidate_changed(session, stock_cache)
+
+def _rolled_back(session):
+    session._stock_levels = None
+    forget_changed(session, stock_cache)
+
+event.listen(orm.Session, 'after_flush', _flushed)
+event.listen(orm.Session, 'after_commit', _committed)
+event.listen(orm.Session, 'after_rollback', _rolled_back)
@@ -68,13 +68,8 @@ class TimeSlot(Base):
 
     @classmethod
     def find_scheduled_dates(cls):
-        time_slots = cls.find_all()
-
-        scheduled_dates = []
-        for time_slot in time_slots:
-            if time_slot.start_time.date() not in scheduled_dates:
-                scheduled_dates.append(time_slot.start_time.date())
-        return scheduled_dates
+        day = sa.cast(TimeSlot.start_time, sa.types.Date)
+        return [scheduled_date for (scheduled_date,) in Session.query(day).distinct().order_by(day)]
 
 class TimeSlotValidator(validators.FancyValidator):
     def _to_python(self, value, state):
@@ -16,7 +16,7 @@ angular.module('zk.admin.controllers', []).
   controller('PersonDetailCtrl', function($scope) {
 
   }).
-  controller('CheckinCtrl', function($scope, $http, $modal, $routeParams) {
+  controller('CheckinCtrl', function($scope, $http, $modal, $routeParams, $timeout) {
     $("body").on('keyup', '#search', function() { 
 	setTimeout( function() { 
 		if ($("#search").next().find('li').length == 1) { 
@@ -44,24 +44,76 @@ angular.module('zk.admin.controllers', []).
 
     $scope.person = {};
 
+    // People fetched ahead of being picked, by id, with when they were fetched
+    var prefetched = {};
+    var prefetchAge = 60000;
+    var prefetchCount = 3;
+    // Only once typing has paused this long, not on every keystroke
+    var prefetchDelay = 500;
+    var prefetchTimer = null;
+
+    var schedulePrefetch = function(people) {
+      $timeout.cancel(prefetchTimer);
+      prefetchTimer = $timeout(function() {
+        prefetchTimer = null;
+        prefetch(people);
+      }, prefetchDelay, false);
+    };
+
+    var prefetch = function(people) {
+      var now = new Date().getTime();
+      var ids = people.slice(0, prefetchCount).map(function(person) {
+        return person.id;
+      }).filter(function(id) {
+        return !(prefetched[id] && now - prefetched[id].time < prefetchAge);
+      });
+      if (!ids.length) {
+        return;
+      }
+      $http.get('/checkin/people_data', { params: { ids: ids.join(',') } })
+        .then(function(response) {
+          angular.forEach(response.data, function(data, id) {
+            prefetched[id] = { data: data, time: now };
+          });
+        });
+    };
+
     $scope.findPerson = function(query) {
       return $http.get('/checkin/lookup', { params: { q: query } })
         .then(function(response) {
+          schedulePrefetch(response.data.r);
           return response.data.r;
         })
     };
 
+    var showPerson = function(data) {
+      $scope.person = data;
+      $scope.blocks = data.notes.filter(function(element, index) {
+        return element.block;
+      })
+      if ($scope.blocks.length) {
+        $scope.block();
+        $scope.person = {};
+      }
+    };
+
     $scope.loadPerson = function(personId) {
+      // Picked, so what is still to be prefetched isn't wanted
+      $timeout.cancel(prefetchTimer);
+      // Show what was fetched ahead straight away, then what is current
+      var cached = prefetched[personId];
+      delete prefetched[personId];
+      if (cached && new Date().getTime() - cached.time < prefetchAge) {
+        showPerson(cached.data);
+        if ($scope.blocks.length) {
+          return;
+        }
+      }
       $http.get('/admin/generate_fulfilment').success(function() {
         $http.get('/checkin/person_data', { params: { id: personId } })
           .then(function(response) {
-            $scope.person = response.data;
-            $scope.blocks = response.data.notes.filter(function(element, index) {
-              return element.block;
-            })
-            if ($scope.blocks.length) {
-              $scope.block();
-              $scope.person = {};
+            if (!cached || $scope.person.id == personId) {
+              showPerson(response.data);
             }
           });
       });
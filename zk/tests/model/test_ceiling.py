@@ -0,0 +1,70 @@
+# pytest magic: from .conftest import app_config, db_session
+
+from datetime import datetime, timedelta
+
+from .fixtures import CeilingFactory, ProductFactory, InvoiceItemFactory
+from zk.model.stock import StockLevels
+
+
+class TestCeiling(object):
+    def test_stock_levels(self, db_session):
+        ceiling = CeilingFactory(max_sold=10)
+        tshirt = ProductFactory(ceilings=[ceiling])
+        hat = ProductFactory(ceilings=[ceiling])
+        unsold = ProductFactory(ceilings=[ceiling])
+        db_session.flush()
+
+        # Nothing owing, so paid
+        InvoiceItemFactory(product=tshirt, qty=2, free_qty=1, cost=0)
+        # Unpaid but not due yet
+        InvoiceItemFactory(product=tshirt, qty=3, cost=100)
+        # Unpaid and overdue
+        overdue = InvoiceItemFactory(product=hat, qty=4, cost=100)
+        overdue.invoice.due_date = datetime.now() - timedelta(days=1)
+        # Void invoices never count
+        void = InvoiceItemFactory(product=hat, qty=5, cost=0)
+        void.invoice.void = "Testing"
+        db_session.flush()
+
+        levels = StockLevels.load()
+
+        assert tshirt.qty_sold(levels) == 1
+        assert tshirt.qty_free(levels) == 1
+        assert tshirt.qty_invoiced(levels=levels) == 5
+        assert tshirt.qty_invoiced(date=False, levels=levels) == 5
+
+        assert hat.qty_sold(levels) == 0
+        assert hat.qty_invoiced(levels=levels) == 0
+        assert hat.qty_invoiced(date=False, levels=levels) == 4
+
+        assert unsold.qty_invoiced(date=False, levels=levels) == 0
+
+        assert ceiling.qty_sold(levels) == 1
+        assert ceiling.qty_free(levels) == 1
+        assert ceiling.stock(levels).invoiced == 5
+        assert ceiling.stock(levels).invoiced_all == 9
+
+    def test_current_follows_flushes(self, db_session):
+        ceiling = CeilingFactory()
+        product = ProductFactory(ceilings=[ceiling])
+        db_session.flush()
+
+        assert product.qty_sold() == 0
+        InvoiceItemFactory(product=product, qty=2, cost=0)
+        db_session.flush()
+        assert product.qty_sold() == 2
+
+    def test_current_follows_commits(self, db_session):
+        ceiling = CeilingFactory(max_sold=2)
+        product = ProductFactory(ceilings=[ceiling])
+        db_session.commit()
+
+        assert product.qty_sold() == 0
+        assert not ceiling.soldout()
+
+        InvoiceItemFactory(product=product, qty=2, cost=0)
+        db_session.commit()
+
+        assert product.qty_sold() == 2
+        assert ceiling.qty_invoiced() == 2
+        assert ceiling.soldout()
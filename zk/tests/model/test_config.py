@@ -0,0 +1,46 @@
+# pytest magic: from .conftest import app_config, db_session
+
+from .fixtures import ConfigFactory
+from zk.model.config import Config
+
+
+class TestConfig(object):
+    def test_get(self, db_session):
+        ConfigFactory(key='test_key', value={'a': [1, 2]})
+        db_session.commit()
+
+        assert Config.get('test_key') == {'a': [1, 2]}
+        assert Config.get('test_key', category='rego') == ''
+        assert Config.get('missing_key') == ''
+
+        # Values handed out must not alter the shared snapshot
+        Config.get('test_key')['a'].append(3)
+        assert Config.get('test_key') == {'a': [1, 2]}
+
+    def test_commit_invalidates(self, db_session):
+        ConfigFactory(key='test_key', value='old')
+        db_session.commit()
+        assert Config.get('test_key') == 'old'
+
+        Config.find_by_pk(('general', 'test_key')).value = 'new'
+        db_session.flush()
+        db_session.commit()
+        assert Config.get('test_key') == 'new'
+
+        db_session.delete(Config.find_by_pk(('general', 'test_key')))
+        db_session.commit()
+        assert Config.get('test_key') == ''
+
+    def test_commit_invalidates_both_copies(self, db_session):
+        # zkpylons.model is another copy of zk.model with its own cache,
+        # which the same commit must invalidate too
+        from zkpylons.model.config import Config as PylonsConfig
+        ConfigFactory(key='test_key', value='old')
+        db_session.commit()
+        assert Config.get('test_key') == 'old'
+        assert PylonsConfig.get('test_key') == 'old'
+
+        Config.find_by_pk(('general', 'test_key')).value = 'new'
+        db_session.commit()
+        assert Config.get('test_key') == 'new'
+        assert PylonsConfig.get('test_key') == 'new'
@@ -1,6 +1,8 @@
 # pytest magic: from .conftest import app_config, db_session
 
-from .fixtures import PersonFactory
+from .fixtures import PersonFactory, RoleFactory, ProposalFactory, ProposalStatusFactory, ProposalTypeFactory
+from .fixtures import ProductFactory, ProductCategoryFactory, InvoiceFactory, InvoiceItemFactory
+from .fixtures import CompletePersonFactory, FulfilmentGroupFactory, FulfilmentFactory, FulfilmentItemFactory
 from zk.model.person import Person
 
 class TestPerson(object):
@@ -16,3 +18,86 @@ class TestPerson(object):
 
         # and it looks like fred
         assert selected == fred
+
+    def test_load_status(self, db_session):
+        accepted = ProposalStatusFactory(name='Accepted')
+        talk = ProposalTypeFactory(name='Presentation')
+        miniconf = ProposalTypeFactory(name='Miniconf')
+        tickets = ProductCategoryFactory(name='Ticket')
+        ticket = ProductFactory(category=tickets)
+
+        speaker = PersonFactory()
+        ProposalFactory(status=accepted, type=talk, people=[speaker])
+        organiser = PersonFactory()
+        ProposalFactory(status=accepted, type=miniconf, people=[organiser])
+        copresenter = PersonFactory(roles=[RoleFactory(name='copresenter')])
+        ProposalFactory(status=accepted, type=talk, people=[copresenter])
+
+        # Paid for a ticket, but owes on a later invoice
+        owing = PersonFactory()
+        InvoiceItemFactory(invoice=InvoiceFactory(person=owing), product=ticket, description='Hobbyist Ticket', cost=0)
+        InvoiceItemFactory(invoice=InvoiceFactory(person=owing), cost=100)
+        # Paid everything, the voided invoice doesn't count
+        paid = PersonFactory()
+        void = InvoiceItemFactory(invoice=InvoiceFactory(person=paid), product=ticket, description='Professional Ticket', cost=0)
+        void.invoice.void = 'Testing'
+        InvoiceItemFactory(invoice=InvoiceFactory(person=paid), cost=0)
+        nobody = PersonFactory()
+        db_session.flush()
+
+        people = [speaker, organiser, copresenter, owing, paid, nobody]
+        methods = ('is_speaker', 'is_miniconf_org', 'is_volunteer', 'has_valid_invoice', 'has_paid_ticket', 'ticket_type', 'paid')
+        expected = [[getattr(p, m)() for m in methods] for p in people]
+
+        assert Person.load_status(people) == people
+        assert [[getattr(p, m)() for m in methods] for p in people] == expected
+
+        assert [p.is_speaker() for p in people] == [True, False, False, False, False, False]
+        assert [p.is_miniconf_org() for p in people] == [False, True, False, False, False, False]
+        assert owing.has_paid_ticket() and owing.ticket_type() == 'Hobbyist'
+        assert not owing.paid()
+        assert paid.paid() and not paid.has_paid_ticket() and paid.ticket_type() is None
+        assert not nobody.has_valid_invoice()
+
+    def test_find_for_checkin(self, db_session):
+        jim = CompletePersonFactory(firstname='Jim', lastname='Kibbles', email_address='jim@kibbles.example.org')
+        jane = CompletePersonFactory(firstname='Jane', lastname='Jones', email_address='jj@example.org')
+        FulfilmentGroupFactory(person=jane, code='KIB123')
+        FulfilmentFactory(person=jane, code='BADGE42')
+        db_session.flush()
+
+        assert [tuple(r) for r in Person.find_for_checkin('kib')] == [
+            (jim.id, 'Jim Kibbles - jim@kibbles.example.org'),
+            (jane.id, 'KIB123 - Jane Jones'),
+        ]
+        assert [tuple(r) for r in Person.find_for_checkin('badge4')] == [(jane.id, 'BADGE42 - Jane Jones')]
+        # Emails match at the start or straight after the @
+        assert [r.id for r in Person.find_for_checkin('example')] == [jane.id]
+        assert jim.id in [r.id for r in Person.find_for_checkin(str(jim.id))]
+        assert len(Person.find_for_checkin('j', limit=1)) == 1
+
+    def test_checkin_data(self, db_session):
+        jim = CompletePersonFactory(firstname='Jim', creation_timestamp='2016-02-01 10:30')
+        badge = FulfilmentFactory(person=jim)
+        first = FulfilmentItemFactory(fulfilment=badge, qty=1)
+        second = FulfilmentItemFactory(fulfilment=badge, qty=2,
+                                       product=ProductFactory(description='Shirt', category=ProductCategoryFactory(name='Swag')))
+        nobody = PersonFactory()
+        db_session.flush()
+
+        data = Person.checkin_data([jim.id, nobody.id, -1])
+        assert sorted(data) == sorted([jim.id, nobody.id])
+
+        jim_data = data[jim.id]
+        assert jim_data['firstname'] == 'Jim'
+        assert jim_data['creation_timestamp'] == '01/02/2016'
+        assert not set(['password_hash', 'password_salt', 'url_hash']) & set(jim_data)
+        assert jim_data['notes'] == []
+        assert [f['id'] for f in jim_data['fulfilments']] == [badge.id]
+        assert jim_data['fulfilments'][0]['fulfilment_status'] == badge.status.name
+        items = jim_data['fulfilments'][0]['fulfilment_items']
+        assert [i['id'] for i in items] == [first.id, second.id]
+        assert items[1]['description'] == 'Swag - Shirt'
+        assert data[nobody.id]['fulfilments'] == []
+
+        assert Person.checkin_data([]) == {}
@@ -0,0 +1,54 @@
+# pytest magic: from .conftest import app_config, db_session
+
+from datetime import date, datetime
+
+from .fixtures import TimeSlotFactory, LocationFactory, ScheduleFactory, EventFactory
+from zk.model.programme import Programme
+
+
+class TestProgramme(object):
+    def test_load(self, db_session):
+        morning = TimeSlotFactory(start_time=datetime(2016, 2, 1, 9), end_time=datetime(2016, 2, 1, 9, 15), primary=True)
+        talks = TimeSlotFactory(start_time=datetime(2016, 2, 1, 10), end_time=datetime(2016, 2, 1, 10, 10), primary=True)
+        TimeSlotFactory(start_time=datetime(2016, 2, 2, 10), end_time=datetime(2016, 2, 2, 11), primary=True)
+
+        hall = LocationFactory(display_order=1)
+        room1 = LocationFactory(display_order=2)
+        room2 = LocationFactory(display_order=3)
+
+        keynote = EventFactory(exclusive=True)
+        main = ScheduleFactory(time_slot=morning, location=hall, event=keynote, overflow=False)
+        overflow = ScheduleFactory(time_slot=morning, location=room1, event=keynote, overflow=True)
+        talk1 = ScheduleFactory(time_slot=talks, location=room2, event=EventFactory(exclusive=False))
+        talk2 = ScheduleFactory(time_slot=talks, location=room1, event=EventFactory(exclusive=False))
+        db_session.flush()
+
+        programme = Programme.load(date(2016, 2, 1))
+
+        assert [row.time for row in programme.rows] == [
+            datetime(2016, 2, 1, 9), datetime(2016, 2, 1, 9, 5), datetime(2016, 2, 1, 9, 10),
+            datetime(2016, 2, 1, 10), datetime(2016, 2, 1, 10, 5),
+        ]
+        assert [l.id for l in programme.locations] == [room1.id, room2.id]
+
+        first = programme.rows[0]
+        assert first.time_slot == morning
+        assert first.exclusive == keynote
+        assert first.exclusive_time_slot == morning
+        assert first.exclusive_schedules == [main, overflow]
+        assert first.schedules == {}
+
+        assert programme.rows[1].time_slot is None
+
+        talk_row = programme.rows[3]
+        assert talk_row.exclusive is None
+        assert talk_row.schedules == {room1.id: talk2, room2.id: talk1}
+
+    def test_scheduled_dates(self, db_session):
+        TimeSlotFactory(start_time=datetime(2016, 2, 2, 10), end_time=datetime(2016, 2, 2, 11))
+        TimeSlotFactory(start_time=datetime(2016, 2, 1, 10), end_time=datetime(2016, 2, 1, 11))
+        TimeSlotFactory(start_time=datetime(2016, 2, 1, 14), end_time=datetime(2016, 2, 1, 15))
+        db_session.flush()
+
+        Programme.invalidate()
+        assert Programme.scheduled_dates() == [date(2016, 2, 1), date(2016, 2, 2)]
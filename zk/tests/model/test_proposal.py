@@ -1,6 +1,7 @@
 # pytest magic: from .conftest import app_config, db_session
 
 from .fixtures import PersonFactory, ProposalFactory, ProposalTypeFactory, AttachmentFactory, ReviewFactory
+from .fixtures import ProposalStatusFactory
 
 from zk.model.proposal import Proposal, ProposalType
 from zk.model.person import Person
@@ -125,3 +126,42 @@ class TestProposal(object):
         assert person2 not in proposal.people
 
         assert review in proposal.reviews
+
+    def test_find_next_proposal(self, db_session):
+        withdrawn = ProposalStatusFactory(name='Withdrawn')
+        talk = ProposalTypeFactory()
+        a, b, c = [ProposalFactory(type=talk) for i in range(3)]
+        # Never handed out
+        ProposalFactory(type=talk, status=withdrawn)
+        ProposalFactory()
+        r1, r2, r3 = [PersonFactory() for i in range(3)]
+        ReviewFactory(reviewer=r1, proposal=a)
+        gone = ReviewFactory(reviewer=r2, proposal=a)
+        db_session.flush()
+
+        def review_count(proposal):
+            return db_session.query(Proposal.review_count).filter_by(id=proposal.id).scalar()
+        assert [review_count(p) for p in (a, b, c)] == [2, 0, 0]
+
+        # Least reviewed first, then the one handed out longest ago
+        assert Proposal.find_next_proposal(a.id, talk.id, r3.id) == b.id
+        assert Proposal.find_next_proposal(a.id, talk.id, r3.id) == c.id
+        assert Proposal.find_next_proposal(c.id, talk.id, r3.id) == b.id
+
+        db_session.delete(gone)
+        db_session.flush()
+        assert review_count(a) == 1
+
+        # Moving a review moves its count
+        moved = ReviewFactory(reviewer=r3, proposal=a)
+        db_session.flush()
+        moved.proposal = c
+        db_session.flush()
+        assert [review_count(p) for p in (a, b, c)] == [1, 0, 1]
+        db_session.delete(moved)
+        db_session.flush()
+
+        ReviewFactory(reviewer=r1, proposal=b)
+        ReviewFactory(reviewer=r1, proposal=c)
+        db_session.flush()
+        assert Proposal.find_next_proposal(a.id, talk.id, r1.id) is None
@@ -1,8 +1,10 @@
 # pytest magic: from .conftest import app_config, db_session
 
-from .fixtures import PersonFactory, RegistrationFactory
+from .fixtures import PersonFactory, RegistrationFactory, CompletePersonFactory
+from .fixtures import ProductFactory, ProductCategoryFactory, InvoiceFactory, InvoiceItemFactory
 from zk.model.registration import Registration
 from zk.model.person import Person
+from zk.model.invoice_item import InvoiceItem
 
 
 class TestRegistration(object):
@@ -26,3 +28,41 @@ class TestRegistration(object):
         assert r is not None
         assert r == p.registration
         assert p == r.person
+
+    def test_find_for_badges(self, db_session):
+        ticket = ProductFactory(category=ProductCategoryFactory(name='Ticket'))
+
+        def registration(lastname, description, cost=0):
+            r = RegistrationFactory(person=CompletePersonFactory(lastname=lastname))
+            InvoiceItemFactory(invoice=InvoiceFactory(person=r.person), product=ticket, description=description, cost=cost)
+            return r
+
+        hobbyist = registration('Zed', 'Hobbyist Ticket')
+        professional = registration('abbot', 'Professional Ticket')
+        printed = registration('Brown', 'Hobbyist Ticket')
+        printed.person.badge_printed = True
+        unpaid = registration('Cole', 'Hobbyist Ticket', cost=100)
+        dinner = InvoiceItemFactory(invoice=InvoiceFactory(person=hobbyist.person), description='Penguin Dinner', cost=0)
+        db_session.flush()
+
+        assert Registration.find_for_badges('all') == [professional, hobbyist]
+        assert Registration.find_for_badges('hobby') == [hobbyist]
+        assert Registration.find_for_badges('speaker') == []
+        assert Registration.find_for_badges('nonesuch') == []
+
+        items = InvoiceItem.find_paid_by_people([hobbyist.person_id, unpaid.person_id])
+        assert [i.description for i in items[hobbyist.person_id]] == ['Hobbyist Ticket', 'Penguin Dinner']
+        assert items[unpaid.person_id] == []
+
+    def test_find_for_export(self, db_session):
+        r = RegistrationFactory(person=CompletePersonFactory())
+        InvoiceItemFactory(invoice=InvoiceFactory(person=r.person), description='Hobbyist Ticket')
+        other = RegistrationFactory(person=CompletePersonFactory())
+        db_session.flush()
+        db_session.expunge_all()
+
+        [loaded] = Registration.find_for_export([r.id])
+        assert loaded.id == r.id
+        # Loaded up front, not a query for each row of the export
+        for obj, name in [(loaded, 'products'), (loaded.person, 'invoices'), (loaded.person, 'roles'), (loaded.person.invoices[0], 'items')]:
+            assert name in obj.__dict__
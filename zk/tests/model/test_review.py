@@ -2,6 +2,8 @@
 
 from .fixtures import ReviewFactory, ProposalFactory, StreamFactory, PersonFactory
 from zk.model.review import Review
+from zk.model.proposal import Proposal
+from zk.model.review_stats import ProposalReviewStats, ProposalScoreCount
 
 import pytest
 
@@ -22,3 +24,47 @@ class TestReviewModel(object):
         # raise an exception when trying to commit this
         with pytest.raises(Exception):
             db_session.flush()
+
+    def test_review_stats(self, db_session):
+        """Test that the review stats follow the reviews of each proposal"""
+        a, b = ProposalFactory(), ProposalFactory()
+        r1, r2, r3 = [PersonFactory() for i in range(3)]
+        ReviewFactory(reviewer=r1, proposal=a, score=2)
+        ReviewFactory(reviewer=r2, proposal=a, score=-1)
+        declined = ReviewFactory(reviewer=r3, proposal=a, score=None)
+        db_session.flush()
+
+        def stats(proposal):
+            row = db_session.query(ProposalReviewStats).get(proposal.id)
+            return row and (row.reviews, row.declined, float(row.average), row.max_score, row.min_score)
+
+        def scores(proposal):
+            return sorted((c.score, c.reviewers) for c in db_session.query(ProposalScoreCount).filter_by(proposal_id=proposal.id))
+
+        db_session.expire_all()
+        assert stats(a) == (2, 1, 0.5, 2, -1)
+        assert scores(a) == [(-1, 1), (2, 1)]
+        assert stats(b) is None
+
+        # Changing, moving and deleting reviews refreshes both proposals
+        declined.score = 2
+        ReviewFactory(reviewer=r1, proposal=b, score=1)
+        db_session.flush()
+        db_session.expire_all()
+        assert stats(a) == (3, 0, 1.0, 2, -1)
+        assert scores(a) == [(-1, 1), (2, 2)]
+
+        declined.proposal = b
+        db_session.flush()
+        db_session.expire_all()
+        assert stats(a) == (2, 0, 0.5, 2, -1)
+        assert stats(b) == (2, 0, 1.5, 2, 1)
+
+        db_session.delete(declined)
+        db_session.flush()
+        db_session.expire_all()
+        assert stats(b) == (1, 0, 1.0, 1, 1)
+        assert scores(b) == [(1, 1)]
+
+        results = Proposal.find_review_summary().filter(Proposal.id == a.id).all()
+        assert [(r.Proposal, r.reviews, r.declined, float(r.average)) for r in results] == [(a, 2, 0, 0.5)]
@@ -49,3 +49,28 @@ class TestRole(object):
         assert r1 not in p4.roles
         assert r2 not in p1.roles
         assert r2 not in p3.roles
+
+    def test_catalogue(self, db_session):
+        role = RoleFactory(name='catalogued')
+        db_session.flush()
+
+        # Roles flushed in this session are found before they are committed
+        assert Role.exists('catalogued')
+        assert Role.exists('CATALOGUED')
+        assert not Role.exists('not_a_role')
+
+        person = PersonFactory(roles=[role])
+        db_session.flush()
+        assert person.has_role('catalogued')
+        assert not person.has_role('not_a_role')
+
+        db_session.delete(role)
+        db_session.flush()
+        assert not Role.exists('catalogued')
+
+        # Other sessions, and processes, see the change once committed
+        db_session.commit()
+        assert not Role.exists('catalogued')
+        RoleFactory(name='committed')
+        db_session.commit()
+        assert Role.exists('committed')
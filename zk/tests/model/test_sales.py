@@ -0,0 +1,47 @@
+# pytest magic: from .conftest import app_config, db_session
+
+from datetime import date, datetime
+
+from .fixtures import ProductFactory, ProductCategoryFactory, InvoiceFactory, InvoiceItemFactory
+from zk.model.payment_received import PaymentReceived
+from zk.model.sales import SalesTimeseries, cumulative, rolling
+
+
+class TestSalesTimeseries(object):
+    def test_sales(self, db_session):
+        day1 = datetime(2016, 1, 1, 10)
+        day2 = datetime(2016, 1, 2, 10)
+        ticket = ProductFactory(category=ProductCategoryFactory(name='Ticket'))
+        shirt = ProductFactory()
+
+        # Paid on day 2
+        paid = InvoiceFactory(creation_timestamp=day1)
+        InvoiceItemFactory(invoice=paid, product=ticket, qty=2, cost=100)
+        InvoiceItemFactory(invoice=paid, product=shirt, qty=1, cost=50)
+        db_session.add(PaymentReceived(invoice=paid, approved=True, amount_paid=250, creation_timestamp=day2,
+            success_code='0', response_text='', client_ip_zookeepr='', client_ip_gateway='', email_address=''))
+        # Nothing to pay, so paid when created
+        free = InvoiceFactory(creation_timestamp=day1)
+        InvoiceItemFactory(invoice=free, product=ticket, qty=1, cost=0)
+        # Neither unpaid nor void invoices count
+        InvoiceItemFactory(invoice=InvoiceFactory(creation_timestamp=day1), product=ticket, qty=5, cost=100)
+        void = InvoiceItemFactory(invoice=InvoiceFactory(creation_timestamp=day1), product=ticket, qty=5, cost=0)
+        void.invoice.void = 'Testing'
+        db_session.flush()
+
+        sales = SalesTimeseries.load()
+
+        days = sales.by_date()
+        assert [(s.date, s.invoices, s.qty, s.revenue) for s in days] == [(date(2016, 1, 1), 1, 1, 0), (date(2016, 1, 2), 1, 3, 250)]
+
+        tickets = sales.by_product('Ticket')
+        assert [(s.date, s.product.id, s.qty, s.revenue) for s in tickets] == [(date(2016, 1, 1), ticket.id, 1, 0), (date(2016, 1, 2), ticket.id, 2, 200)]
+        assert len(sales.by_product()) == 3
+        assert sorted((s.date, s.qty) for s in sales.by_category()) == [(date(2016, 1, 1), 1), (date(2016, 1, 2), 1), (date(2016, 1, 2), 2)]
+
+        cumulative(tickets)
+        assert [s.cumulative['qty'] for s in tickets] == [1, 3]
+        rolling(tickets, 1)
+        assert [s.rolling['qty'] for s in tickets] == [1, 2]
+        rolling(days, 2, ('invoices',))
+        assert [s.rolling['invoices'] for s in days] == [1, 2]
@@ -7,12 +7,18 @@ from mako.lookup import TemplateLookup
 from mako import exceptions
 from pylons import config
 import sqlalchemy
+from sqlalchemy.exc import SQLAlchemyError
 
 import zkpylons.lib.app_globals as app_globals
 import zkpylons.lib.helpers
 from zkpylons.config.routing import make_map
-from zkpylons.model import init_model
+from zkpylons.model import init_model, meta
 from zkpylons.model.config import Config
+from zkpylons.model.role import Role
+from zkpylons.model.db_content import DbContent
+from zkpylons.model.stock import StockLevels
+from zkpylons.model.schedule import ScheduleFeed
+from zkpylons.model.programme import Programme
 
 from zkpylons.config.zkpylons_config import initialise_file_paths
 
@@ -28,6 +34,28 @@ def handle_mako_error(context, exc):
     raise (exc, None, st)
 
 
+def preload_model_caches():
+    """Fill the in-memory model caches before the first request.
+
+    The tables won't exist yet when called from websetup, in which case the
+    caches are left empty and load themselves on first use.
+    """
+    # Nothing cached by an earlier app in this process (e.g. between tests)
+    # can be trusted
+    DbContent.invalidate_sidebar()
+    StockLevels.invalidate()
+    ScheduleFeed.invalidate()
+    Programme.invalidate()
+
+    try:
+        Role.refresh_catalogue()
+        Config.preload()
+    except SQLAlchemyError:
+        pass
+    finally:
+        meta.Session.remove()
+
+
 def load_environment(global_conf, app_conf):
     """Configure the Pylons environment via the ``pylons.config``
     object
@@ -52,6 +80,12 @@ def load_environment(global_conf, app_conf):
     # Initialize config with the basic options
     config.init_app(global_conf, app_conf, package='zkpylons', paths=paths)
 
+    preload_model_caches()
+
+    # Forked now, before the server starts any threads
+    from zkpylons.lib.photocomp import thumbnails
+    thumbnails.start()
+
     config['routes.map'] = make_map(config)
     config['pylons.app_globals'] = app_globals.Globals(config)
     
@@ -2,7 +2,6 @@
 from beaker.middleware import CacheMiddleware, SessionMiddleware
 from paste.cascade import Cascade
 from paste.registry import RegistryManager
-from paste.urlparser import StaticURLParser
 from paste.deploy.converters import asbool
 from pylons import config
 from pylons.middleware import ErrorHandler, StatusCodeRedirect
@@ -14,6 +13,8 @@ from paste.pony import PonyMiddleware
 import authkit.authenticate
 
 from zkpylons.config.environment import load_environment
+from zkpylons.lib.fileserve import StaticFileParser
+from zkpylons.lib.instrument import InstrumentMiddleware
 
 
 def  make_app(global_conf, full_stack=True, static_files=True, **app_conf):
@@ -58,6 +59,10 @@ def  make_app(global_conf, full_stack=True, static_files=True, **app_conf):
     # Ponies!
     app = PonyMiddleware(app)
 
+    # Query counts and timings per action, see /admin/action_stats
+    if asbool(config.get('instrument', 'true')):
+        app = InstrumentMiddleware(app)
+
     # CUSTOM MIDDLEWARE END
 
     if asbool(full_stack):
@@ -80,7 +85,7 @@ def  make_app(global_conf, full_stack=True, static_files=True, **app_conf):
         # Serve static files
         static_app = []
         for static_files_dir in config['pylons.paths']['static_files']:
-            static_app.append(StaticURLParser(static_files_dir))
+            static_app.append(StaticFileParser(static_files_dir))
         static_apps = Cascade(static_app, catch=(404,))
         app = Cascade([static_apps, app])
     app.config = config
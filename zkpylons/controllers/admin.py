@@ -10,7 +10,7 @@ import zkpylons.lib.helpers as h
 from formencode import validators, htmlfill
 from formencode.variabledecode import NestedVariables
 
-from zkpylons.lib.base import BaseController, render
+from zkpylons.lib.base import BaseController, render, no_sidebar
 from zkpylons.lib.validators import BaseSchema
 
 from authkit.authorize.pylons_adaptors import authorize
@@ -23,6 +23,7 @@ from zkpylons.model import Fulfilment, FulfilmentItem, FulfilmentType, Fulfilmen
 from zkpylons.model.funding_review import FundingReview
 from zkpylons.model.payment_received import PaymentReceived
 from zkpylons.model.invoice_item import InvoiceItem
+from zkpylons.model.sales import SalesTimeseries, cumulative, rolling
 from zkpylons.model.rego_note import RegoNote
 from zkpylons.model.social_network import SocialNetwork
 from zkpylons.model.special_registration import SpecialRegistration
@@ -30,6 +31,8 @@ from zkpylons.model.volunteer import Volunteer
 from zkpylons.model.config import Config
 
 from zkpylons.lib.ssl_requirement import enforce_ssl
+from zkpylons.lib.export import sql_csv_response
+from zkpylons.lib import instrument
 
 from sqlalchemy import and_, or_, func
 
@@ -210,6 +213,31 @@ class AdminController(BaseController):
         c.text = "Total: %d" % total
         return table_response()
 
+    @authorize(h.auth.has_organiser_role)
+    def action_stats(self):
+        """ SQL statements, database, render and total time per action over recent requests. [ZK] """
+        c.columns = ('action', 'requests', 'statements (mean)', 'statements (max)', 'db ms (mean)',
+                     'render ms (mean)', 'total ms (mean)', 'total ms (max)', 'peak memory growth kB (max)',
+                     'requests with repeated statements', 'most repeats', 'most repeated statement')
+        c.data = []
+        for row in instrument.stats.summary():
+            c.data.append([row['action'], row['requests'],
+                           '%.1f' % row['statements_mean'], row['statements_max'],
+                           '%.1f' % row['db_ms_mean'], '%.1f' % row['render_ms_mean'],
+                           '%.1f' % row['total_ms_mean'], '%.1f' % row['total_ms_max'],
+                           row['memory_kb_max'], row['repeated_requests'],
+                           row['repeated_max'], row['repeated_statement'] or ''])
+        c.text = "Figures are for the last %d requests of each action handled by this process. " % instrument.stats.window
+        c.text += "Statements run %d or more times in one request are counted as repeated, usually a sign of N+1 queries." % instrument.repeat_threshold
+        return table_response()
+
+    @no_sidebar
+    @authorize(h.auth.has_organiser_role)
+    @jsonify
+    def action_stats_json(self):
+        """ JSON of the action_stats report, for monitoring. [ZK] """
+        return {'window': instrument.stats.window, 'actions': instrument.stats.summary()}
+
     @authorize(h.auth.has_organiser_role)
     def list_attachments(self):
         """ List of attachments [CFP] """
@@ -258,34 +286,28 @@ class AdminController(BaseController):
                     proposal.id,
                     proposal.title,
                     proposal_type.name AS "proposal type",
-                    review.score,
-                    COUNT(review.id) AS "#reviewers at this score",
-                    (
-                        SELECT COUNT(review2.id)
-                            FROM review as review2
-                            WHERE review2.proposal_id = proposal.id
-                    ) AS "#total reviewers",
+                    score_count.score,
+                    score_count.reviewers AS "#reviewers at this score",
+                    stats.reviews + stats.declined AS "#total reviewers",
                     CAST(
                         CAST(
-                            COUNT(review.id) AS float(8)
+                            score_count.reviewers AS float(8)
                         ) / CAST(
-                            (SELECT COUNT(review2.id)
-                                FROM review as review2
-                                WHERE review2.proposal_id = proposal.id
-                            ) AS float(8)
+                            stats.reviews + stats.declined AS float(8)
                         ) AS numeric(8,2)
                     ) AS "#reviewers at this score / #total reviews %%"
                 FROM proposal
-                    LEFT JOIN review ON (proposal.id=review.proposal_id)
+                    JOIN proposal_review_stats AS stats ON (proposal.id=stats.proposal_id)
+                    JOIN (
+                        SELECT proposal_id, score, reviewers
+                            FROM proposal_score_count
+                        UNION ALL
+                        SELECT proposal_id, NULL, declined
+                            FROM proposal_review_stats
+                            WHERE declined != 0
+                    ) AS score_count ON (proposal.id=score_count.proposal_id)
                     LEFT JOIN proposal_type ON (proposal.proposal_type_id=proposal_type.id)
-                WHERE
-                    (
-                        SELECT COUNT(review2.id)
-                            FROM review as review2
-                            WHERE review2.proposal_id = proposal.id
-                    ) != 0
-                GROUP BY proposal.id, proposal.title, review.score, proposal_type.name
-                ORDER BY proposal_type.name ASC, review.score DESC, "#reviewers at this score / #total reviews %%" DESC, proposal.id ASC"""
+                ORDER BY proposal_type.name ASC, score_count.score DESC, "#reviewers at this score / #total reviews %%" DESC, proposal.id ASC"""
 
         return sql_response(query)
 
@@ -297,13 +319,12 @@ class AdminController(BaseController):
                     proposal.id,
                     proposal.title,
                     proposal_type.name AS "proposal type",
-                    MAX(review.score) AS max,
-                    MIN(review.score) AS min,
-                    ROUND(AVG(review.score),2) AS avg
+                    stats.max_score AS max,
+                    stats.min_score AS min,
+                    ROUND(stats.average,2) AS avg
                 FROM proposal
-                    LEFT JOIN review ON (proposal.id=review.proposal_id)
+                    LEFT JOIN proposal_review_stats AS stats ON (proposal.id=stats.proposal_id)
                     LEFT JOIN proposal_type ON (proposal.proposal_type_id=proposal_type.id)
-                GROUP BY proposal.id, proposal.title, proposal_type.name
                 ORDER BY proposal_type.name ASC, max DESC, min DESC, avg DESC, proposal.id ASC
                 """)
 
@@ -336,11 +357,10 @@ class AdminController(BaseController):
                     proposal.id,
                     proposal.title,
                     proposal_type.name AS "proposal type",
-                    COUNT(review.id) AS "reviewers"
+                    COALESCE(stats.reviews + stats.declined, 0) AS "reviewers"
                 FROM proposal
-                    LEFT JOIN review ON (proposal.id=review.proposal_id)
+                    LEFT JOIN proposal_review_stats AS stats ON (proposal.id=stats.proposal_id)
                     LEFT JOIN proposal_type ON (proposal.proposal_type_id=proposal_type.id)
-                GROUP BY proposal.id, proposal.title, proposal_type.name
                 ORDER BY reviewers ASC, proposal.id ASC
                 """)
 
@@ -432,6 +452,7 @@ class AdminController(BaseController):
         return render('/angular.mako')
 
     # TODO: Unauthorised access gives 200 response, which is read as good
+    @no_sidebar
     @authorize(h.auth.has_organiser_role)
     @jsonify
     @dispatch_on(PUT="_put_config", GET="_get_config")
@@ -519,7 +540,7 @@ class AdminController(BaseController):
         c.text = ''
         c.columns = ('id', 'name', 'firstname', 'email_address', 'country', 'speaker', 'keynote', 'dietary_requirements', 'special_requirements', 'paid')
         c.noescape = True
-        for r in meta.Session.query(Registration).all():
+        for r in Registration.load_person_status(meta.Session.query(Registration).all()):
           # We only care about people that have valid invoices.
           if not r.person.has_valid_invoice():
             continue
@@ -558,7 +579,8 @@ class AdminController(BaseController):
         c.data = []
         c.noescape = True
         cons_list = ('video_release', 'slides_release')
-        speaker_list = [p for p in meta.Session.query(Person).order_by(Person.lastname, Person.firstname).all() if p.is_speaker() or p.is_miniconf_org()]
+        people = Person.load_status(meta.Session.query(Person).order_by(Person.lastname, Person.firstname).all())
+        speaker_list = [p for p in people if p.is_speaker() or p.is_miniconf_org()]
 
         for p in speaker_list:
             res = []
@@ -999,7 +1021,7 @@ class AdminController(BaseController):
         <p><textarea cols="100" rows="25">"""
 
         count = 0
-        for r in meta.Session.query(Registration).all():
+        for r in Registration.load_person_status(meta.Session.query(Registration).all()):
             if r.person.is_speaker():
                 p = r.person
                 c.text += p.fullname + " &lt;" + p.email_address + "&gt;\n"
@@ -1063,7 +1085,7 @@ class AdminController(BaseController):
         total_partners = 0
         total_dinner = 0
         speakers_count = 0
-        for person in meta.Session.query(Person).all():
+        for person in Person.load_status(meta.Session.query(Person).all()):
             partners = []
             dinner_tickets = 0
             if person.is_speaker():
@@ -1205,7 +1227,7 @@ class AdminController(BaseController):
     def _keysigning_participants(self):
         registration_list = meta.Session.query(Registration).join('person').filter(Registration.keyid != None).filter(Registration.keyid != '').order_by(Person.lastname).all()
         key_list = list()
-        for registration in registration_list:
+        for registration in Registration.load_person_status(registration_list):
             if registration.person.has_paid_ticket():
                 key_list.append(registration.keyid)
         return key_list
@@ -1216,7 +1238,7 @@ class AdminController(BaseController):
         import zkpylons.model
         checkedin = zkpylons.model.metadata.bind.execute("SELECT person_id FROM checkins WHERE conference IS NOT NULL");
         checkedin_list = checkedin.fetchall()
-        registration_list = meta.Session.query(Registration).all()
+        registration_list = Registration.load_person_status(meta.Session.query(Registration).all())
         c.columns = ['ID', 'Name', 'Type', 'Shirts', 'Dinner Tickets', 'Partners Programme']
         c.data = []
         for registration in registration_list:
@@ -1298,7 +1320,7 @@ class AdminController(BaseController):
     def speakers_by_country(self):
         """ Speakers by country [Statistics] """
         data = {}
-        for person in meta.Session.query(Person).all():
+        for person in Person.load_status(meta.Session.query(Person).all()):
             if person.is_speaker():
                 country = person.country.capitalize()
                 data[country] = data.get(country, 0) + 1
@@ -1469,7 +1491,7 @@ class AdminController(BaseController):
 
     @authorize(h.auth.has_organiser_role)
     def rego_foreign(self):
-        people = [ r.person for r in Registration.find_all() ]
+        people = [ r.person for r in Registration.load_person_status(Registration.find_all()) ]
         c.columns = ['Name', 'Country']
         c.data = []
         for person in people:
@@ -1484,7 +1506,7 @@ class AdminController(BaseController):
         """ List of paid regos - for rego desk. [Registrations] """
         people = [
            ((r.person.lastname or '').lower(), (r.person.firstname or '').lower(), r.id, r.person)
-                                                 for r in Registration.find_all()]
+                                                 for r in Registration.load_person_status(Registration.find_all())]
         people.sort()
         people = [row[-1] for row in people]
 
@@ -1633,96 +1655,80 @@ class AdminController(BaseController):
     @authorize(h.auth.has_organiser_role)
     def paid_counts_by_date(self):
         """ Number of paid (or zerod) invoices by date. [Registrations] """
-        invoices = Invoice.find_all()
-
-        payments_count = dict()
-        for i in invoices:
-          if i.is_paid and not i.is_void:
-            if i.total == 0:
-              date = i.creation_timestamp.date()
-            else:
-              date = i.good_payments[0].creation_timestamp.date()
-
-            if date not in payments_count:
-              payments_count[date] = 0
-
-            payments_count[date] += 1
-
-        c.data = []
+        sales = SalesTimeseries.load().by_date()
+        c.columns = ['Date', 'Count']
+        c.data = [["%s" % s.date, str(s.invoices)] for s in sales]
         c.noescape = True
-        c.columns = ['Date', 'Count' ]
-        if len(payments_count) > 0:
-          dates = payments_count.keys()
-          dates.sort()
-
-          for date in dates:
-            row = [ "%s" % date, str(payments_count[date]) ]
-            c.data.append(row)
-
+        self._sales_windows(sales, ('invoices',))
         return table_response()
 
     @authorize(h.auth.has_organiser_role)
     def paid_product_by_date(self):
-        """ Number of paid (actual payments only) invoices per ceiling by date. [Registrations] """
-        return sql_response("""
-            SELECT
-                DATE(payment_received.creation_timestamp) AS date,
-                product_category.name,
-                product.description AS product,
-                SUM(invoice_item.qty - invoice_item.free_qty) AS qty,
-                SUM(invoice_item.cost * (invoice_item.qty - invoice_item.free_qty)) / 100 AS total
-            FROM payment_received
-            JOIN invoice ON (payment_received.invoice_id=invoice.id)
-            JOIN invoice_item ON (invoice.id=invoice_item.invoice_id)
-            JOIN product ON (invoice_item.product_id = product.id)
-            JOIN product_category ON (product.category_id=product_category.id)
-            WHERE payment_received.approved = 't'
-            GROUP BY product_category.name, product_category.display_order, product.display_order, product.description, DATE(payment_received.creation_timestamp)
-            HAVING SUM(invoice_item.qty - invoice_item.free_qty) != 0 AND SUM(invoice_item.cost * (invoice_item.qty - invoice_item.free_qty)) != 0
-            ORDER BY product_category.display_order, DATE(payment_received.creation_timestamp), product.display_order;
-        """)
+        """ Quantity and revenue of paid invoices per product by date. [Registrations] """
+        sales = SalesTimeseries.load().by_product()
+        sales.sort(key=lambda s: (s.category.display_order, s.date, s.product.display_order))
+        return self._sales_response(sales, category=True)
+
+    @authorize(h.auth.has_organiser_role)
+    def paid_category_by_date(self):
+        """ Quantity and revenue of paid invoices per product category by date. [Registrations] """
+        sales = SalesTimeseries.load().by_category()
+        sales.sort(key=lambda s: (s.category.display_order, s.date))
+        return self._sales_response(sales, category=True, product=False)
 
     @authorize(h.auth.has_organiser_role)
     def paid_ticket_by_date(self):
-        """ Number of paid (actual payments only) invoices per ceiling by date. [Registrations] """
-        return sql_response("""
-            SELECT
-                DATE(payment_received.creation_timestamp) AS date,
-                product.description AS product,
-                SUM(invoice_item.qty - invoice_item.free_qty) AS qty,
-                SUM(invoice_item.cost * (invoice_item.qty - invoice_item.free_qty)) / 100 AS total
-            FROM payment_received
-            JOIN invoice ON (payment_received.invoice_id=invoice.id)
-            JOIN invoice_item ON (invoice.id=invoice_item.invoice_id)
-            JOIN product ON (invoice_item.product_id = product.id)
-            JOIN product_category ON (product.category_id=product_category.id)
-            WHERE payment_received.approved = 't'
-            AND product_category.name = 'Ticket'
-            GROUP BY product_category.name, product_category.display_order, product.display_order, product.description, DATE(payment_received.creation_timestamp)
-            HAVING SUM(invoice_item.qty - invoice_item.free_qty) != 0 AND SUM(invoice_item.cost * (invoice_item.qty - invoice_item.free_qty)) != 0
-            ORDER BY product_category.display_order, DATE(payment_received.creation_timestamp), product.display_order;
-        """)
+        """ Quantity and revenue of paid invoices per ticket by date. [Registrations] """
+        return self._sales_response(SalesTimeseries.load().by_product('Ticket'))
 
     @authorize(h.auth.has_organiser_role)
     def paid_accom_by_date(self):
-        """ Number of paid (actual payments only) invoices per ceiling by date. [Registrations] """
-        return sql_response("""
-            SELECT
-                DATE(payment_received.creation_timestamp) AS date,
-                product.description AS product,
-                SUM(invoice_item.qty - invoice_item.free_qty) AS qty,
-                SUM(invoice_item.cost * (invoice_item.qty - invoice_item.free_qty)) / 100 AS total
-            FROM payment_received
-            JOIN invoice ON (payment_received.invoice_id=invoice.id)
-            JOIN invoice_item ON (invoice.id=invoice_item.invoice_id)
-            JOIN product ON (invoice_item.product_id = product.id)
-            JOIN product_category ON (product.category_id=product_category.id)
-            WHERE payment_received.approved = 't'
-            AND product_category.name = 'Accommodation'
-            GROUP BY product_category.name, product_category.display_order, product.display_order, product.description, DATE(payment_received.creation_timestamp)
-            HAVING SUM(invoice_item.qty - invoice_item.free_qty) != 0 AND SUM(invoice_item.cost * (invoice_item.qty - invoice_item.free_qty)) != 0
-            ORDER BY product_category.display_order, DATE(payment_received.creation_timestamp), product.display_order;
-        """)
+        """ Quantity and revenue of paid invoices per accommodation by date. [Registrations] """
+        return self._sales_response(SalesTimeseries.load().by_product('Accommodation'))
+
+    def _sales_response(self, sales, category=False, product=True):
+        """ Table of Sales, leaving out free and zero quantity rows. """
+        sales = [s for s in sales if s.qty != 0 and s.revenue != 0]
+        c.columns = ['Date']
+        if category:
+            c.columns.append('Category')
+        if product:
+            c.columns.append('Product')
+        c.columns += ['Qty', 'Total']
+        c.data = []
+        for s in sales:
+            row = ["%s" % s.date]
+            if category:
+                row.append(s.category.name)
+            if product:
+                row.append(s.product.description)
+            row += [s.qty, h.integer_to_currency(s.revenue)]
+            c.data.append(row)
+        self._sales_windows(sales, ('qty', 'revenue'))
+        return table_response()
+
+    def _sales_windows(self, sales, fields):
+        """ Add running total columns for ?cumulative=1 and rolling N day
+        total columns for ?rolling=N to the table of sales. """
+        def fmt(field, value):
+            if field == 'revenue':
+                return h.integer_to_currency(value)
+            return value
+
+        if request.GET.get('cumulative'):
+            cumulative(sales, fields)
+            c.columns += ['Total %s' % f for f in fields]
+            for row, s in zip(c.data, sales):
+                row += [fmt(f, s.cumulative[f]) for f in fields]
+        try:
+            days = int(request.GET.get('rolling', 0))
+        except ValueError:
+            days = 0
+        if days > 0:
+            rolling(sales, days, fields)
+            c.columns += ['%s over %d days' % (f, days) for f in fields]
+            for row, s in zip(c.data, sales):
+                row += [fmt(f, s.rolling[f]) for f in fields]
 
     @authorize(h.auth.has_organiser_role)
     def av_norelease(self):
@@ -1772,7 +1778,7 @@ class AdminController(BaseController):
     def random_delegates(self):
         """ Select 20 random (paid, non-volunteer, non-organiser, non-speaker, non-media) delegates for prize draws """
 
-        delegate_list = Registration.find_all()
+        delegate_list = Registration.load_person_status(Registration.find_all())
         random.shuffle(delegate_list)
         filtered_list = []
 
@@ -2005,26 +2011,17 @@ class AdminController(BaseController):
 
     @authorize(h.auth.has_organiser_role)
     def generate_boardingpass(self):
-        """ For every fulfilment group, generate a boarding pass
+        """ For every fulfilment group, generate a boarding pass. Runs in the
+            background, reload to see how far it has got
             [Registration,Invoicing] """
-        from zkpylons.lib import pdfgen
-        from zkpylons.config.zkpylons_config import get_path
-        groups = FulfilmentGroup.find_all()
-        for group in groups:
-            c.fulfilment_group = group
-
-            xml_s = render('/fulfilment_group/pdf.mako')
-            xsl_f = app_globals.mako_lookup.get_template('/fulfilment_group/pdf.xsl').filename
-            pdf_data = pdfgen.generate_pdf(xml_s, xsl_f)
-
-            if c.fulfilment_group.person:
-                filename = c.fulfilment_group.person.email_address + '.pdf'
-            else:
-                filename = Config.get('event_shortname') + '_' + str(c.fulfilment_group.id) + '.pdf'
-            pdf = open(get_path('zk_root') + '/boardingpass/' + filename, 'w')
-            pdf.write(pdf_data)
-            pdf.close()
-        return "Completed"
+        from pylons import config
+        from zkpylons.lib import boardingpass
+        progress = boardingpass.JobProgress(os.path.join(boardingpass.default_output_dir(), boardingpass.BoardingPassJob.PROGRESS_NAME))
+        if not progress.load().running:
+            last_run = str(progress)
+            boardingpass.start_process(config['__file__'])
+            return "Started, reload to see how it is going. Last run: " + last_run
+        return str(progress)
 
     @authorize(h.auth.has_organiser_role)
     def generate_fulfilment_codes(self):
@@ -2064,22 +2061,9 @@ def _keysigning_pdf(keyid):
     return pdf
 
 def csv_response(sql):
-    res = meta.Session.execute(sql)
-    c.columns = get_column_names(res)
-    c.data = res.fetchall()
-    c.sql = sql
-
-    # Convert to utf-8 so that csv writer can handle the strings
-    c.data = [[unicode(s).encode("utf-8") for s in row] for row in c.data]
-
-    import csv, StringIO
-    f = StringIO.StringIO()
-    w = csv.writer(f)
-    w.writerow(c.columns)
-    w.writerows(c.data)
-    response.headers['Content-type']='text/plain; charset=utf-8'
-    response.headers['Content-Disposition']='attachment; filename="table.csv"'
-    return f.getvalue()
+    """ Stream the results of the SQL statement as CSV, a batch of rows at
+    a time, rather than holding the whole result set in memory. """
+    return sql_csv_response(sql)
 
 #
 # Something changed between sqlalchmey 0.5.7 and 0.6.4.  ResultProxy.keys
@@ -2096,6 +2080,9 @@ def sql_execute(sql):
     res = zkpylons.model.metadata.bind.execute(sql)
     return res
 
+# Rows shown on each page of an sql_response report
+report_page_size = 100
+
 def sql_response(sql):
     """ This function bypasses all the MVC stuff and just puts up a table
     of results from the given SQL statement.
@@ -2105,17 +2092,81 @@ def sql_response(sql):
     Example:
         def foo(self):
             return sql_response('select * from person')
+
+    The table is shown a page at a time, sorted by any of its columns, with
+    the request parameters:
+        page      page number, from 1
+        per_page  rows per page, 0 for all of them
+        sort      name of the column to sort by
+        desc      sort descending if set
+    The CSV export always has every row.
     """
     if request.GET.has_key('csv'):
         return csv_response(sql)
-    res = meta.Session.execute(sql)
+
+    sql = sql.strip().rstrip(';')
+    try:
+        per_page = int(request.GET.get('per_page', report_page_size))
+    except ValueError:
+        per_page = report_page_size
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    offset = 0
+    if per_page > 0:
+        offset = (page - 1) * per_page
+
+    # The newline keeps a trailing -- comment from swallowing the bracket
+    query = 'SELECT * FROM (%s\n) AS report' % sql
+    c.sort = request.GET.get('sort')
+    c.desc = bool(request.GET.get('desc'))
+    if c.sort:
+        # Only ever sort by position so nothing from the request ends up
+        # in the SQL. Fetching no rows just gives us the column names.
+        columns = get_column_names(meta.Session.execute(query + ' LIMIT 0'))
+        if c.sort in columns:
+            query += ' ORDER BY %d %s' % (columns.index(c.sort) + 1, c.desc and 'DESC' or 'ASC')
+        else:
+            c.sort = None
+    if per_page > 0:
+        # One more than the page so we know whether there is another
+        query += ' LIMIT %d OFFSET %d' % (per_page + 1, offset)
+
+    res = meta.Session.execute(query)
     c.columns = get_column_names(res)
-    if hasattr(c.columns, "__call__"):        # work around for bug in sqlalchemy 0.5.7
-      c.columns = c.columns()
     c.data = res.fetchall()
     c.sql = sql
+
+    c.page = page
+    c.per_page = per_page
+    c.first_row = offset + 1
+    c.more = per_page > 0 and len(c.data) > per_page
+    if c.more:
+        c.data = c.data[:per_page]
+        c.total = _estimate_rows(sql)
+        c.total_exact = False
+    else:
+        c.total = offset + len(c.data)
+        c.total_exact = True
+
+    def page_url(**kwargs):
+        params = dict(request.GET.items())
+        params.update(kwargs)
+        return '?' + urllib.urlencode(dict((k, v) for (k, v) in params.items() if v is not None))
+    c.page_url = page_url
     return render('admin/sqltable.mako')
 
+def _estimate_rows(sql):
+    """ The planner's estimate of the number of rows the SQL returns, which
+    is much cheaper than counting them. None if there is no estimate. """
+    if meta.engine.dialect.name != 'postgresql':
+        return None
+    plan = meta.Session.execute('EXPLAIN (FORMAT JSON) ' + sql).scalar()
+    if isinstance(plan, basestring):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
 def sql_data(sql):
     """ This function bypasses all the MVC stuff and just gives you a
     two-dimensional array based on the given SQL statement.
@@ -4,12 +4,13 @@ from pylons import request, response, session, tmpl_context as c
 from zkpylons.lib.helpers import redirect_to
 from pylons.decorators import validate
 from pylons.decorators.rest import dispatch_on
-from pylons.controllers.util import abort
+from pylons.controllers.util import abort, forward
 
 from formencode import validators, htmlfill, ForEach, Invalid
 from formencode.variabledecode import NestedVariables
 
 from zkpylons.lib.base import BaseController, render
+from zkpylons.lib.fileserve import DataApp
 from zkpylons.lib.validators import BaseSchema, ProductValidator
 import zkpylons.lib.helpers as h
 
@@ -78,10 +79,12 @@ class AttachmentController(BaseController):
             # Raise a no_auth error
             h.auth.no_role()
 
-        response.headers['content-type'] = attachment.content_type.encode('ascii','ignore')
-        response.headers.add('content-transfer-encoding', 'binary')
-        response.headers.add('content-length', len(attachment.content))
-        response.headers['content-disposition'] = 'attachment; filename="%s";' % attachment.filename.encode('ascii','ignore')
-        response.headers.add('Pragma', 'cache')
-        response.headers.add('Cache-Control', 'max-age=3600,public')
-        return attachment.content
+        return forward(DataApp(lambda: attachment.content,
+            '%d-%s' % (attachment.id, attachment.last_creation_timestamp.strftime('%Y%m%d%H%M%S%f')),
+            attachment.last_creation_timestamp,
+            content_type=attachment.content_type.encode('ascii','ignore'),
+            headers=[
+                ('Content-Disposition', 'attachment; filename="%s";' % attachment.filename.encode('ascii','ignore')),
+                ('Pragma', 'cache'),
+                ('Cache-Control', 'max-age=3600,public'),
+            ]))
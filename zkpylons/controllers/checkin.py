@@ -1,7 +1,7 @@
 import logging
-import datetime
 
 from pylons import request, response, session, tmpl_context as c
+from pylons.controllers.util import abort
 from zkpylons.lib.helpers import redirect_to
 from pylons.decorators import validate
 from pylons.decorators.rest import dispatch_on
@@ -15,7 +15,6 @@ from zkpylons.lib.validators import BaseSchema, ProductValidator
 import zkpylons.lib.helpers as h
 
 import sqlalchemy as sa
-from sqlalchemy.sql.expression import cast
 
 from authkit.authorize.pylons_adaptors import authorize
 from authkit.permissions import ValidAuthKitUser
@@ -26,7 +25,35 @@ from zkpylons.model import meta, Person, FulfilmentGroup, Fulfilment, Fulfilment
 
 log = logging.getLogger(__name__)
 
+# The most people the desk can fetch with people_data at once
+prefetch_limit = 10
+
+def _text(value):
+    if value is not None and not isinstance(value, basestring):
+        raise ValueError('expected text, got %r' % (value,))
+    return value
+
+def _fulfilment_update(f):
+    """The fields update_fulfilments may change, checked and converted.
+    Raises KeyError, TypeError or ValueError if any are missing or bad."""
+    return dict(
+        id=int(f['id']),
+        version=int(f['version']),
+        type_id=int(f['type_id']),
+        status_id=int(f['status_id']),
+        code=_text(f['code']),
+        items=[dict(
+            id=int(item['id']),
+            product_id=int(item['product_id']),
+            product_text=_text(item['product_text']),
+            qty=int(item['qty']),
+        ) for item in f['fulfilment_items']],
+    )
+
 class CheckinController(BaseController):
+    # The rego desk only talks JSON
+    sidebar = False
+
     @authorize(h.auth.Or(h.auth.has_organiser_role, h.auth.HasZookeeprRole('checkin')))
     def __before__(self, **kwargs):
         pass
@@ -34,123 +61,30 @@ class CheckinController(BaseController):
     @jsonify
     def lookup(self):
         q = request.params['q']
-        # Assume that the SQL library handles the SQL attack vectors
-
-        person_query =  meta.Session.query(Person.id, sa.func.concat(Person.fullname, " - ", Person.email_address).label("pretty")).filter(sa.or_(
-            Person.lastname.ilike(q + '%'),
-            Person.fullname.ilike(q + '%'),
-            Person.email_address.ilike(q + '%'),
-            Person.email_address.ilike('%@' + q + '%'),
-        ))
-
-        personid_query = meta.Session.query(Person.id, sa.func.concat(cast(Person.id, sa.String), " - ", Person.fullname).label("pretty")).filter(
-            cast(Person.id, sa.String).like(q + '%'),
-        )
-
-        boarding_query = meta.Session.query(Person.id, sa.func.concat(FulfilmentGroup.code, " - ", Person.fullname).label("pretty")).join(FulfilmentGroup).filter(
-            FulfilmentGroup.code.ilike(q + '%')
-        )
-
-        badge_query = meta.Session.query(Person.id, sa.func.concat(Fulfilment.code, " - ", Person.fullname).label("pretty")).join(Fulfilment).filter(
-            Fulfilment.code.ilike(q + '%')
-        )
-
-        union_query = person_query.union(personid_query, boarding_query, badge_query).order_by("pretty").limit(5)
-
-        return dict(r=list(union_query.all()))
+        return dict(r=[dict(id=row.id, pretty=row.pretty) for row in Person.find_for_checkin(q)])
 
     @jsonify
     def person_data(self):
         """
         Return the fulfilment data for a person in json format.
-
-        Use direct sql queries because I am too lazy to work out how James' magic queries work.
         """
-
-        id = request.params['id']
-        id = int(id)
-        # Assume that the SQL library sanitizes this somehow somewhere
-
-        person_qry_text = """select p.*
-                             from person p
-                     where p.id = %d
-                  """ % id
-
-        notes_qry = """select rn.* 
-                       from rego_note rn
-                   join registration r on rn.rego_id = r.id
-                   where r.person_id = %d
-                """ % id
-
-        fulfilments_qry = """select f.*, fs.name fulfilment_status, ft.name fulfilment_type
-                             from fulfilment f, 
-                                  fulfilment_status fs ,
-                                  fulfilment_type ft
-                             where person_id = %d
-                               and fs.id = f.status_id
-                               and ft.id = f.type_id
-                  """ % id
-
-        fulfilment_items_qry = """
-                       select fi.*, CONCAT(c.name, ' - ', p.description) AS description
-                       from fulfilment_item fi,
-                            product p,
-                            product_category c
-                       where fulfilment_id = %d
-                         and fi.product_id = p.id
-                         and p.category_id = c.id
-                       """ 
-
-        person_qry = sa.sql.text(person_qry_text)
-        row = meta.Session.execute(person_qry).fetchone()
-
-        person = {}
-        person.update(row)
-        for k in person.keys():
-            if isinstance(person[k], datetime.datetime):
-                    person[k] = person[k].strftime('%d/%m/%Y')
-
-        notes = []
-        for n_row in meta.Session.execute(notes_qry):
-
-            note = {}
-            note.update(n_row)
-            for k in note.keys():
-                if isinstance(note[k], datetime.datetime):
-                        note[k] = note[k].strftime('%d/%m/%Y')
-
-            notes.append(note)
-
-        person['notes'] = notes
-
-        fulfilments = []
-        for f_row in meta.Session.execute(fulfilments_qry).fetchall():
-            fulfilment = {}
-            fulfilment.update(f_row)
-            for k in fulfilment.keys():
-                if isinstance(fulfilment[k], datetime.datetime):
-                        fulfilment[k] = fulfilment[k].strftime('%d/%m/%Y')
-
-            fulfilment_items = []
-            for fi_row in meta.Session.execute(fulfilment_items_qry % fulfilment['id']).fetchall():
-                fulfilment_item = {}
-                fulfilment_item.update(fi_row)
-                for k in fulfilment_item.keys():
-                    if isinstance(fulfilment_item[k], datetime.datetime):
-                            fulfilment_item[k] = fulfilment_item[k].strftime('%d/%m/%Y')
-
-                fulfilment_items.append(fulfilment_item)
-
-
-            fulfilment['fulfilment_items'] = fulfilment_items 
-            fulfilments.append(fulfilment)
-
-        person['fulfilments'] = fulfilments
-
+        id = int(request.params['id'])
+        person = Person.checkin_data([id]).get(id)
+        if person is None:
+            abort(404, "No such person object")
         return person
 
+    @jsonify
+    def people_data(self):
+        """
+        Return the fulfilment data of a few people at once, keyed by id, so
+        the desk can fetch the people a lookup found before one is picked.
+        """
+        ids = [int(id) for id in request.params['ids'].split(',') if id.strip()]
+        return dict((str(id), data) for id, data in Person.checkin_data(ids[:prefetch_limit]).items())
 
-    #@jsonify
+
+    @jsonify
     def update_fulfilments(self):
         """
         Allow the updating of fulfilment data via json.
@@ -158,43 +92,75 @@ class CheckinController(BaseController):
         Only allow a subset of the columns in the tables to be updated.  In particular do 
         not allow the primary keys or the fulfilment_id on the fulfilmment_item table to be changed.
 
-        TODO:
+        Each fulfilment has to come with all of its fulfilment_items and the version it
+        was read at, as person_data gives it.  Nothing is saved unless every fulfilment
+        is still at that version, so two desks editing the same person don't overwrite
+        each other: the ones changed since are returned as conflicts, with a 409, to be
+        loaded again.  The new versions are returned when it works.
 
-        If we don't get all of the fulfilment_items for a fulfilment then throw an error
+        TODO:
 
         If qty for an item is zero then we should delete it.
         """
 
         import json
 
-        debug = ""
-        data = request.params['data']
-        data = json.loads(data)
-
-        for fulfilment in data['fulfilments']:
-            db_fulfilment = Fulfilment.find_by_id(int(fulfilment['id']), abort_404=False)
-            db_fulfilment.type_id = fulfilment['type_id'] 
-            db_fulfilment.status_id = fulfilment['status_id'] 
+        try:
+            data = json.loads(request.params['data'])
+            # Every field is checked before any is applied
+            fulfilments = [_fulfilment_update(f) for f in data['fulfilments']]
+        except (KeyError, TypeError, ValueError), e:
+            meta.Session.rollback()
+            response.status_int = 400
+            return dict(errors=['Bad fulfilment data: %s' % e], conflicts=[])
+
+        db_fulfilments = dict((f.id, f) for f in Fulfilment.find_by_ids([f['id'] for f in fulfilments]))
+        errors = []
+        conflicts = []
+        for fulfilment in fulfilments:
+            id, version = fulfilment['id'], fulfilment['version']
+            db_fulfilment = db_fulfilments.get(id)
+            if db_fulfilment is None:
+                errors.append('No such fulfilment %d' % id)
+                continue
+            if db_fulfilment.version != version:
+                conflicts.append(id)
+                continue
+
+            db_items = dict((item.id, item) for item in db_fulfilment.items)
+            items = fulfilment['items']
+            if sorted(item['id'] for item in items) != sorted(db_items):
+                errors.append('Fulfilment %d: all of its items have to be sent, and no others' % id)
+                continue
+
+            db_fulfilment.type_id = fulfilment['type_id']
+            db_fulfilment.status_id = fulfilment['status_id']
             db_fulfilment.code = fulfilment['code']
-
-            meta.Session.add(db_fulfilment)
-
-            for fulfilment_item in fulfilment['fulfilment_items']:
-                    db_fulfilment_item = FulfilmentItem.find_by_id(fulfilment_item['id'], abort_404=False)
-
-                    db_fulfilment_item.product_id = fulfilment_item['product_id']
-                    db_fulfilment_item.product_text = fulfilment_item['product_text']
-                    db_fulfilment_item.qty = int(fulfilment_item['qty'])
-
-                    meta.Session.add(db_fulfilment_item)
-
-
-            meta.Session.commit()
-        debug += "Committed changes\n"
-        return debug
-
-
-        raise Exception( 'Success')
+            for fulfilment_item in items:
+                db_fulfilment_item = db_items[fulfilment_item['id']]
+                db_fulfilment_item.product_id = fulfilment_item['product_id']
+                db_fulfilment_item.product_text = fulfilment_item['product_text']
+                db_fulfilment_item.qty = fulfilment_item['qty']
+
+            # The fulfilment is updated, so its version checked, even if
+            # only its items changed
+            sa.orm.attributes.flag_modified(db_fulfilment, 'status_id')
+
+        if errors or conflicts:
+            meta.Session.rollback()
+            response.status_int = 400 if errors else 409
+            return dict(errors=errors, conflicts=conflicts)
+
+        try:
+            meta.Session.flush()
+        except sa.orm.exc.StaleDataError:
+            # Changed by someone else since they were loaded above
+            meta.Session.rollback()
+            response.status_int = 409
+            return dict(errors=[], conflicts=sorted(db_fulfilments))
+        versions = dict((str(id), f.version) for id, f in db_fulfilments.items())
+        meta.Session.commit()
+        return dict(fulfilments=versions)
 
     @jsonify
     def get_talk(self):
@@ -8,7 +8,7 @@ from pylons.decorators.rest import dispatch_on
 from formencode import validators, htmlfill
 from formencode.variabledecode import NestedVariables
 
-from zkpylons.lib.base import BaseController, render
+from zkpylons.lib.base import BaseController, render, no_sidebar
 from zkpylons.lib.validators import BaseSchema, DbContentTypeValidator
 import zkpylons.lib.helpers as h
 from datetime import datetime, timedelta
@@ -94,6 +94,7 @@ class DbContentController(BaseController):
         c.db_content = DbContent(**results)
         meta.Session.add(c.db_content)
         meta.Session.commit()
+        DbContent.invalidate_sidebar()
 
         h.flash("New Page Created.")
         redirect_to(action='view', id=c.db_content.id)
@@ -158,6 +159,7 @@ class DbContentController(BaseController):
 
         # update the objects with the validated form data
         meta.Session.commit()
+        DbContent.invalidate_sidebar()
         h.flash("Page updated.")
         redirect_to(action='view', id=id)
 
@@ -172,6 +174,7 @@ class DbContentController(BaseController):
         c.db_content = DbContent.find_by_id(id)
         meta.Session.delete(c.db_content)
         meta.Session.commit()
+        DbContent.invalidate_sidebar()
 
         h.flash("Content Deleted.")
         redirect_to('index')
@@ -200,6 +203,7 @@ class DbContentController(BaseController):
             c.result = False
         return render('/db_content/list_press.mako')
 
+    @no_sidebar
     def rss_news(self):
         news_id = DbContentType.find_by_name("News")
         c.db_content_collection = []
@@ -4,11 +4,13 @@ from pylons import request, response, session, tmpl_context as c
 from zkpylons.lib.helpers import redirect_to
 from pylons.decorators import validate
 from pylons.decorators.rest import dispatch_on
+from pylons.controllers.util import forward
 
 from formencode import validators, htmlfill, ForEach, Invalid
 from formencode.variabledecode import NestedVariables
 
 from zkpylons.lib.base import BaseController, render
+from zkpylons.lib.fileserve import DataApp
 from zkpylons.lib.validators import BaseSchema
 import zkpylons.lib.helpers as h
 
@@ -62,10 +64,12 @@ class FundingAttachmentController(BaseController):
             # Raise a no_auth error
             h.auth.no_role()
 
-        response.headers['content-type'] = attachment.content_type
-        response.headers.add('content-transfer-encoding', 'binary')
-        response.headers.add('content-length', len(attachment.content))
-        response.headers['content-disposition'] = 'attachment; filename="%s";' % attachment.filename
-        response.headers.add('Pragma', 'cache')
-        response.headers.add('Cache-Control', 'max-age=3600,public')
-        return attachment.content
+        return forward(DataApp(lambda: attachment.content,
+            '%d-%s' % (attachment.id, attachment.last_creation_timestamp.strftime('%Y%m%d%H%M%S%f')),
+            attachment.last_creation_timestamp,
+            content_type=str(attachment.content_type),
+            headers=[
+                ('Content-Disposition', 'attachment; filename="%s";' % attachment.filename),
+                ('Pragma', 'cache'),
+                ('Cache-Control', 'max-age=3600,public'),
+            ]))
@@ -13,7 +13,7 @@ from pylons.decorators.rest import dispatch_on
 from formencode import validators, htmlfill, ForEach, Invalid
 from formencode.variabledecode import NestedVariables
 
-from zkpylons.lib.base import BaseController, render
+from zkpylons.lib.base import BaseController, render, no_sidebar
 from zkpylons.lib.ssl_requirement import enforce_ssl
 from zkpylons.lib.validators import BaseSchema, ProductValidator, ExistingPersonValidator, ExistingInvoiceValidator
 import zkpylons.lib.helpers as h
@@ -246,6 +246,7 @@ class InvoiceController(BaseController):
         meta.Session.commit()
         return render("/invoice/payment.mako")
 
+    @no_sidebar
     @authorize(h.auth.has_organiser_role)
     @jsonify
     def get_invoice(self, id):
@@ -270,6 +271,7 @@ class InvoiceController(BaseController):
         }
         return dict(r=dict(invoice=obj))
 
+    @no_sidebar
     @authorize(h.auth.has_organiser_role)
     @jsonify
     def pay_invoice(self, id):
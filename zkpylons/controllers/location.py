@@ -9,7 +9,7 @@ from pylons.decorators.rest import dispatch_on
 from formencode import validators, htmlfill, ForEach, Invalid
 from formencode.variabledecode import NestedVariables
 
-from zkpylons.lib.base import BaseController, render
+from zkpylons.lib.base import BaseController, render, no_sidebar
 from zkpylons.lib.ssl_requirement import enforce_ssl
 from zkpylons.lib.validators import BaseSchema
 import zkpylons.lib.helpers as h
@@ -116,6 +116,7 @@ class LocationController(BaseController):
         h.flash("Location has been deleted.")
         redirect_to('index')
 
+    @no_sidebar
     def ical(self, id):
         c.schedule_collection = Location.find_by_id(id).schedule
 
@@ -261,6 +261,7 @@ class PersonController(BaseController): #Read, Update, List
         person.activated = True
 
         meta.Session.commit()
+        h.auth.invalidate_principal(request.environ)
 
         return render('person/confirmed.mako')
 
@@ -571,6 +572,7 @@ class PersonController(BaseController): #Read, Update, List
             h.flash("Nothing to do")
 
         meta.Session.commit()
+        h.auth.invalidate_principal(request.environ)
 
         return render('person/roles.mako')
 
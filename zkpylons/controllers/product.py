@@ -8,7 +8,7 @@ from pylons.decorators.rest import dispatch_on
 from formencode import validators, htmlfill, ForEach
 from formencode.variabledecode import NestedVariables
 
-from zkpylons.lib.base import BaseController, render
+from zkpylons.lib.base import BaseController, render, no_sidebar
 from zkpylons.lib.ssl_requirement import enforce_ssl
 from zkpylons.lib.validators import BaseSchema, ProductCategoryValidator, CeilingValidator, FulfilmentTypeValidator
 import zkpylons.lib.helpers as h
@@ -141,6 +141,7 @@ class ProductController(BaseController):
         redirect_to('index')
 
     @authorize(h.auth.Or(h.auth.has_organiser_role, h.auth.has_checkin_role))
+    @no_sidebar
     @jsonify
     def json(self):
         c.product_categories = ProductCategory.find_all()
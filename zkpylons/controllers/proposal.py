@@ -1,5 +1,7 @@
 import logging
 
+import sqlalchemy as sa
+
 from pylons import request, response, session, tmpl_context as c
 from zkpylons.lib.helpers import redirect_to
 from pylons.decorators import validate
@@ -167,6 +169,8 @@ class ProposalController(BaseController):
         c.proposal = Proposal.find_by_id(id)
         c.signed_in_person = h.signed_in_person()
         c.next_review_id = Proposal.find_next_proposal(c.proposal.id, c.proposal.type.id, c.signed_in_person.id)
+        # Keep next_review_id marked as handed out
+        meta.Session.commit()
 
         c.review = Review.find_by_proposal_reviewer(id, c.signed_in_person.id, abort_404=False)
         if c.review:
@@ -355,15 +359,15 @@ class ProposalController(BaseController):
 
     @authorize(h.auth.has_reviewer_role)
     def summary(self):
-        c.proposal = {}
-        for proposal_type in c.proposal_types:
-            c.proposal[proposal_type] = Proposal.find_review_summary().filter(Proposal.type==proposal_type).filter(Proposal.status!=ProposalStatus.find_by_name('Withdrawn')).order_by('average').all()
-        for aat in c.accommodation_assistance_types:
-            stuff = Proposal.find_all_by_accommodation_assistance_type_id(aat.id)
-            setattr(c, '%s_collection' % aat.name, stuff)
-        for tat in c.travel_assistance_types:
-            stuff = Proposal.find_all_by_travel_assistance_type_id(tat.id)
-            setattr(c, '%s_collection' % tat.name, stuff)
+        c.proposal = dict((proposal_type, []) for proposal_type in c.proposal_types)
+        # One query for every type, with the people and reviews shown for each
+        results = Proposal.find_review_summary().filter(Proposal.status!=ProposalStatus.find_by_name('Withdrawn')).options(
+            sa.orm.subqueryload('people'),
+            sa.orm.subqueryload_all('reviews.reviewer'),
+            sa.orm.subqueryload_all('reviews.stream'),
+        ).order_by('average').all()
+        for result in results:
+            c.proposal.setdefault(result.Proposal.type, []).append(result)
         return render('proposal/summary.mako')
 
     def index(self):
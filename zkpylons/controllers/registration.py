@@ -13,6 +13,8 @@ from formencode.variabledecode import NestedVariables
 
 from zkpylons.lib.base import BaseController, render
 from zkpylons.lib.ssl_requirement import enforce_ssl
+from zkpylons.lib import badges, export
+from zkpylons.lib.export import csv_stream_response
 from zkpylons.lib.validators import BaseSchema, DictSet, ProductInCategory, CheckboxQty
 from zkpylons.lib.validators import ProductQty, ProductMinMax, IAgreeValidator, CountryValidator
 
@@ -28,7 +30,7 @@ from zkpylons.lib.mail import email
 
 from zkpylons.model import meta
 from zkpylons.model import Registration, Role, RegistrationProduct, Person
-from zkpylons.model import ProductCategory, Product, Voucher, Ceiling
+from zkpylons.model import ProductCategory, Product, Voucher, Ceiling, StockLevels
 from zkpylons.model import Invoice, InvoiceItem
 from zkpylons.model.special_offer import SpecialOffer
 from zkpylons.model.special_registration import SpecialRegistration
@@ -174,9 +176,13 @@ class RegistrationController(BaseController):
                     return False, "Sorry, you've already paid. Contact the team at " + Config.get('contact_email') + " if you need anything changed."
         return True, "You can edit"
 
-    def _product_available(self, product, stock=True, qty=0):
+    def _product_available(self, product, stock=True, qty=0, levels=None):
         # bool stock: care about if the product is in stock (ie sold out?)
-        if not product.available(stock, qty):
+        # Stock levels for every product come from one shared snapshot
+        # unless the caller has locked them
+        if levels is None:
+            levels = StockLevels.current()
+        if not product.available(stock, qty, levels):
             return False
         if product.auth is not None:
             exec("auth = " + product.auth)
@@ -683,6 +689,10 @@ class RegistrationController(BaseController):
         return False
 
     def _create_invoice(self, registration):
+        # Lock the ceilings involved until the invoice is committed, so
+        # concurrent registrations can't both take the last of the stock
+        levels = StockLevels.lock([rproduct.product for rproduct in registration.products])
+
         # Create Invoice
         invoice = Invoice()
         invoice.person = registration.person
@@ -691,7 +701,8 @@ class RegistrationController(BaseController):
 
         # Loop over the registration products and add them to the invoice.
         for rproduct in registration.products:
-            if self._product_available(rproduct.product, True, rproduct.qty):
+            if self._product_available(rproduct.product, True, rproduct.qty, levels):
+                levels.reserve(rproduct.product, rproduct.qty)
                 ii = InvoiceItem(description=rproduct.product.category.name + ' - ' + rproduct.product.description, qty=rproduct.qty, cost=rproduct.product.cost)
                 ii.invoice = invoice # automatically appends ii to invoice.items
                 ii.product = rproduct.product
@@ -811,10 +822,10 @@ class RegistrationController(BaseController):
 
         if (len(filter) in [2,3,4] and filter.has_key('per_page') and (len(filter['role']) == 0 or 'all' in filter['role']) and filter['status'] == 'all' and (len(filter['product']) == 0 or 'all' in filter['product'])) or len(filter) < 2:
             # no actual filters to apply besides per_page, so we can get paginate to do the query
-            registration_list = meta.Session.query(Registration).order_by(Registration.id).all()
+            registration_list = meta.Session.query(Registration).order_by(Registration.id)
         else:
             import copy
-            registration_list_full = Registration.find_all()
+            registration_list_full = Registration.load_person_status(Registration.find_all())
             registration_list = copy.copy(registration_list_full)
 
             for registration in registration_list_full:
@@ -880,63 +891,65 @@ class RegistrationController(BaseController):
 
     def _export_list(self, registration_list):
         columns = ['Rego', 'Firstname', 'Lastname', 'Email', 'Nick', 'Company', 'State', 'Country', 'Valid Invoices', 'Paid for Products', 'Accommodation', 'Speaker', 'Miniconf Org', 'Volunteer', 'Role(s)', 'Diet', 'Special Needs', 'Silly Description', 'Over 18']
-        if type(registration_list) is not list:
-            registration_list = registration_list.all()
+        if type(registration_list) is list:
+            ids = [registration.id for registration in registration_list]
+        else:
+            ids = [id for (id,) in registration_list.with_entities(Registration.id)]
 
-        data = []
-        for registration in registration_list:
-            products = []
-            invoices = []
-            accommodation = []
+        return csv_stream_response(columns, self._export_rows(ids))
 
-            for product in registration.products:
-                if product.product.category.name.lower() == "accommodation":
-                    accommodation.append(product.product.description)
+    def _export_rows(self, ids):
+        """ Yield the export rows for the registrations, loading them a batch
+        at a time. Runs while the response is streamed, after the request's
+        session has gone, so it uses a session of its own. """
+        try:
+            for start in range(0, len(ids), export.batch_size):
+                batch = ids[start:start + export.batch_size]
+                registrations = dict((r.id, r) for r in Registration.load_person_status(Registration.find_for_export(batch)))
+                for id in batch:
+                    registration = registrations.get(id)
+                    if registration is None:
+                        # Deleted since the export started
+                        continue
+                    products = []
+                    invoices = []
+                    accommodation = []
 
-            for invoice in registration.person.invoices:
-                if invoice.is_paid and not invoice.is_void:
-                    invoices.append(str(invoice.id))
-                    for item in invoice.items:
-                        products.append(str(item.qty) + "x" + item.description)
-
-            # Hack to fix mising fields
-            if not registration.nick:
-                registration.nick = ''
-            if not registration.silly_description:
-                registration.silly_description = ''
-
-            data.append([registration.id,
-                         registration.person.firstname.encode('utf-8'),
-                         registration.person.lastname.encode('utf-8'),
-                         registration.person.email_address.encode('utf-8'),
-                         registration.nick.encode('utf-8'),
-                         registration.person.company.encode('utf-8'),
-                         registration.person.state.encode('utf-8'),
-                         registration.person.country.encode('utf-8'),
-                         ", ".join(invoices).encode('utf-8'),
-                         ", ".join(products).encode('utf-8'),
-                         ", ".join(accommodation).encode('utf-8'),
-                         #registration.checkin,
-                         #registration.checkout,
-                         registration.person.is_speaker(),
-                         registration.person.is_miniconf_org(),
-                         registration.person.is_volunteer(),
-                         ", ".join([role.name for role in registration.person.roles]),
-                         registration.diet.encode('utf-8'),
-                         registration.special.encode('utf-8'),
-                         registration.silly_description.encode('utf-8'),
-                         registration.over18])
-
-
-        import csv, StringIO
-        f = StringIO.StringIO()
-        w = csv.writer(f)
-        w.writerow(columns)
-        w.writerows(data)
-        res = Response(f.getvalue())
-        res.headers['Content-type']='text/plain; charset=utf-8'
-        res.headers['Content-Disposition']='attachment; filename="table.csv"'
-        return res
+                    for product in registration.products:
+                        if product.product.category.name.lower() == "accommodation":
+                            accommodation.append(product.product.description)
+
+                    for invoice in registration.person.invoices:
+                        if invoice.is_paid and not invoice.is_void:
+                            invoices.append(str(invoice.id))
+                            for item in invoice.items:
+                                products.append(str(item.qty) + "x" + item.description)
+
+                    yield [registration.id,
+                           registration.person.firstname.encode('utf-8'),
+                           registration.person.lastname.encode('utf-8'),
+                           registration.person.email_address.encode('utf-8'),
+                           (registration.nick or '').encode('utf-8'),
+                           registration.person.company.encode('utf-8'),
+                           registration.person.state.encode('utf-8'),
+                           registration.person.country.encode('utf-8'),
+                           ", ".join(invoices).encode('utf-8'),
+                           ", ".join(products).encode('utf-8'),
+                           ", ".join(accommodation).encode('utf-8'),
+                           #registration.checkin,
+                           #registration.checkout,
+                           registration.person.is_speaker(),
+                           registration.person.is_miniconf_org(),
+                           registration.person.is_volunteer(),
+                           ", ".join([role.name for role in registration.person.roles]),
+                           registration.diet.encode('utf-8'),
+                           registration.special.encode('utf-8'),
+                           (registration.silly_description or '').encode('utf-8'),
+                           registration.over18]
+                # Done with this batch, don't keep it in the identity map
+                meta.Session.expunge_all()
+        finally:
+            meta.Session.remove()
 
     @authorize(h.auth.has_organiser_role)
     def generate_badges(self):
@@ -950,116 +963,60 @@ class RegistrationController(BaseController):
             if defaults['reg_id'] != '':
                 reg_id_list = defaults['reg_id'].split("\n")
                 regos = [(r.person.lastname.lower(), r.person.firstname.lower(), r)
-                         for r in Registration.find_by_ids(reg_id_list)]
+                         for r in Registration.load_person_status(Registration.find_by_ids(reg_id_list))]
                 regos.sort()
                 registration_list = [row[-1] for row in regos]
 
                 if len(registration_list) != len(reg_id_list):
                     c.text = 'Registration ID not found. Please check the <a href="/registration">registration list</a>.'
                     return render('registration/generate_badges.mako')
-                else:
-                    for registration in registration_list:
-                        data.append(self._registration_badge_data(registration, stamp))
-                        registration.person.badge_printed = True
             else:
-                regos = [(r.person.lastname.lower(), r.person.firstname.lower(), r)
-                         for r in Registration.find_all()]
-                regos.sort()
-                registration_list = [row[-1] for row in regos]
+                registration_list = Registration.load_person_status(Registration.find_for_badges(defaults['type']))
 
-                for registration in registration_list:
-                    append = False
-                    if registration.person.has_paid_ticket() and not registration.person.badge_printed:
-                        if defaults['type'] == 'all':
-                            append = True
-                        else:
-                            for invoice in registration.person.invoices:
-                                if invoice.is_paid and not invoice.is_void:
-                                    for item in invoice.items:
-                                        if defaults['type'] == 'concession' and item.description.startswith('Concession'):
-                                            append = True
-                                        elif defaults['type'] == 'hobby' and (item.description.find('Hobbyist') > -1 or item.description.find('Hobbiest') > -1):
-                                            append = True
-                                        elif defaults['type'] == 'professional' and (item.description.find('Professional') > -1 or item.description.startswith('Karoro')):
-                                            append = True
-                                        elif defaults['type'] == 'press' and item.description.startswith('Press'):
-                                            append = True
-                                        elif defaults['type'] == 'organiser' and item.description.startswith('Organiser'):
-                                            append = True
-                                        elif defaults['type'] == 'monday_tuesday' and item.description.find('Monday + Tuesday') > -1:
-                                            append = True
-                            if defaults['type'] == 'speaker' and registration.person.is_speaker():
-                                append = True
-                            elif defaults['type'] == 'mc_organiser' and registration.person.is_miniconf_org():
-                                append = True
-                            elif defaults['type'] == 'volunteer' and registration.person.is_volunteer():
-                                append = True
-                        if append:
-                            data.append(self._registration_badge_data(registration, stamp))
-                            registration.person.badge_printed = True
+            paid_items = InvoiceItem.find_paid_by_people([r.person_id for r in registration_list])
+            for registration in registration_list:
+                data.append(self._registration_badge_data(registration, stamp, paid_items[registration.person_id]))
+                registration.person.badge_printed = True
 
             meta.Session.commit() # save badge printed data
-            setattr(c, 'data', data)
-
-            import os, tempfile
-            c.index = 0
-            files = []
-            while c.index < len(c.data):
-                while c.index + 4 > len(c.data):
-                    c.data.append(self._registration_badge_data(False))
-                res = render('registration/badges_svg.mako')
-                (svg_fd, svg) = tempfile.mkstemp('.svg')
-                svg_f = os.fdopen(svg_fd, 'w')
-                svg_f.write(res)
-                svg_f.close()
-                files.append(svg)
-                c.index += 4
-
-            (tar_fd, tar) = tempfile.mkstemp('.tar.gz')
-            os.close(tar_fd)
-            os.system('tar -zcvf %s %s' % (tar, " ".join(files)))
-
-            tar_f = file(tar)
-            res = Response(tar_f.read())
-            tar_f.close()
-            res.headers['Content-type'] = 'application/octet-stream'
-            res.headers['Content-Disposition'] = ( 'attachment; filename=badges.tar.gz' )
-            return res
+
+            # The sheets are rendered and sent while the download goes
+            return export.tar_stream_response(badges.render_sheets(data), 'badges.tar.gz')
         return render('registration/generate_badges.mako')
 
-    def _registration_badge_data(self, registration, stamp = False):
+    def _registration_badge_data(self, registration, stamp = False, paid_items = None):
         if registration:
             dinner_tickets = 0
             speakers_tickets = 0
             breakfast = 0
             pdns_ticket = False
             ticket = ''
-            for invoice in registration.person.invoices:
-                if invoice.is_paid and not invoice.is_void:
-                    for item in invoice.items:
-                        if item.description.startswith('Penguin Dinner'):
-                            dinner_tickets += item.qty
-                        elif item.description.startswith('Speakers Dinner'):
-                            speakers_tickets += item.qty
-                        elif item.description.find('Student') > -1:
-                            ticket = 'Hobbyist'
-                        elif item.description.find('Hobbyist') > -1:
-                            ticket = 'Hobbyist'
-                        elif item.description.find('Professional') > -1 or item.description.find('Korora') > -1:
-                            ticket = 'Professional'
-                            pdns_ticket = True
-                        elif item.description.find('Press') > -1:
-                            ticket = 'Press'
-                            pdns_ticket = True
-                        elif item.description.startswith('Organiser'):
-                            ticket = 'Organiser'
-                            pdns_ticket = True
-                        elif item.description.find('Miniconf-Only') > -1 or item.description.find('Minconf-Only') > -1:
-                            ticket = 'Miniconfs Only'
-                        elif item.description.find('Fairy Penguin Sponsor') > -1 or item.description.find('Fairy Penguin Sponsor') > -1:
-                            ticket = 'Sponsor'
-                        elif item.description.find('reakfast') > -1:
-                            breakfast += item.qty
+            if paid_items is None:
+                paid_items = InvoiceItem.find_paid_by_people([registration.person_id])[registration.person_id]
+            for item in paid_items:
+                if item.description.startswith('Penguin Dinner'):
+                    dinner_tickets += item.qty
+                elif item.description.startswith('Speakers Dinner'):
+                    speakers_tickets += item.qty
+                elif item.description.find('Student') > -1:
+                    ticket = 'Hobbyist'
+                elif item.description.find('Hobbyist') > -1:
+                    ticket = 'Hobbyist'
+                elif item.description.find('Professional') > -1 or item.description.find('Korora') > -1:
+                    ticket = 'Professional'
+                    pdns_ticket = True
+                elif item.description.find('Press') > -1:
+                    ticket = 'Press'
+                    pdns_ticket = True
+                elif item.description.startswith('Organiser'):
+                    ticket = 'Organiser'
+                    pdns_ticket = True
+                elif item.description.find('Miniconf-Only') > -1 or item.description.find('Minconf-Only') > -1:
+                    ticket = 'Miniconfs Only'
+                elif item.description.find('Fairy Penguin Sponsor') > -1 or item.description.find('Fairy Penguin Sponsor') > -1:
+                    ticket = 'Sponsor'
+                elif item.description.find('reakfast') > -1:
+                    breakfast += item.qty
             if registration.person.has_role('core_team'):
                 ticket = 'Organiser'
             elif registration.person.is_speaker():
@@ -1115,7 +1072,7 @@ class RegistrationController(BaseController):
             if Config.get('pgp_collection', category='rego') != 'no' and registration.keyid:
                     data['gpg'] = self._sanitise_badge_field(registration.keyid)
             return data
-        return {'ticket': '', 'firstname': '', 'lastname': '', 'nickname': '', 'company': '', 'favourites': '', 'gpg': '', 'region': '', 'dinner_tickets': 0, 'speakers_tickets': 0, 'pdns_ticket' : False, 'over18': True, 'silly': '','breakfast': 0}
+        return badges.blank_badge()
 
     def _sanitise_badge_field(self, field):
         disallowed_chars = re.compile(r'(\n|\r\n|\t)')
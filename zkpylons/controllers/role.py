@@ -64,6 +64,7 @@ class RoleController(BaseController): # Delete
 
         # update the objects with the validated form data
         meta.Session.commit()
+        Role.refresh_catalogue()
 
         redirect_to(action='view', id=id)
 
@@ -80,6 +81,7 @@ class RoleController(BaseController): # Delete
         c.role = Role(**results)
         meta.Session.add(c.role)
         meta.Session.commit()
+        Role.refresh_catalogue()
 
         redirect_to('/role')
 
@@ -109,5 +111,6 @@ class RoleController(BaseController): # Delete
         c.role = Role.find_by_id(id)
         meta.Session.delete(c.role)
         meta.Session.commit()
+        Role.refresh_catalogue()
 
         redirect_to('index')
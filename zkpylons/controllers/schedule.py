@@ -1,17 +1,19 @@
+import calendar
+import json
 import logging
 import vobject
 
 from pylons import request, response, session, tmpl_context as c
 from zkpylons.lib.helpers import redirect_to
 from pylons.controllers.util import abort
-from pylons.decorators import validate, jsonify
+from pylons.decorators import validate
 from pylons.decorators.rest import dispatch_on
 
 import formencode
 from formencode import validators, htmlfill
 from formencode.variabledecode import NestedVariables
 
-from zkpylons.lib.base import BaseController, render
+from zkpylons.lib.base import BaseController, render, no_sidebar
 from zkpylons.lib.validators import BaseSchema
 import zkpylons.lib.helpers as h
 
@@ -22,10 +24,10 @@ from datetime import date, time, datetime, timedelta
 from pytz import timezone
 
 from zkpylons.lib.mail import email
-from zkpylons.lib.ordereddict import OrderedDict
 
 from zkpylons.model import meta
-from zkpylons.model.schedule import Schedule
+from zkpylons.model.schedule import Schedule, ScheduleFeed
+from zkpylons.model.programme import Programme
 from zkpylons.model.proposal import Proposal
 from zkpylons.model.time_slot import TimeSlot, TimeSlotValidator
 from zkpylons.model.location import Location, LocationValidator
@@ -61,12 +63,16 @@ class ScheduleController(BaseController):
 
     # Use this to limit to organisers only.
     def __before__(self, **kwargs):
+        # The feeds are polled constantly and need none of this
+        if request.environ['pylons.routes_dict'].get('action') in ('ical', 'json'):
+            return
+
         if h.signed_in_person():
             c.can_edit = h.signed_in_person().has_role('organiser')
         else:
             c.can_edit = False
 
-        c.scheduled_dates = TimeSlot.find_scheduled_dates()
+        c.scheduled_dates = Programme.scheduled_dates()
         c.subsubmenu = [['/programme/schedule/' + scheduled_date.strftime('%A').lower(), scheduled_date.strftime('%A')] for scheduled_date in c.scheduled_dates]
 
     def table(self, day=None):
@@ -86,50 +92,49 @@ class ScheduleController(BaseController):
             else:
                 c.display_date = c.scheduled_dates[0]
 
-        # Work out which times we should be displaying on the left hand time scale
-        c.time_slots = TimeSlot.find_by_date(c.display_date)
-        c.primary_times = { time_slot.start_time: time_slot  for time_slot in TimeSlot.find_by_date(c.display_date, primary=True) }
-
-        # Find all locations that have non-exclusive events
-        start = datetime.combine(c.display_date, time.min)
-        end   = datetime.combine(c.display_date, time.max)
-        c.locations = Location.query().join(Schedule).join(Event).join(TimeSlot).filter(TimeSlot.start_time.between(start, end)).filter(Event.exclusive != True).all()
-
-        # Find the list of scheduled items for the required date
-        c.schedule_collection = Schedule.find_by_date(c.display_date)
-
-        # What time period will we break the time scale on the left into
-        c.time_increment = timedelta(minutes=5)
-
-        # Build up the programme for the requested day
-        c.programme = OrderedDict()
-        for time_slot in c.time_slots:
-            mytime = time_slot.start_time
-            while mytime < time_slot.end_time:
-                c.programme[mytime] = {}
-                mytime = mytime + c.time_increment
-        for schedule in c.schedule_collection:
-            exclusive_event = schedule.time_slot.exclusive_event()
-            mytime = schedule.time_slot.start_time
-            if exclusive_event:
-                c.programme[mytime]['exclusive'] = exclusive_event
-            else:
-                c.programme[mytime][schedule.location] = schedule
-
         if 'raw' in request.GET:
             c.raw = True
+
+        # Organisers get edit links and unpublished events, so only the
+        # public table is shared
+        if c.can_edit:
+            c.programme_table = self._render_programme(c.display_date)
+        else:
+            c.programme_table = Programme.cached(('table', c.display_date), lambda: self._render_programme(c.display_date))
         return render('/schedule/table.mako')
 
+    def _render_programme(self, display_date):
+        c.programme = Programme.load(display_date)
+        return render('/schedule/programme.mako')
+
+    @no_sidebar
     def ical(self):
-        c.schedule_collection = Schedule.find_all()
+        feed = self._feed('ical', self._build_ical)
+        response.charset = 'utf8'
+        response.headers['content-type'] = 'text/calendar; charset=utf8'
+        response.headers.add('content-transfer-encoding', 'binary')
+        return self._feed_response(feed)
 
+    def _build_ical(self):
         ical = vobject.iCalendar()
-        for schedule in c.schedule_collection:
+        tz = timezone(Config.get('time_zone'))
+        event_host = Config.get('event_host')
+
+        # The same event in the same time slot in several locations is one
+        # entry, at the first of the schedules
+        schedules = Schedule.find_all_for_feed()
+        concurrent = {}
+        for schedule in schedules:
+            concurrent.setdefault((schedule.event_id, schedule.time_slot_id), []).append(schedule)
+
+        for schedule in schedules:
             if not schedule.time_slot.heading:
+                concurrent_schedules = concurrent[(schedule.event_id, schedule.time_slot_id)]
+                if concurrent_schedules[0] is not schedule:
+                    continue
                 event = ical.add('vevent')
-                event.add('uid').value = str(schedule.id) + '@' + Config.get('event_host')
+                event.add('uid').value = str(schedule.id) + '@' + event_host
                 # Created
-                tz = timezone(Config.get('time_zone'))
                 event.add('created').value = schedule.creation_timestamp.replace(tzinfo=tz)
                 # Last Modified
                 event.add('dtstamp').value = schedule.last_modification_timestamp.replace(tzinfo=tz)
@@ -150,28 +155,23 @@ class ScheduleController(BaseController):
                     else:
                         event.add('url').value = h.url_for(str(schedule.event.url), qualified=True)
 
-                concurrent_schedules = schedule.event.schedule_by_time_slot(schedule.time_slot)
-                for concurrent_schedule in concurrent_schedules:
-                    if concurrent_schedule != schedule:
-                        if concurrent_schedule in c.schedule_collection:
-                            c.schedule_collection.remove(concurrent_schedule)
-
+                # Main room first, as Event.schedule_by_time_slot orders them
+                concurrent_schedules = sorted(concurrent_schedules, key=lambda s: bool(s.overflow))
                 locations = [concurrent_schedule.location.display_name for concurrent_schedule in concurrent_schedules]
                 event.add('location').value = h.list_to_string(locations)
 
-        response.charset = 'utf8'
-        response.headers['content-type'] = 'text/calendar; charset=utf8'
-        response.headers.add('content-transfer-encoding', 'binary')
-        response.headers.add('Pragma', 'cache')
-        response.headers.add('Cache-Control', 'max-age=3600,public')
-        return ical.serialize()
+        return ScheduleFeed(ical.serialize())
 
-    @jsonify
+    @no_sidebar
     def json(self):
-        schedules = Schedule.find_all()
+        feed = self._feed('json', self._build_json)
+        response.headers['content-type'] = 'application/json'
+        return self._feed_response(feed)
+
+    def _build_json(self):
         output = []
 
-        for schedule in schedules:
+        for schedule in Schedule.find_all_for_feed():
             if not schedule.time_slot.heading:
                 row = {}
                 speakers = schedule.event.computed_speakers()
@@ -193,9 +193,35 @@ class ScheduleController(BaseController):
                     row['video_release'] = video_release
                 output.append(row)
 
+        return ScheduleFeed(json.dumps(output))
+
+    def _feed(self, kind, build):
+        """ The feed, cached only when asked for at the event's own host. The
+            feeds link back to the host they were asked for, and any other
+            Host header a client sends would otherwise keep a feed of its own. """
+        if request.host != Config.get('event_host'):
+            return build()
+        return ScheduleFeed.get((kind, request.scheme), build)
+
+    def _feed_response(self, feed):
+        """ Serve the feed, or a 304 if the client's copy is current. """
         response.headers.add('Pragma', 'cache')
         response.headers.add('Cache-Control', 'max-age=3600,public')
-        return output
+        response.headers['ETag'] = '"%s"' % feed.etag
+        response.last_modified = feed.last_modified
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            fresh = '*' in tags or feed.etag in [tag.replace('W/', '', 1).strip('"') for tag in tags]
+        else:
+            since = request.if_modified_since
+            fresh = since is not None and calendar.timegm(since.utctimetuple()) >= feed.last_modified
+
+        if fresh:
+            response.status_int = 304
+            return ''
+        return feed.body
 
     @dispatch_on(POST="_new")
     @validate(schema=NewScheduleFormSchema(), on_get=True, post_only=False, variable_decode=True)
@@ -28,10 +28,60 @@ from pylons import request, response, session
 from pylons.controllers.util import redirect, abort
 from pylons import url
 
+from sqlalchemy.orm import joinedload
+
 import hashlib
 
 log = logging.getLogger(__name__)
 
+# Key the resolved principal is stored under in the WSGI environ
+PRINCIPAL_KEY = 'zkpylons.auth.principal'
+
+class Principal(object):
+    """
+    The signed in person, their (lower case) role names and activation flag.
+
+    Resolved once per request by get_principal() so the many permission
+    checks and template helpers in a request don't each hit the database.
+    """
+    def __init__(self, email, person):
+        self.email = email
+        self.person = person
+        if person is None:
+            self.roles = frozenset()
+            self.activated = False
+        else:
+            self.roles = frozenset(role.name.lower() for role in person.roles)
+            self.activated = person.activated
+
+    def has_role(self, name):
+        return name.lower() in self.roles
+
+def get_principal(environ):
+    """
+    Returns the Principal for REMOTE_USER, or ``None`` if nobody is signed in.
+
+    The person is looked up with their roles in a single query and cached in
+    the environ for the rest of the request.
+    """
+    email = environ.get('REMOTE_USER')
+    if not email:
+        return None
+
+    principal = environ.get(PRINCIPAL_KEY)
+    if principal is None or principal.email != email:
+        person = meta.Session.query(Person).options(joinedload(Person.roles)).filter_by(email_address=email.lower()).first()
+        principal = Principal(email, person)
+        environ[PRINCIPAL_KEY] = principal
+    return principal
+
+def invalidate_principal(environ):
+    """
+    Drop the cached principal, call this after changing a person's roles or
+    activation so later checks in the same request see the new state.
+    """
+    environ.pop(PRINCIPAL_KEY, None)
+
 def set_redirect():
     # TODO: This function is called 30+ times per page when not logged in, more than seems needed
     if not session.get('redirect_to', None):
@@ -58,8 +108,8 @@ class ValidZookeeprUser(UserIn):
             set_redirect()
             raise NotAuthenticatedError('Not Authenticated')
 
-        person = Person.find_by_email(environ['REMOTE_USER'])
-        if Person is None:
+        principal = get_principal(environ)
+        if principal.person is None:
             environ['auth_failure'] = 'NO_USER'
             raise NotAuthorizedError(
                 'You are not one of the users allowed to access this resource.'
@@ -86,12 +136,12 @@ class HasZookeeprRole(HasAuthKitRole):
            if not self.role_exists(role):
                raise NotAuthorizedError("No such role %r exists"%role)
 
-        person = Person.find_by_email(environ['REMOTE_USER'])
-        if person is None:
+        principal = get_principal(environ)
+        if principal.person is None:
             raise users.AuthKitNoSuchUserError(
                 "No such user %r" % environ['REMOTE_USER'])
 
-        if not person.activated:
+        if not principal.activated:
             #set_role('User account must be activated')
             raise NotAuthorizedError(
                     "User account must be activated"
@@ -99,7 +149,7 @@ class HasZookeeprRole(HasAuthKitRole):
 
         if self.all:
             for role in self.roles:
-                if not self.user_has_role(person, role):
+                if not self.user_has_role(principal, role):
                     if self.error:
                         raise self.error
                     else:
@@ -110,7 +160,7 @@ class HasZookeeprRole(HasAuthKitRole):
             return app(environ, start_response)
         else:
             for role in self.roles:
-                if self.user_has_role(person, role):
+                if self.user_has_role(principal, role):
                     return app(environ, start_response)
             if self.error:
                 raise self.error
@@ -125,24 +175,17 @@ class HasZookeeprRole(HasAuthKitRole):
         Returns ``True`` if the role exists, ``False`` otherwise. Roles are
         case insensitive.
         """
-        role = Role.find_by_name(role)
+        return Role.exists(role)
 
-        if role is not None:
-            return True
-        return False
-
-    def user_has_role(self, person, role):
+    def user_has_role(self, principal, role):
         """
-        Returns ``True`` if the user has the role specified, ``False``
-        otherwise. Raises an exception if the user doesn't exist.
+        Returns ``True`` if the principal has the role specified, ``False``
+        otherwise. Raises an exception if the role doesn't exist.
         """
         if not self.role_exists(role.lower()):
             raise users.AuthKitNoSuchRoleError("No such role %r"%role.lower())
 
-        for role_ in person.roles:
-            if role_.name == role.lower():
-                return True
-        return False
+        return principal.has_role(role)
 
 
 class IsSameZookeeprUser(UserIn):
@@ -159,7 +202,7 @@ class IsSameZookeeprUser(UserIn):
             set_redirect()
             raise NotAuthenticatedError('Not Authenticated')
 
-        person = Person.find_by_email(environ['REMOTE_USER'])
+        person = get_principal(environ).person
         if person is None:
             environ['auth_failure'] = 'NO_USER'
             raise NotAuthorizedError(
@@ -188,15 +231,15 @@ class IsActivatedZookeeprUser(UserIn):
             set_redirect()
             raise NotAuthenticatedError('Not Authenticated')
 
-        person = Person.find_by_email(environ['REMOTE_USER'])
-        if person is None:
+        principal = get_principal(environ)
+        if principal.person is None:
             set_redirect()
             environ['auth_failure'] = 'NO_USER'
             raise NotAuthorizedError(
                 'You are not one of the users allowed to access this resource.'
             )
 
-        if not person.activated:
+        if not principal.activated:
             set_redirect()
             if 'is_active' in dir(meta.Session):
                 meta.Session.flush()
@@ -221,7 +264,7 @@ class IsSameZookeeprSubmitter(UserIn):
             set_redirect()
             raise NotAuthenticatedError('Not Authenticated')
 
-        person = Person.find_by_email(environ['REMOTE_USER'])
+        person = get_principal(environ).person
         if person is None:
             environ['auth_failure'] = 'NO_USER'
             raise NotAuthorizedError(
@@ -255,7 +298,7 @@ class IsSameZookeeprFundingSubmitter(UserIn):
         if not environ.get('REMOTE_USER'):
             raise NotAuthenticatedError('Not Authenticated')
 
-        person = Person.find_by_email(environ['REMOTE_USER'])
+        person = get_principal(environ).person
         if person is None:
             environ['auth_failure'] = 'NO_USER'
             raise NotAuthorizedError(
@@ -290,7 +333,7 @@ class IsSameZookeeprAttendee(UserIn):
             set_redirect()
             raise NotAuthenticatedError('Not Authenticated')
 
-        person = Person.find_by_email(environ['REMOTE_USER'])
+        person = get_principal(environ).person
         if person is None:
             environ['auth_failure'] = 'NO_USER'
             raise NotAuthorizedError(
@@ -338,7 +381,7 @@ class IsSameZookeeprRegistration(UserIn):
             set_redirect()
             raise NotAuthenticatedError('Not Authenticated')
 
-        person = Person.find_by_email(environ['REMOTE_USER'])
+        person = get_principal(environ).person
         if person is None:
             environ['auth_failure'] = 'NO_USER'
             raise NotAuthorizedError(
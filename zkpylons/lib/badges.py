@@ -0,0 +1,32 @@
+"""Badge sheets, four badges to an A4 SVG.
+
+The sheets are rendered one at a time as they are asked for, so they can
+be streamed into a download while the rest are still being made.
+"""
+from pylons import config
+
+from zkpylons.lib.templating import TemplateContext
+
+# Badges on each sheet
+sheet_size = 4
+
+def blank_badge():
+    """Badge data for an empty space on a sheet"""
+    return {'ticket': '', 'firstname': '', 'lastname': '', 'nickname': '', 'company': '', 'favourites': '', 'gpg': '', 'region': '', 'dinner_tickets': 0, 'speakers_tickets': 0, 'pdns_ticket' : False, 'over18': True, 'silly': '','breakfast': 0}
+
+def sheets(badges):
+    """Split the badge data into sheets, filling the last with blanks"""
+    result = [list(badges[i:i + sheet_size]) for i in range(0, len(badges), sheet_size)]
+    if result:
+        result[-1].extend(blank_badge() for i in range(sheet_size - len(result[-1])))
+    return result
+
+
+def render_sheets(badges, lookup=None):
+    """Yield (filename, svg) for each sheet of the badges, in order, the
+    SVG as utf-8"""
+    if lookup is None:
+        lookup = config['pylons.app_globals'].mako_lookup
+    template = lookup.get_template('/registration/badges_svg.mako')
+    for number, sheet in enumerate(sheets(badges), 1):
+        yield 'badges/badges-%04d.svg' % number, template.render_unicode(c=TemplateContext(data=sheet, index=0)).encode('utf-8')
@@ -3,16 +3,40 @@
 Provides the BaseController class for subclassing.
 """
 from pylons.controllers import WSGIController
-from pylons.templating import render_mako as render
+from pylons.templating import render_mako
 from pylons import request, response, session, tmpl_context as c
 
-from zkpylons.model.db_content import DbContent, DbContentType
+from zkpylons.model.db_content import DbContent
 from zkpylons.model.config import Config
 from zkpylons.model import meta
 import zkpylons.lib.helpers as h
-import datetime
+from zkpylons.lib import instrument
+
+import time
+
+def render(*args, **kwargs):
+    """render_mako, timed for the request instrumentation"""
+    start = time.time()
+    try:
+        return render_mako(*args, **kwargs)
+    finally:
+        instrument.add_render_time(time.time() - start)
+
+def no_sidebar(func):
+    """Decorator for actions that never render the news/press/banner
+    sidebar, such as JSON endpoints, so it isn't loaded for them."""
+    func.no_sidebar = True
+    return func
 
 class BaseController(WSGIController):
+    # Set to False on controllers that never render the sidebar
+    sidebar = True
+
+    def _wants_sidebar(self, environ):
+        if not self.sidebar:
+            return False
+        action = environ.get('pylons.routes_dict', {}).get('action')
+        return not getattr(getattr(self, action or '', None), 'no_sidebar', False)
 
     def __call__(self, environ, start_response):
         """Invoke the Controller"""
@@ -20,27 +44,26 @@ class BaseController(WSGIController):
         # the request is routed to. This routing information is
         # available in environ['pylons.routes_dict']
 
-        person = h.signed_in_person()
-        if person and not person.activated:
+        # The principal is cached in the environ for the permission checks
+        # and h.signed_in_person() calls made later in this request
+        principal = h.auth.get_principal(environ)
+        if principal and principal.person and not principal.activated:
             msg = ("Your account (%s) hasn't been confirmed. Check your email"
                    " for activation instructions." %
-                   (person.email_address))
+                   (principal.person.email_address))
             h.flash(msg, category="warning")
 
         # Moved here from index controller so that all views that import the news.mako template
         # have access to c.db_content_news and c.db_content_press
-        news = DbContentType.find_by_name("News", abort_404 = False)
-        if news:
-            c.db_content_news = meta.Session.query(DbContent).filter_by(type_id=news.id).filter(DbContent.publish_timestamp <= datetime.datetime.now()).order_by(DbContent.creation_timestamp.desc()).limit(4).all()
-            c.db_content_news_all = meta.Session.query(DbContent).filter_by(type_id=news.id).filter(DbContent.publish_timestamp <= datetime.datetime.now()).order_by(DbContent.creation_timestamp.desc()).all() #use all to find featured items
-
-        press = DbContentType.find_by_name("In the press", abort_404 = False)
-        if press:
-            c.db_content_press = meta.Session.query(DbContent).filter_by(type_id=press.id).order_by(DbContent.creation_timestamp.desc()).filter(DbContent.publish_timestamp <= datetime.datetime.now()).limit(4).all()
-
-	banner = DbContentType.find_by_name("Banner", abort_404 = False)
-        if banner:
-                c.db_content_banner = meta.Session.query(DbContent).filter_by(type_id=banner.id).order_by(DbContent.creation_timestamp.desc()).filter(DbContent.publish_timestamp <= datetime.datetime.now()).limit(5).all()
+        if self._wants_sidebar(environ):
+            sidebar = DbContent.find_sidebar()
+            if 'news' in sidebar:
+                c.db_content_news = sidebar['news']
+                c.db_content_news_all = sidebar['news_all'] #use all to find featured items
+            if 'press' in sidebar:
+                c.db_content_press = sidebar['press']
+            if 'banner' in sidebar:
+                c.db_content_banner = sidebar['banner']
 
         # Allow direct model query by view using c.config.get("key")
         # This is because with have huge numbers of parameters which can be fetched
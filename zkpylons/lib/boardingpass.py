@@ -0,0 +1,291 @@
+"""Boarding pass PDFs for every fulfilment group, made as a batch job.
+
+The XML for each group is rendered here, which is quick, and the PDFs are
+made from it by a pool of processes, a batch at a time so the inkscape
+renderer starts one inkscape shell for each batch. A hash of each group's
+XML, the style sheet and the renderer is kept in a progress file next to
+the PDFs, so a group whose PDF would come out the same is skipped. That
+also lets a job that stopped part way, or crashed, carry on where it left
+off.
+
+Run it with bin/generate_boardingpasses.py, which /admin/generate_boardingpass
+starts in the background.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import sqlalchemy as sa
+from pylons import config
+
+from zkpylons.config.zkpylons_config import get_path
+from zkpylons.lib import pdfgen
+from zkpylons.lib.templating import TemplateContext
+from zkpylons.model import meta, FulfilmentGroup
+from zkpylons.model.config import Config
+
+# PDFs handed to a pool process at once
+batch_size = 10
+
+# Progress is saved after this many PDFs, or this many seconds
+save_every = 50
+save_interval = 5
+
+# A run that hasn't saved its progress for this many seconds has died
+stale_after = 600
+
+def default_output_dir():
+    return os.path.join(get_path('zk_root'), 'boardingpass')
+
+def group_filename(group, event_shortname):
+    if group.person:
+        return group.person.email_address + '.pdf'
+    return event_shortname + '_' + str(group.id) + '.pdf'
+
+
+class JobProgress(object):
+    """The progress file: the hash of the XML each PDF was made from, and
+    how far the current run has got."""
+
+    def __init__(self, path):
+        self.path = path
+        self.outputs = {}
+        self.total = 0
+        self.done = 0
+        self.made = 0
+        self.failed = 0
+        self.started = None
+        self.finished = None
+        self.updated = None
+        self._saved = time.time()
+        self._unsaved = 0
+
+    def load(self):
+        try:
+            f = open(self.path)
+            try:
+                data = json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            return self
+        self.outputs = data.get('outputs', {})
+        for key in ('total', 'done', 'made', 'failed', 'started', 'finished', 'updated'):
+            setattr(self, key, data.get(key, getattr(self, key)))
+        return self
+
+    def start(self, total):
+        self.total = total
+        self.done = self.made = self.failed = 0
+        self.started = time.time()
+        self.finished = None
+        self.save()
+
+    def record(self, filename, digest, made=True):
+        self.done += 1
+        if digest is None:
+            self.failed += 1
+            self.outputs.pop(filename, None)
+        else:
+            self.outputs[filename] = digest
+            if made:
+                self.made += 1
+        self._unsaved += 1
+        if self._unsaved >= save_every or time.time() - self._saved >= save_interval:
+            self.save()
+
+    def finish(self):
+        self.finished = time.time()
+        self.save()
+
+    def save(self):
+        self.updated = time.time()
+        data = dict((key, getattr(self, key)) for key in ('outputs', 'total', 'done', 'made', 'failed', 'started', 'finished', 'updated'))
+        dirname = os.path.dirname(self.path)
+        fd, tmp = tempfile.mkstemp(dir=dirname, prefix='.progress')
+        f = os.fdopen(fd, 'w')
+        try:
+            json.dump(data, f)
+        finally:
+            f.close()
+        os.rename(tmp, self.path)
+        self._saved = time.time()
+        self._unsaved = 0
+
+    @property
+    def running(self):
+        return self.started is not None and self.finished is None and time.time() - self.updated < stale_after
+
+    def __str__(self):
+        if self.started is None:
+            return 'Not run yet'
+        counts = '%d of %d done, %d made, %d up to date, %d failed' % (
+            self.done, self.total, self.made, self.done - self.made - self.failed, self.failed)
+        if self.finished is None:
+            if not self.running:
+                return 'Stopped: ' + counts
+            return 'Running: ' + counts
+        return 'Completed: ' + counts
+
+
+def _init_worker():
+    """Runs in each pool process as it starts. The renderer forked from the
+    parent, e.g. its inkscape shell, is left to the parent, and its lock
+    may have been held by another of the parent's threads at the fork."""
+    pdfgen._renderer = None
+    pdfgen._renderer_lock = threading.Lock()
+
+def _write_pdf(path, pdf_data):
+    # Written under a hidden name so a crash never leaves half a PDF
+    tmp = os.path.join(os.path.dirname(path), '.' + os.path.basename(path))
+    f = open(tmp, 'wb')
+    try:
+        f.write(pdf_data)
+    finally:
+        f.close()
+    os.rename(tmp, path)
+
+def _make_pdf(args):
+    """Runs in a pool process: write the PDF for the XML, returning the
+    filename and the XML's hash, or None for the hash if it failed."""
+    filename, digest, xml_s, xsl_f, path = args
+    try:
+        _write_pdf(path, pdfgen.generate_pdf(xml_s, xsl_f))
+        return filename, digest, None
+    except Exception, e:
+        return filename, None, '%s: %s' % (filename, e)
+
+def _make_pdfs(batch):
+    """Runs in a pool process: _make_pdf for each in the batch, rendered
+    together. If the batch fails they are made one by one, so only the
+    ones that fail on their own are left out."""
+    try:
+        pdfs = pdfgen.generate_pdfs([(xml_s, xsl_f) for (filename, digest, xml_s, xsl_f, path) in batch])
+    except Exception:
+        return [_make_pdf(args) for args in batch]
+    results = []
+    for (filename, digest, xml_s, xsl_f, path), pdf_data in zip(batch, pdfs):
+        try:
+            _write_pdf(path, pdf_data)
+            results.append((filename, digest, None))
+        except Exception, e:
+            results.append((filename, None, '%s: %s' % (filename, e)))
+    return results
+
+
+class BoardingPassJob(object):
+    """Makes the boarding pass PDF of every fulfilment group in output_dir"""
+
+    PROGRESS_NAME = '.progress.json'
+
+    def __init__(self, output_dir=None, processes=None, lookup=None):
+        if output_dir is None:
+            output_dir = default_output_dir()
+        self.output_dir = output_dir
+        self.processes = processes
+        if lookup is None:
+            lookup = config['pylons.app_globals'].mako_lookup
+        self.lookup = lookup
+        self.progress = JobProgress(os.path.join(output_dir, self.PROGRESS_NAME))
+
+    def documents(self):
+        """(filename, xml) for every fulfilment group"""
+        template = self.lookup.get_template('/fulfilment_group/pdf.mako')
+        event_shortname = Config.get('event_shortname')
+        groups = meta.Session.query(FulfilmentGroup).options(
+                sa.orm.eagerload_all('fulfilments.items.product.category'),
+                sa.orm.eagerload_all('fulfilments.type'),
+                sa.orm.eagerload('person'),
+            ).order_by(FulfilmentGroup.id)
+        for group in groups:
+            xml_s = template.render_unicode(c=TemplateContext(fulfilment_group=group)).encode('utf-8')
+            yield group_filename(group, event_shortname), xml_s
+
+    def run(self, force=False, report=None):
+        """Make the PDFs that are missing or out of date, or all of them if
+        ``force``. ``report`` is called with each error and now and then
+        with the progress. Returns the JobProgress."""
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+        xsl_f = self.lookup.get_template('/fulfilment_group/pdf.xsl').filename
+        progress = self.progress.load()
+        previous = dict(progress.outputs)
+        # A PDF is out of date when its XML, the style sheet or the renderer
+        # has changed since it was made
+        f = open(xsl_f, 'rb')
+        try:
+            common = hashlib.sha1(pdfgen.renderer_name() + '\0' + f.read()).digest()
+        finally:
+            f.close()
+
+        work = []
+        up_to_date = []
+        for filename, xml_s in self.documents():
+            digest = hashlib.sha1(common + xml_s).hexdigest()
+            path = os.path.join(self.output_dir, filename)
+            if not force and previous.get(filename) == digest and os.path.exists(path):
+                up_to_date.append((filename, digest))
+            else:
+                work.append((filename, digest, xml_s, xsl_f, path))
+        meta.Session.remove()
+
+        progress.start(len(work) + len(up_to_date))
+        for filename, digest in up_to_date:
+            progress.record(filename, digest, made=False)
+
+        pool = multiprocessing.Pool(self.processes, _init_worker)
+        try:
+            batches = [work[i:i + batch_size] for i in range(0, len(work), batch_size)]
+            for results in pool.imap_unordered(_make_pdfs, batches):
+                for filename, digest, error in results:
+                    progress.record(filename, digest)
+                    if report is not None:
+                        if error:
+                            report(error)
+                        if progress.done % save_every == 0:
+                            report(str(progress))
+            pool.close()
+        except:
+            pool.terminate()
+            progress.save()
+            raise
+        finally:
+            pool.join()
+        progress.finish()
+        if report is not None:
+            report(str(progress))
+        return progress
+
+
+def start_process(config_file, output_dir=None):
+    """Start bin/generate_boardingpasses.py to make the PDFs, rather than
+    forking the web process, and return it. Its output goes to a log file
+    next to the PDFs; how far it has got is in the progress file. It runs
+    in a session of its own, and a thread waits for it so it doesn't linger
+    as a zombie."""
+    if output_dir is None:
+        output_dir = default_output_dir()
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    # Shows as running straight away, not only once the script has loaded
+    JobProgress(os.path.join(output_dir, BoardingPassJob.PROGRESS_NAME)).load().start(0)
+    script = os.path.join(get_path('zk_root'), 'bin', 'generate_boardingpasses.py')
+    devnull = open(os.devnull)
+    log = open(os.path.join(output_dir, '.generate.log'), 'a')
+    try:
+        process = subprocess.Popen([sys.executable, script, '--config', config_file, '--output', output_dir],
+                                   stdin=devnull, stdout=log, stderr=subprocess.STDOUT, close_fds=True,
+                                   preexec_fn=os.setsid)
+    finally:
+        log.close()
+        devnull.close()
+    reaper = threading.Thread(target=process.wait, name='boardingpass-wait')
+    reaper.daemon = True
+    reaper.start()
+    return process
@@ -0,0 +1,114 @@
+"""Streaming CSV and tarball exports.
+
+The responses built here are WSGI iterables that write the CSV a batch of
+rows at a time, or the tarball a file at a time, so memory use stays flat
+however big the export is. They
+are iterated after the controller has returned and meta.Session has been
+removed, so the rows have to come from a connection or session of their own
+that lasts for the download.
+"""
+import csv
+import StringIO
+import tarfile
+import time
+
+import sqlalchemy as sa
+from pylons.controllers.util import Response
+
+from zkpylons.model import meta
+
+# Rows fetched from the database, and written out, at a time
+batch_size = 500
+
+def csv_chunks(columns, rows):
+    """Yield the CSV for the header and rows, a batch of rows at a time"""
+    f = StringIO.StringIO()
+    w = csv.writer(f)
+    w.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        w.writerow(row)
+        if count % batch_size == 0:
+            yield f.getvalue()
+            f.seek(0)
+            f.truncate()
+    yield f.getvalue()
+
+def csv_stream_response(columns, rows, filename='table.csv'):
+    """A Response streaming the rows, any iterable of sequences, as CSV"""
+    res = Response(app_iter=csv_chunks(columns, rows))
+    res.headers['Content-type'] = 'text/plain; charset=utf-8'
+    res.headers['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return res
+
+def stream_sql(sql):
+    """Run the SQL on a connection of its own using a server side cursor.
+
+    Yields the column names first, then each row with every value
+    converted to a utf-8 string. The connection is released once the rows
+    are exhausted or the generator is closed.
+    """
+    if isinstance(sql, basestring):
+        sql = sa.text(sql)
+    conn = meta.engine.connect()
+    try:
+        res = conn.execution_options(stream_results=True).execute(sql)
+        yield list(res.keys())
+        while True:
+            rows = res.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                # Convert to utf-8 so that csv writer can handle the strings
+                yield [unicode(s).encode("utf-8") for s in row]
+    finally:
+        conn.close()
+
+def sql_csv_response(sql, filename='table.csv'):
+    """Stream the results of the SQL statement as CSV"""
+    rows = stream_sql(sql)
+    # Runs the query now so errors are reported with the request
+    columns = rows.next()
+    return csv_stream_response(columns, rows, filename)
+
+
+class _ChunkWriter(object):
+    """A file for tarfile to write to, handing the data on as chunks"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def take(self):
+        data = ''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def tar_chunks(members):
+    """Yield a gzipped tarball of the members, an iterable of (filename,
+    data) pairs, a file at a time"""
+    f = _ChunkWriter()
+    tar = tarfile.open(mode='w|gz', fileobj=f)
+    now = time.time()
+    try:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = now
+            info.mode = 0644
+            tar.addfile(info, StringIO.StringIO(data))
+            yield f.take()
+        tar.close()
+        yield f.take()
+    finally:
+        if hasattr(members, 'close'):
+            members.close()
+
+def tar_stream_response(members, filename='files.tar.gz'):
+    """A Response streaming the members, (filename, data) pairs, as a
+    gzipped tarball"""
+    res = Response(app_iter=tar_chunks(members))
+    res.headers['Content-type'] = 'application/octet-stream'
+    res.headers['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return res
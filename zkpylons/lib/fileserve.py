@@ -0,0 +1,227 @@
+"""Serving files, and other content that doesn't change often, over WSGI.
+
+FileApp sends a file with Content-Length, Last-Modified and ETag headers,
+answers conditional GETs with 304 Not Modified, and serves single byte
+ranges. A whole file is handed to the server's ``wsgi.file_wrapper`` when
+it has one, otherwise it is read a block at a time.
+
+Only the static files reach the server's file wrapper as it is, so it
+can use sendfile(). Controller responses go through the error handling
+middleware, which iterates over them in Python. For those, FileApp can
+instead leave sending the whole file to a front end server, e.g. Apache
+with mod_xsendfile, by naming it in a ``sendfile_header`` such as
+X-Sendfile. Controllers pass the ``x_sendfile_header`` ini setting.
+
+DataApp does the same for content held in memory or in the database,
+which is only fetched when it is actually going to be sent.
+
+From a controller, return ``forward(FileApp(path))``.
+"""
+import calendar
+import email.utils
+import mimetypes
+import os
+import re
+
+from paste.urlparser import StaticURLParser
+from webob.exc import HTTPNotFound
+
+# Bytes read from a file at a time
+block_size = 64 * 1024
+
+def http_date(timestamp):
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+def parse_http_date(value):
+    """Seconds since the epoch, or None if the date can't be read"""
+    if not value:
+        return None
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    try:
+        return email.utils.mktime_tz(parsed)
+    except (OverflowError, ValueError):
+        return None
+
+def not_modified(environ, etag, last_modified):
+    """True if the client's copy, as given by If-None-Match or
+    If-Modified-Since, is current"""
+    if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or 'W/' + etag in tags
+    since = parse_http_date(environ.get('HTTP_IF_MODIFIED_SINCE'))
+    return since is not None and int(last_modified) <= since
+
+_range_re = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def byte_range(environ, etag, last_modified, length):
+    """The (start, stop) of the byte range asked for, None for the whole
+    thing, or False if the range can't be satisfied.
+
+    Only single ranges are supported, anything else gets the whole thing,
+    as does a range with an If-Range that no longer matches.
+    """
+    value = environ.get('HTTP_RANGE')
+    if not value:
+        return None
+    if_range = environ.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and parse_http_date(if_range) != int(last_modified):
+        return None
+    match = _range_re.match(value.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= length:
+            return False
+        stop = last and min(int(last) + 1, length) or length
+    elif last:
+        # The last so many bytes
+        if int(last) == 0:
+            return False
+        start, stop = max(length - int(last), 0), length
+    else:
+        return None
+    return start, stop
+
+
+def _validators(etag, last_modified):
+    return [
+        ('ETag', etag),
+        ('Last-Modified', http_date(last_modified)),
+        ('Accept-Ranges', 'bytes'),
+    ]
+
+def _respond(environ, start_response, headers, etag, last_modified, length, body):
+    """Send the status and headers for the request, and the body, which is
+    called with the (start, stop) to send, None for everything"""
+    headers = list(headers) + _validators(etag, last_modified)
+    if not_modified(environ, etag, last_modified):
+        start_response('304 Not Modified', headers)
+        return []
+
+    rng = byte_range(environ, etag, last_modified, length)
+    if rng is False:
+        headers.append(('Content-Range', 'bytes */%d' % length))
+        headers.append(('Content-Length', '0'))
+        start_response('416 Requested Range Not Satisfiable', headers)
+        return []
+    if rng is None:
+        status = '200 OK'
+        headers.append(('Content-Length', str(length)))
+    else:
+        start, stop = rng
+        status = '206 Partial Content'
+        headers.append(('Content-Range', 'bytes %d-%d/%d' % (start, stop - 1, length)))
+        headers.append(('Content-Length', str(stop - start)))
+    start_response(status, headers)
+    if environ['REQUEST_METHOD'] == 'HEAD':
+        return []
+    return body(rng)
+
+
+class FileApp(object):
+    """A WSGI application serving one file. With a ``sendfile_header`` the
+    whole file is left to the front end server, given its path in that
+    header; ranges and 304s are still answered here."""
+
+    def __init__(self, path, content_type=None, headers=(), max_age=None, sendfile_header=None):
+        self.path = path
+        self.sendfile_header = sendfile_header
+        if content_type is None:
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.headers = [('Content-Type', content_type)] + list(headers)
+        if max_age is not None:
+            self.headers.append(('Cache-Control', 'max-age=%d' % max_age))
+
+    def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD'), ('Content-Type', 'text/plain')])
+            return ['Method Not Allowed']
+        try:
+            f = open(self.path, 'rb')
+            st = os.fstat(f.fileno())
+        except (IOError, OSError):
+            return HTTPNotFound()(environ, start_response)
+
+        etag = '"%x-%x-%x"' % (st.st_ino, st.st_size, int(st.st_mtime))
+
+        if self.sendfile_header and not environ.get('HTTP_RANGE') and not not_modified(environ, etag, st.st_mtime):
+            f.close()
+            start_response('200 OK', self.headers + _validators(etag, st.st_mtime) + [(self.sendfile_header, self.path)])
+            return []
+
+        def body(rng):
+            if rng is None:
+                file_wrapper = environ.get('wsgi.file_wrapper')
+                if file_wrapper is not None:
+                    return file_wrapper(f, block_size)
+                return FileIter(f, 0, st.st_size)
+            return FileIter(f, *rng)
+
+        try:
+            app_iter = _respond(environ, start_response, self.headers, etag, st.st_mtime, st.st_size, body)
+        except:
+            f.close()
+            raise
+        if not app_iter:
+            # Nothing to send
+            f.close()
+        return app_iter
+
+
+class FileIter(object):
+    """The bytes from start to stop of an open file, which is closed when
+    the response is"""
+
+    def __init__(self, f, start, stop):
+        self.file = f
+        self.start = start
+        self.stop = stop
+
+    def __iter__(self):
+        self.file.seek(self.start)
+        remaining = self.stop - self.start
+        while remaining > 0:
+            data = self.file.read(min(block_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+    def close(self):
+        self.file.close()
+
+
+class DataApp(object):
+    """A WSGI application serving content that is only fetched, by calling
+    ``get_data``, if it is going to be sent. ``version`` is anything that
+    changes whenever the content does, ``last_modified`` a datetime."""
+
+    def __init__(self, get_data, version, last_modified, content_type='application/octet-stream', headers=()):
+        self.get_data = get_data
+        self.etag = '"%s"' % version
+        self.last_modified = calendar.timegm(last_modified.utctimetuple())
+        self.headers = [('Content-Type', content_type)] + list(headers)
+
+    def __call__(self, environ, start_response):
+        if not_modified(environ, self.etag, self.last_modified):
+            return _respond(environ, start_response, self.headers, self.etag, self.last_modified, 0, None)
+        data = self.get_data()
+        def body(rng):
+            if rng is None:
+                return [data]
+            return [data[rng[0]:rng[1]]]
+        return _respond(environ, start_response, self.headers, self.etag, self.last_modified, len(data), body)
+
+
+class StaticFileParser(StaticURLParser):
+    """Paste's StaticURLParser serving its files with FileApp"""
+
+    def make_app(self, filename):
+        return FileApp(filename)
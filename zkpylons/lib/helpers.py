@@ -43,7 +43,7 @@ from sqlalchemy.orm.util import object_mapper
 import itertools, re, Image
 from glob import glob
 
-from pylons.controllers.util import redirect
+from pylons.controllers.util import redirect, abort
 from zkpylons.model import meta
 
 # Use locale to provide comma grouped currency values
@@ -350,12 +350,13 @@ def url_to_link(body):
     return link_re.sub(r'<a href="\1" title="\1">\6</a>', body)
 
 def signed_in_person():
-    email_address = request.environ.get("REMOTE_USER")
-    if email_address is None:
+    principal = auth.get_principal(request.environ)
+    if principal is None:
         return None
 
-    person = Person.find_by_email(email_address, True)
-    return person
+    if principal.person is None:
+        abort(404, "No such person object")
+    return principal.person
 
 def object_to_defaults(object, prefix):
     defaults = {}
@@ -0,0 +1,214 @@
+"""Per action instrumentation of requests.
+
+InstrumentMiddleware records, for every request, how many SQL statements
+it ran, the time spent in the database and rendering templates, how much
+the process's peak memory use grew, and which statement it ran most often.
+A statement run many times in one request, with different parameters, is
+the usual sign of an N+1 query pattern.
+
+The figures for the most recent requests of each controller/action are
+kept in ``stats`` and shown by the admin action_stats report.
+"""
+import resource
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Statements run at least this many times in one request are reported
+repeat_threshold = 5
+
+# Number of requests remembered for each action
+window = 100
+
+_local = threading.local()
+
+
+class RequestRecord(object):
+    """Counts and timings for the request being handled by this thread"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.statements = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.counts = {}
+        self._statement_started = None
+        self._maxrss = _maxrss()
+
+    def before_statement(self):
+        self._statement_started = time.time()
+
+    def after_statement(self, statement):
+        self.statements += 1
+        self.counts[statement] = self.counts.get(statement, 0) + 1
+        if self._statement_started is not None:
+            self.db_time += time.time() - self._statement_started
+            self._statement_started = None
+
+    def sample(self):
+        repeated = None
+        if self.counts:
+            statement, count = max(self.counts.iteritems(), key=lambda item: item[1])
+            if count >= repeat_threshold:
+                repeated = (count, statement)
+        return Sample(
+            statements=self.statements,
+            db_time=self.db_time,
+            render_time=self.render_time,
+            total_time=time.time() - self.started,
+            # Only approximate while other threads are handling requests
+            memory=_maxrss() - self._maxrss,
+            repeated=repeated,
+        )
+
+
+class Sample(object):
+    """What one request did. Times are in seconds, memory in kilobytes."""
+
+    def __init__(self, statements, db_time, render_time, total_time, memory, repeated):
+        self.statements = statements
+        self.db_time = db_time
+        self.render_time = render_time
+        self.total_time = total_time
+        self.memory = memory
+        # (count, statement) of the most repeated statement, if repeated
+        # at least repeat_threshold times
+        self.repeated = repeated
+
+
+class ActionStats(object):
+    """The samples of the last ``window`` requests of each action"""
+
+    def __init__(self, window=window):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._requests = {}
+
+    def add(self, action, sample):
+        with self._lock:
+            samples = self._samples.setdefault(action, [])
+            samples.append(sample)
+            if len(samples) > self.window:
+                del samples[0]
+            self._requests[action] = self._requests.get(action, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+            self._requests = {}
+
+    def summary(self):
+        """A dict per action summarising its recent requests, busiest
+        actions by database time first."""
+        with self._lock:
+            samples = dict((action, list(s)) for (action, s) in self._samples.iteritems())
+            requests = dict(self._requests)
+
+        result = []
+        for action, s in samples.iteritems():
+            n = float(len(s))
+            repeated = [sample.repeated for sample in s if sample.repeated]
+            result.append({
+                'action': action,
+                'requests': requests[action],
+                'sampled': len(s),
+                'statements_mean': sum(sample.statements for sample in s) / n,
+                'statements_max': max(sample.statements for sample in s),
+                'db_ms_mean': 1000 * sum(sample.db_time for sample in s) / n,
+                'render_ms_mean': 1000 * sum(sample.render_time for sample in s) / n,
+                'total_ms_mean': 1000 * sum(sample.total_time for sample in s) / n,
+                'total_ms_max': 1000 * max(sample.total_time for sample in s),
+                'memory_kb_max': max(sample.memory for sample in s),
+                'repeated_requests': len(repeated),
+                'repeated_max': repeated and max(repeated)[0] or 0,
+                'repeated_statement': repeated and max(repeated)[1] or None,
+            })
+        result.sort(key=lambda row: row['db_ms_mean'] * row['sampled'], reverse=True)
+        return result
+
+stats = ActionStats()
+
+
+def current():
+    """The RequestRecord of the request this thread is handling, if any"""
+    return getattr(_local, 'record', None)
+
+def add_render_time(seconds):
+    record = current()
+    if record is not None:
+        record.render_time += seconds
+
+def _maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    record = current()
+    if record is not None:
+        record.before_statement()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    record = current()
+    if record is not None:
+        record.after_statement(statement)
+
+event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _action(environ):
+    routes = environ.get('pylons.routes_dict')
+    if routes is None:
+        routing_args = environ.get('wsgiorg.routing_args')
+        routes = routing_args and routing_args[1] or {}
+    if not routes.get('controller'):
+        return None
+    return '%s/%s' % (routes['controller'], routes.get('action'))
+
+
+class InstrumentMiddleware(object):
+    """Record a Sample for every routed request in ``store``. The request
+    is finished, and recorded, once its response has been sent."""
+
+    def __init__(self, app, store=None):
+        self.app = app
+        if store is None:
+            store = stats
+        self.store = store
+
+    def __call__(self, environ, start_response):
+        record = RequestRecord()
+        _local.record = record
+        try:
+            app_iter = self.app(environ, start_response)
+        except:
+            self._finish(environ, record)
+            raise
+        return _ClosingIterator(app_iter, lambda: self._finish(environ, record))
+
+    def _finish(self, environ, record):
+        if current() is record:
+            _local.record = None
+        action = _action(environ)
+        if action is not None:
+            self.store.add(action, record.sample())
+
+
+class _ClosingIterator(object):
+    """Pass the response through, calling ``callback`` when it's closed"""
+
+    def __init__(self, app_iter, callback):
+        self.app_iter = app_iter
+        self.callback = callback
+
+    def __iter__(self):
+        return iter(self.app_iter)
+
+    def close(self):
+        try:
+            if hasattr(self.app_iter, 'close'):
+                self.app_iter.close()
+        finally:
+            self.callback()
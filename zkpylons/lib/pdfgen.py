@@ -1,44 +1,238 @@
-
+"""PDF documents made by transforming XML to SVG with XSLT.
+
+The compiled XSLT style sheets are kept between calls, and recompiled when
+the file changes. Turning the SVG into PDF is up to a Renderer, chosen with
+``pdf_renderer`` in the ini file:
+
+``inkscape``
+    Runs ``inkscape -z`` for each document, the default. Several documents
+    at once are rendered by one inkscape shell.
+``inkscape-shell``
+    Keeps an ``inkscape --shell`` process running and sends it every
+    document, saving inkscape's start up time on each one.
+``cairosvg``
+    Renders in this process with CairoSVG, if it is installed. By far the
+    quickest, but check your style sheets come out the same.
+
+bin/pdf_benchmark.py compares them.
+"""
 import os
+import subprocess
 import tempfile
+import threading
 
 from lxml import etree
+from pylons import config
 from pylons.controllers.util import Response, redirect
 
 
+class RendererError(Exception):
+    pass
+
+
+class Renderer(object):
+    """Turns SVG documents into PDF"""
+
+    def render(self, svg):
+        """The PDF data for the SVG document, given as a string"""
+        raise NotImplementedError
+
+    def render_many(self, svgs):
+        """The PDF data for each of the SVG documents"""
+        return [self.render(svg) for svg in svgs]
+
+    def close(self):
+        pass
+
+
+def _write_temp(data, suffix):
+    (fd, path) = tempfile.mkstemp(suffix)
+    os.write(fd, data)
+    os.close(fd)
+    return path
+
+def _read_and_remove(*paths):
+    """The contents of the first file, after removing all of them"""
+    try:
+        f = open(paths[0], 'rb')
+        try:
+            return f.read()
+        finally:
+            f.close()
+    finally:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class InkscapeRenderer(Renderer):
+    """A new inkscape process for each document"""
+
+    def __init__(self, command='inkscape'):
+        self.command = command
+
+    def render(self, svg):
+        svg_path = _write_temp(svg, '.svg')
+        pdf_path = _write_temp('', '.pdf')
+        devnull = open(os.devnull, 'w')
+        try:
+            status = subprocess.call([self.command, '-z', '-f', svg_path, '-A', pdf_path], stdout=devnull, stderr=devnull)
+        finally:
+            devnull.close()
+        pdf_data = _read_and_remove(pdf_path, svg_path)
+        if status != 0 or not pdf_data:
+            raise RendererError('%s failed with status %d' % (self.command, status))
+        return pdf_data
+
+    def render_many(self, svgs):
+        shell = InkscapeShellRenderer(self.command)
+        try:
+            return shell.render_many(svgs)
+        finally:
+            shell.close()
+
+
+class InkscapeShellRenderer(Renderer):
+    """One long running ``inkscape --shell`` rendering document after
+    document. It is started when first needed and restarted if it dies."""
+
+    def __init__(self, command='inkscape'):
+        self.command = command
+        self._process = None
+        self._lock = threading.Lock()
+
+    def render(self, svg):
+        with self._lock:
+            return self._render(svg)
+
+    def render_many(self, svgs):
+        with self._lock:
+            return [self._render(svg) for svg in svgs]
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+    def _render(self, svg):
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+        svg_path = _write_temp(svg, '.svg')
+        pdf_path = _write_temp('', '.pdf')
+        try:
+            self._process.stdin.write('-z -f %s -A %s\n' % (svg_path, pdf_path))
+            self._process.stdin.flush()
+            self._wait_for_prompt()
+        except (IOError, RendererError):
+            self._stop()
+            _read_and_remove(pdf_path, svg_path)
+            raise RendererError('%s --shell stopped' % self.command)
+        pdf_data = _read_and_remove(pdf_path, svg_path)
+        if not pdf_data:
+            raise RendererError('%s --shell made no PDF' % self.command)
+        return pdf_data
+
+    def _start(self):
+        devnull = open(os.devnull, 'w')
+        try:
+            self._process = subprocess.Popen([self.command, '--shell'],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=devnull, close_fds=True)
+        except OSError, e:
+            raise RendererError('Unable to run %s: %s' % (self.command, e))
+        finally:
+            devnull.close()
+        self._wait_for_prompt()
+
+    def _wait_for_prompt(self):
+        # Inkscape prints a ">" when it's ready for the next command
+        while True:
+            c = self._process.stdout.read(1)
+            if not c:
+                raise RendererError('%s --shell exited' % self.command)
+            if c == '>':
+                return
+
+    def _stop(self):
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+                self._process.wait()
+            except (IOError, OSError):
+                pass
+            self._process = None
+
+
+class CairoSVGRenderer(Renderer):
+    """Renders in process with CairoSVG"""
+
+    def __init__(self):
+        try:
+            import cairosvg
+        except ImportError:
+            raise RendererError('pdf_renderer = cairosvg needs CairoSVG installed')
+        self._svg2pdf = cairosvg.svg2pdf
+
+    def render(self, svg):
+        return self._svg2pdf(bytestring=svg)
+
+
+renderers = {
+    'inkscape': InkscapeRenderer,
+    'inkscape-shell': InkscapeShellRenderer,
+    'cairosvg': CairoSVGRenderer,
+}
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def renderer_name():
+    """The name of the renderer set up in the config"""
+    return config.get('pdf_renderer', 'inkscape')
+
+def get_renderer():
+    """The renderer set up in the config, shared by every request"""
+    global _renderer
+    with _renderer_lock:
+        name = renderer_name()
+        if _renderer is None or _renderer[0] != name:
+            if name not in renderers:
+                raise RendererError('Unknown pdf_renderer %r, expected one of %s' % (name, ', '.join(sorted(renderers))))
+            if _renderer is not None:
+                _renderer[1].close()
+            _renderer = (name, renderers[name]())
+        return _renderer[1]
+
+
+_transforms = {}
+_transforms_lock = threading.Lock()
+
+def get_transform(xsl_f):
+    '''The compiled XSLT for the style sheet at the path, compiled again
+    only if the file has changed. '''
+    mtime = os.stat(xsl_f).st_mtime
+    with _transforms_lock:
+        cached = _transforms.get(xsl_f)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    transform = etree.XSLT(etree.parse(xsl_f))
+    with _transforms_lock:
+        _transforms[xsl_f] = (mtime, transform)
+    return transform
+
+def generate_svg(xml_s, xsl_f):
+    '''given xml as a string and a path to xsl style sheet, return the SVG
+    as a string. '''
+    transform = get_transform(xsl_f)
+    return str(transform(etree.fromstring(xml_s)))
 
 def generate_pdf(xml_s, xsl_f):
     '''given xml as a string and a path to xsl style sheet, create a pdf file
     and return the data. '''
+    return get_renderer().render(generate_svg(xml_s, xsl_f))
 
-    styledoc = etree.parse(xsl_f)
-    transform = etree.XSLT(styledoc)
-    doc = etree.fromstring(xml_s)
-    result = transform(doc)
-
-    (svg_fd, svg_path) = tempfile.mkstemp('.svg')
-    os.write(svg_fd, result)
-    os.close(svg_fd)
-
-    (pdf_fd, pdf_path) = tempfile.mkstemp('.pdf')
-    os.close(pdf_fd)
-
-    os.system('inkscape -z -f %s -A %s' % (svg_path, pdf_path))
-    #os.system('/Applications/Inkscape.app/Contents/Resources/bin/inkscape -z -f %s -A %s' % (svg_path, pdf_path))
-    #os.system('svg2pdf %s %s'%(svg_path, pdf_path)) # segmentation fault on osx
-    #os.system('rsvg-convert -f pdf -o %s %s'%(pdf_path, svg_path))  # black boxes everywhere
-
-    pdf_f = file(pdf_path)
-    pdf_data = pdf_f.read()
-    pdf_f.close()
-
-    if os.path.exists(pdf_path):
-        os.remove(pdf_path)
-
-    if os.path.exists(svg_path):
-        os.remove(svg_path)
-
-    return pdf_data
+def generate_pdfs(documents):
+    '''given a list of (xml string, xsl path), return the pdf data for each
+    one, rendered as a batch. '''
+    return get_renderer().render_many([generate_svg(xml_s, xsl_f) for (xml_s, xsl_f) in documents])
 
 
 def wrap_pdf_response(pdf_data, filename):
@@ -0,0 +1,492 @@
+"""Photo competition entries and the index of them.
+
+The photo files are stored in a directory, the file names describing all
+the required attributes. Listing and parsing the whole directory on every
+request gets slow as the competition goes on, so the entries are also kept
+in an index file in the same directory. It is updated whenever a photo is
+added or deleted and can always be rebuilt from the files, see
+bin/photocomp_reindex.py.
+"""
+import datetime
+import errno
+import fcntl
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+import Image
+
+from zkpylons.config import zkpylons_config
+from zkpylons.model.config import Config
+
+
+DAYS_OPEN       = 4                     # Number of days the competition is open
+ENTRY_NAMES     = ("1", "2")            # Names of daily entries
+MAX_IMAGE_SIZE  = 10                    # Max image size in mega bytes
+VALID_EXTENSIONS= ("jpg","jpeg")        # Acceptable file name extensions
+
+RESIZE_PROCESSES= 2                     # Processes making scaled images
+DATE_FORMAT     = "%Y-%m-%dT%H:%M:%S"   # Format of the "date" config entry
+
+log = logging.getLogger(__name__)
+
+
+def get_open_date():
+    """The day the competition opens, the conference start date"""
+    return datetime.datetime.strptime(Config.get("date"), DATE_FORMAT)
+
+
+class PhotoCompEntry(object):
+    SCALES       = frozenset(('orig', '68x51', '250x250', '1024x768'))
+    day         = None
+    person_id   = None
+    entry_id    = None
+    image_name  = None
+    image       = None
+    scales      = None
+
+    def __init__(self, person_id, day, entry_id, image_name, open_date=None, db_dir=None):
+        self.person_id = person_id
+        self.day = day
+        self.entry_id = entry_id
+        self.image_name = image_name
+        self.scales = set()
+        # Looked up when first needed if not given
+        self._open_date = open_date
+        self._db_dir = db_dir
+
+    @property
+    def key(self):
+        return (self.person_id, self.day, self.entry_id)
+
+    def filename(self, scale):
+        if self._open_date is None:
+            self._open_date = get_open_date()
+        date_day = self._open_date + datetime.timedelta(self.day)
+        date_str = date_day.strftime("%Y%m%d")
+        return "%s-%08d-%d-%s-%s" % (date_str, self.person_id, self.entry_id, scale, self.image_name)
+
+    def pathname(self, scale):
+        return os.path.join(self._db_dir or self.get_db_dir(), self.filename(scale))
+
+    def write_orig(self, image_data):
+        handle = open(self.pathname("orig"), "wb")
+        try:
+            handle.write(image_data)
+        finally:
+            handle.close()
+        self.scales.add("orig")
+
+    # Make any missing scaled images now. Returns True if anything changed.
+    def write_scaled(self):
+        if self.scales == self.SCALES:
+            return False
+        unwanted_scales = self.scales - self.SCALES
+        for scale in unwanted_scales:
+            try:
+                os.remove(self.pathname(scale))
+            except EnvironmentError, e:
+                if e.errno != errno.ENOENT:
+                    raise
+        self.scales -= unwanted_scales
+        missing = self.SCALES - self.scales
+        if missing:
+            self.scales.update(make_scales(self.pathname("orig"), self.targets(missing)))
+        return True
+
+    # The (scale, pathname) of each of the scaled images
+    def targets(self, scales):
+        return [(scale, self.pathname(scale)) for scale in scales]
+
+    def delete(self, db):
+        db.remove(self)
+        self.remove_files()
+
+    def remove_files(self):
+        for scale in self.SCALES:
+            try:
+                os.remove(self.pathname(scale))
+            except EnvironmentError, e:
+                if e.errno != errno.ENOENT:
+                    raise
+
+    def add(self, db):
+        if self.day < 0 or self.day >= DAYS_OPEN:
+            return
+        if self.entry_id < 0 or self.entry_id >= len(ENTRY_NAMES):
+            return
+        db.add(self)
+
+    def get(cls, db, person_id, day, entry_id):
+        result = db.photo(person_id, day, entry_id)
+        if result is not None:
+            thumbnails.submit(result, db)
+        return result
+    get = classmethod(get)
+
+    def from_filename(cls, filename, open_date=None, db_dir=None):
+        if open_date is None:
+            open_date = get_open_date()
+        toks = filename.split("-", 4)
+        photo_date = datetime.datetime(*time.strptime(toks[0], "%Y%m%d")[:3])
+        day = (photo_date.date() - open_date.date()).days
+        person_id = int(toks[1], 10)
+        entry_id = int(toks[2], 10)
+        image_name = toks[4]
+        photo = cls(person_id, day, entry_id, image_name, open_date, db_dir)
+        photo.scales.add(toks[3])
+        return photo
+    from_filename = classmethod(from_filename)
+
+    def get_db_dir(cls):
+        db_dir = zkpylons_config.get_path('photocomp_path')
+        if not os.path.exists(db_dir):
+            os.mkdir(db_dir, 0777)
+        return db_dir
+    get_db_dir = classmethod(get_db_dir)
+
+    def __repr__(self):
+        return "PhotoCompEntry(%r)" % self.filename("orig")
+
+
+class PhotoCompIndex(object):
+    """The entries in the photo directory, by person, day and entry.
+
+    The index lives in ``.index`` in the photo directory, which is skipped
+    when the directory itself is read. Each process keeps a copy in memory
+    and reloads it when another process has replaced the file. Changes are
+    made with the file locked, so concurrent uploads don't lose each
+    other's entries.
+    """
+    INDEX_NAME = ".index"
+    LOCK_NAME  = ".index.lock"
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, db_dir):
+        self.db_dir = db_dir
+        self.path = os.path.join(db_dir, self.INDEX_NAME)
+        self.open_date = None
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._clear()
+
+    # The index of the photo directory, up to date with the file
+    def load(cls, open_date, db_dir=None):
+        if db_dir is None:
+            db_dir = PhotoCompEntry.get_db_dir()
+        with cls._instances_lock:
+            index = cls._instances.get(db_dir)
+            if index is None:
+                index = cls._instances[db_dir] = cls(db_dir)
+        index.refresh(open_date)
+        return index
+    load = classmethod(load)
+
+    def refresh(self, open_date):
+        """Reload the index if the file changed, or rebuild it if there isn't
+        one or it was built for a different opening date."""
+        with self._lock:
+            if self._stamp is not None and self._stamp == self._file_stamp() and self.open_date == open_date:
+                return
+            with self._file_lock():
+                if not self._read() or self.open_date != open_date:
+                    self._scan(open_date)
+                    self._write()
+
+    def rebuild(self, open_date):
+        """Throw the index away and read the photo directory again"""
+        with self._lock:
+            with self._file_lock():
+                self._scan(open_date)
+                self._write()
+
+    def photo(self, person_id, day, entry_id):
+        return self._entries.get((person_id, day, entry_id))
+
+    def add_scales(self, photo, scales):
+        """Record that scaled images of the photo have been made. Returns
+        False if the photo has since been deleted or replaced."""
+        with self._lock:
+            with self._file_lock():
+                self._read()
+                current = self._entries.get(photo.key)
+                if current is None or current.image_name != photo.image_name:
+                    return False
+                current.scales.update(scales)
+                self._write()
+                return True
+
+    def for_person(self, person_id):
+        return self._by_person.get(person_id, {}).values()
+
+    def for_day(self, day):
+        return self._by_day.get(day, {}).values()
+
+    def all(self):
+        return self._entries.values()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, photo):
+        """Add or replace the entry, and save the index"""
+        with self._lock:
+            with self._file_lock():
+                self._read()
+                self._insert(photo)
+                self._write()
+
+    def remove(self, photo):
+        """Remove the entry, if present, and save the index"""
+        with self._lock:
+            with self._file_lock():
+                self._read()
+                self._discard(photo.key)
+                self._write()
+
+    def _clear(self):
+        self._entries = {}
+        self._by_person = {}
+        self._by_day = {}
+
+    def _insert(self, photo):
+        self._discard(photo.key)
+        self._entries[photo.key] = photo
+        self._by_person.setdefault(photo.person_id, {})[photo.key] = photo
+        self._by_day.setdefault(photo.day, {})[photo.key] = photo
+
+    def _discard(self, key):
+        photo = self._entries.pop(key, None)
+        if photo is not None:
+            del self._by_person[photo.person_id][key]
+            del self._by_day[photo.day][key]
+
+    # Read the directory storing the photos.
+    def _scan(self, open_date):
+        self._clear()
+        self.open_date = open_date
+        for entry_filename in os.listdir(self.db_dir):
+            if entry_filename.startswith("."):
+                continue
+            photo = PhotoCompEntry.from_filename(entry_filename, open_date, self.db_dir)
+            if photo.day < 0 or photo.day >= DAYS_OPEN:
+                continue
+            if photo.entry_id < 0 or photo.entry_id >= len(ENTRY_NAMES):
+                continue
+            current = self._entries.get(photo.key)
+            if current is None:
+                self._insert(photo)
+            else:
+                current.scales |= photo.scales
+        #
+        # Get rid of photos that don't have an original.
+        #
+        for photo in self._entries.values():
+            if 'orig' not in photo.scales:
+                self._discard(photo.key)
+                photo.remove_files()
+
+    # Load the index file, if it has changed. Returns False if there isn't
+    # a usable one.
+    def _read(self):
+        stamp = self._file_stamp()
+        if stamp is None:
+            return False
+        if stamp == self._stamp:
+            return True
+        try:
+            handle = open(self.path, "rb")
+            try:
+                data = json.load(handle)
+            finally:
+                handle.close()
+            open_date = datetime.datetime.strptime(data['open_date'], DATE_FORMAT)
+            photos = []
+            for person_id, day, entry_id, image_name, scales in data['entries']:
+                photo = PhotoCompEntry(person_id, day, entry_id, image_name, open_date, self.db_dir)
+                photo.scales.update(scales)
+                photos.append(photo)
+        except (EnvironmentError, ValueError, KeyError, TypeError):
+            return False
+        self._clear()
+        self.open_date = open_date
+        for photo in photos:
+            self._insert(photo)
+        self._stamp = stamp
+        return True
+
+    def _write(self):
+        data = {
+            'open_date': self.open_date.strftime(DATE_FORMAT),
+            'entries': [
+                [p.person_id, p.day, p.entry_id, p.image_name, sorted(p.scales)]
+                for p in self._entries.itervalues()],
+        }
+        # Write then rename so readers never see a partial index
+        fd, tmp = tempfile.mkstemp(dir=self.db_dir, prefix=self.INDEX_NAME)
+        try:
+            handle = os.fdopen(fd, "wb")
+            try:
+                json.dump(data, handle)
+            finally:
+                handle.close()
+            os.rename(tmp, self.path)
+        except:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self._stamp = self._file_stamp()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime, st.st_size)
+
+    def _file_lock(self):
+        return _FileLock(os.path.join(self.db_dir, self.LOCK_NAME))
+
+
+class _FileLock(object):
+    """An exclusive lock between processes, held for a with block"""
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def __enter__(self):
+        self.handle = open(self.path, "a")
+        fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        finally:
+            self.handle.close()
+            self.handle = None
+
+
+def make_scales(orig_path, targets):
+    """Write the scaled images of the original, largest first, each one
+    resized from the one before. ``targets`` is a list of (scale, pathname).
+    Returns the scales written."""
+    sizes = [(tuple(int(s) for s in scale.split("x")), scale, pathname) for (scale, pathname) in targets]
+    sizes.sort(reverse=True)
+    if not sizes:
+        return []
+    image = Image.open(orig_path)
+    # Let the JPEG decoder shrink the image by up to 8 times as it reads
+    # it, no smaller than the largest size wanted. Much quicker than
+    # decoding a camera sized image in full.
+    image.draft(image.mode, sizes[0][0])
+    made = []
+    for (max_x, max_y), scale, pathname in sizes:
+        x, y = image.size
+        x_scale, y_scale = float(x) / max_x, float(y) / max_y
+        if x_scale > 1.0 or y_scale > 1.0:
+            if x_scale <= y_scale:
+                new_size = (int(x / y_scale), max_y)
+            else:
+                new_size = (max_x, int(y / x_scale))
+            image = image.resize(new_size, Image.ANTIALIAS)
+        # Written under a hidden name first so no one sees half an image
+        tmp = os.path.join(os.path.dirname(pathname), "." + os.path.basename(pathname))
+        image.save(tmp, "JPEG")
+        os.rename(tmp, pathname)
+        made.append(scale)
+    return made
+
+def _make_scales_job(orig_path, targets):
+    # Exceptions don't make it back through apply_async's callback
+    try:
+        return make_scales(orig_path, targets), None
+    except Exception, e:
+        return [], "%s: %s" % (orig_path, e)
+
+
+class ThumbnailQueue(object):
+    """Makes the scaled images of photos in a pool of processes, so uploads
+    and page views don't wait for them. Until they are ready the original
+    is served in their place.
+
+    The pool is started by start() when the app loads, as forking from a
+    request thread would copy locks other threads hold. Without it, e.g. in
+    scripts, the scales are made straight away in this process.
+    """
+
+    def __init__(self, processes=RESIZE_PROCESSES):
+        self.processes = processes
+        self._pool = None
+        self._lock = threading.Lock()
+        # photo.key: image_name of the photos being worked on
+        self._pending = {}
+
+    def start(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(self.processes)
+
+    def submit(self, photo, db):
+        """Queue up the photo's missing scales, if it has any and they're
+        not already queued. Returns True if the scales aren't all ready."""
+        missing = photo.SCALES - photo.scales
+        if not missing:
+            return False
+        with self._lock:
+            if self._pending.get(photo.key) == photo.image_name:
+                return True
+            self._pending[photo.key] = photo.image_name
+            pool = self._pool
+        targets = photo.targets(missing)
+        if pool is None:
+            self._finished(photo, db, _make_scales_job(photo.pathname("orig"), targets))
+            return False
+        pool.apply_async(_make_scales_job, (photo.pathname("orig"), targets),
+                         callback=lambda result: self._finished(photo, db, result))
+        return True
+
+    def pending(self, photo):
+        with self._lock:
+            return self._pending.get(photo.key) == photo.image_name
+
+    def progress(self, photo):
+        """(made, total) scaled images of the photo, counting the ones the
+        pool has written so far"""
+        scales = photo.SCALES - set(["orig"])
+        made = [scale for scale in scales if scale in photo.scales or os.path.exists(photo.pathname(scale))]
+        return len(made), len(scales)
+
+    def wait(self):
+        """Finish the queued work and stop the pool"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    # Called in the parent process by the pool's result thread
+    def _finished(self, photo, db, result):
+        scales, error = result
+        with self._lock:
+            if self._pending.get(photo.key) == photo.image_name:
+                del self._pending[photo.key]
+        if error:
+            log.error("Couldn't scale photo %s", error)
+        if scales and not db.add_scales(photo, scales):
+            # Deleted while being scaled
+            for scale in scales:
+                try:
+                    os.remove(photo.pathname(scale))
+                except EnvironmentError, e:
+                    if e.errno != errno.ENOENT:
+                        raise
+
+thumbnails = ThumbnailQueue()
@@ -0,0 +1,9 @@
+"""Rendering templates outside a request, e.g. in batch jobs and while a
+download is streamed."""
+
+
+class TemplateContext(object):
+    """Stands in for ``c`` when rendering outside a request"""
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
@@ -13,14 +13,18 @@ oddeven = oddeven()
 <table border="1">
 <tr>
 % for header in c.columns:
-  <th>${ header }</th>
+%   if header == c.sort and not c.desc:
+  <th><a href="${ c.page_url(sort=header, desc='1', page=None) }">${ header } &#9650;</a></th>
+%   elif header == c.sort:
+  <th><a href="${ c.page_url(sort=header, desc=None, page=None) }">${ header } &#9660;</a></th>
+%   else:
+  <th><a href="${ c.page_url(sort=header, desc=None, page=None) }">${ header }</a></th>
+%   endif
 % endfor
 </tr>
 
-<% rows = 0 %>
 %for row in c.data:
   <tr class="${ oddeven.next() }">
-<%   rows += 1 %>
 %   for item in row:
       <td class="list">
         ${ item | h }
@@ -29,7 +33,23 @@ oddeven = oddeven()
   </tr>
 %endfor
 </table>
-<p>(${ rows |h} rows)</p>
+% if c.data:
+<p>(rows ${ c.first_row |h} to ${ c.first_row + len(c.data) - 1 |h} of ${ not c.total_exact and c.total is not None and 'about ' or '' }${ c.total is not None and c.total or 'many' |h})</p>
+% else:
+<p>(0 rows)</p>
+% endif
+
+% if c.page > 1 or c.more:
+<p>
+%   if c.page > 1:
+  <a href="${ c.page_url(page=c.page - 1) }">Previous</a>
+%   endif
+%   if c.more:
+  <a href="${ c.page_url(page=c.page + 1) }">Next</a>
+%   endif
+  <a href="${ c.page_url(page=None, per_page=0) }">Show all</a>
+</p>
+% endif
 
 <br>
 <p>${ h.link_to("Back to admin list", h.url_for(controller='admin')) }</p>
@@ -106,7 +106,7 @@ ${ h.link_to(h.util.html_escape(a.filename), url=h.url_for(controller='funding_a
 </td>
 
 <td>
-${ len(a.content)/1024/1024 }MB
+${ a.size/1024/1024 }MB
 </td>
 
 <td>
@@ -41,8 +41,13 @@ ${ h.form(h.url_for(controller="photocomp", action="upload"), multipart=True) }
 %for entry_id in range(len(c.ENTRY_NAMES)):
     <td style="padding: 10px;">
       <table style="height: 250px; width: 250px; border: none; margin: auto; padding: 0"><tr><td style="border: none; padding: 0;"><div style="margin: auto; text-align: center;">
-%if c.photo(day, entry_id) is not None:
-        <a href="/photocomp/photo/${c.photo(day, entry_id).filename('orig')}"><img src="/photocomp/photo/${c.photo(day, entry_id).filename('250x250')}" style="margin: 0;"/></a>
+<% photo = c.photo(day, entry_id) %>
+%if photo is not None:
+        <a href="/photocomp/photo/${photo.filename('orig')}"><img src="/photocomp/photo/${photo.filename('250x250')}" style="margin: 0; max-width: 250px; max-height: 250px;"/></a>
+<% made, total = c.thumbnail_progress(photo) %>
+%if made < total:
+        <br/>(Making thumbnails, ${ made } of ${ total } done)
+%endif
 %else:
         <img src="/images/photocomp-noentry.png" style="margin: 0;"/>
 %endif
@@ -36,7 +36,7 @@
 <body>
   <div id="gallery">
   %for photo in c.photos:
-    <a href="/photocomp/photo/${photo.filename('1024x768')}"><img src="/photocomp/photo/${photo.filename('68x51')}" alt="${photo.filename('orig')}" title="${c.photo_title(photo)}"/></a>
+    <a href="/photocomp/photo/${photo.filename('1024x768')}"><img src="/photocomp/photo/${photo.filename('68x51')}" style="max-width: 68px; max-height: 51px;" alt="${photo.filename('orig')}" title="${c.photo_title(photo)}"/></a>
   %endfor
   </div>
   <script type="text/javascript">
@@ -31,7 +31,7 @@
   <tr><td style="border: none; padding: 0; margin: 0;">
     <div id="gallery" style="height: 500px; width: 660px; z-index: 10000">
     %for photo in c.photos:
-      <a href="/photocomp/photo/${photo.filename('1024x768')}"><img src="/photocomp/photo/${photo.filename('68x51')}" alt="${photo.filename('orig')}" title="${c.photo_title(photo)}"/></a>
+      <a href="/photocomp/photo/${photo.filename('1024x768')}"><img src="/photocomp/photo/${photo.filename('68x51')}" style="max-width: 68px; max-height: 51px;" alt="${photo.filename('orig')}" title="${c.photo_title(photo)}"/></a>
     %endfor
     </div>
   </td></tr>
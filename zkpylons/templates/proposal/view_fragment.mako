@@ -150,12 +150,12 @@ ${ h.link_to(h.util.html_escape(a.filename), url=h.url_for(controller='attachmen
 </td>
 
 <td>
-%if len(a.content) >= (1024*1024):
-${ round(len(a.content)/1024.0/1024.0, 1) } MB
-%elif len(a.content) >= (1024):
-${ round(len(a.content)/1024.0, 1) } kB
+%if a.size >= (1024*1024):
+${ round(a.size/1024.0/1024.0, 1) } MB
+%elif a.size >= (1024):
+${ round(a.size/1024.0, 1) } kB
 %else:
-${ len(a.content) } B
+${ a.size } B
 %endif
 </td>
 
@@ -0,0 +1,86 @@
+import json
+
+from routes import url_for
+
+from .fixtures import FulfilmentFactory, FulfilmentItemFactory, PersonFactory, RoleFactory
+from .utils import do_login
+
+from zk.model.fulfilment import Fulfilment
+
+
+class TestCheckin(object):
+    def _post(self, app, fulfilments, status=200):
+        return app.post(url_for(controller='checkin', action='update_fulfilments'),
+                        params={'data': json.dumps({'fulfilments': fulfilments})}, status=status)
+
+    def _data(self, fulfilment, qty, **kwargs):
+        data = {
+            'id': fulfilment.id,
+            'version': fulfilment.version,
+            'type_id': fulfilment.type_id,
+            'status_id': fulfilment.status_id,
+            'code': fulfilment.code,
+            'fulfilment_items': [{'id': item.id, 'product_id': item.product_id, 'product_text': item.product_text, 'qty': qty}
+                                 for item in fulfilment.items],
+        }
+        data.update(kwargs)
+        return data
+
+    def test_lookup(self, app, db_session):
+        user = PersonFactory(roles = [RoleFactory(name = 'checkin')])
+        zeb = PersonFactory(firstname='Zebedee', lastname='Quill', email_address='zeb@example.org')
+        db_session.commit()
+
+        do_login(app, user)
+        resp = app.get(url_for(controller='checkin', action='lookup', q='Zebedee'))
+        # The desk reads each person as an object
+        results = json.loads(resp.body)['r']
+        assert [sorted(r) for r in results] == [['id', 'pretty']]
+        assert results[0]['id'] == zeb.id
+        assert 'zeb@example.org' in results[0]['pretty']
+
+    def test_update_fulfilments(self, app, db_session):
+        user = PersonFactory(roles = [RoleFactory(name = 'checkin')])
+        fulfilment = FulfilmentFactory(code='BADGE1')
+        FulfilmentItemFactory(fulfilment=fulfilment, qty=1)
+        FulfilmentItemFactory(fulfilment=fulfilment, qty=1)
+        db_session.commit()
+        id = fulfilment.id
+        read = self._data(fulfilment, 1)
+
+        do_login(app, user)
+
+        resp = self._post(app, [self._data(fulfilment, 3, code='BADGE2')])
+        version = json.loads(resp.body)['fulfilments'][str(id)]
+        assert version == read['version'] + 1
+
+        db_session.expire_all()
+        fulfilment = Fulfilment.find_by_id(id)
+        assert fulfilment.code == 'BADGE2'
+        assert [item.qty for item in fulfilment.items] == [3, 3]
+
+        # Another desk still has the version from before
+        read['code'] = 'BADGE3'
+        resp = self._post(app, [read], status=409)
+        assert json.loads(resp.body)['conflicts'] == [id]
+
+        # Leaving out an item saves nothing
+        short = self._data(fulfilment, 5)
+        short['fulfilment_items'].pop()
+        resp = self._post(app, [short], status=400)
+        assert json.loads(resp.body)['errors']
+
+        # Nor does a missing or bad field, wherever it is
+        bad_qty = self._data(fulfilment, 5)
+        bad_qty['fulfilment_items'][1]['qty'] = 'lots'
+        missing = self._data(fulfilment, 5)
+        del missing['status_id']
+        for bad in (bad_qty, missing):
+            resp = self._post(app, [self._data(fulfilment, 7, code='BADGE4'), bad], status=400)
+            assert json.loads(resp.body)['errors']
+
+        db_session.expire_all()
+        fulfilment = Fulfilment.find_by_id(id)
+        assert fulfilment.code == 'BADGE2'
+        assert fulfilment.version == version
+        assert [item.qty for item in fulfilment.items] == [3, 3]
@@ -29,6 +29,24 @@ class TestFundingAttachment(CrudHelper):
         assert resp.content_type == "custom/blob"
         assert resp.body == bytes("bloblbolbblob")
 
+    def test_view_conditional(self, app, db_session):
+        user = PersonFactory(roles = [RoleFactory(name = 'organiser')])
+        target = FundingAttachmentFactory(filename="bobs.blob", content=bytes("bloblbolbblob"), content_type="custom/blob")
+        db_session.commit()
+
+        do_login(app, user)
+
+        url = url_for(controller='funding_attachment', action='view', id=target.id)
+        resp = app.get(url)
+        etag = resp.headers['ETag']
+
+        resp = app.get(url, headers={'If-None-Match': etag}, status=304)
+        assert resp.body == ''
+
+        resp = app.get(url, headers={'Range': 'bytes=5-8'}, status=206)
+        assert resp.headers['Content-Range'] == 'bytes 5-8/13'
+        assert resp.body == bytes("bolb")
+
     def test_index(self):
         # Override CRUD
         pass
@@ -21,6 +21,8 @@ controller_entry_points = [
     {'url':'/admin/rej_proposals_abstracts',             'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/_collect_garbage',                    'resp':[404,404,404,404,404,404,404,404,404,404,404]},
     {'url':'/admin/_known_objects',                      'resp':[404,404,404,404,404,404,404,404,404,404,404]},
+    {'url':'/admin/action_stats',                        'resp':[403,403,200,403,403,403,403,403,403,403,403]},
+    {'url':'/admin/action_stats_json',                   'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/list_attachments',                    'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/auth_users',                          'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/proposal_list',                       'resp':[403,403,200,403,403,403,403,403,403,403,403]},
@@ -82,6 +84,7 @@ controller_entry_points = [
     {'url':'/admin/_volunteer_grid',                     'resp':[404,404,404,404,404,404,404,404,404,404,404]},
     {'url':'/admin/paid_counts_by_date',                 'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/paid_product_by_date',                'resp':[403,403,200,403,403,403,403,403,403,403,403]},
+    {'url':'/admin/paid_category_by_date',               'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/paid_ticket_by_date',                 'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/paid_accom_by_date',                  'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/av_norelease',                        'resp':[403,403,200,403,403,403,403,403,403,403,403]},
@@ -123,7 +126,8 @@ controller_entry_points = [
     {'url':'/checkin/__before__',                        'resp':[404,404,404,404,404,404,404,404,404,404,404]},
     {'url':'/checkin/lookup',                            'resp':[403,403,500,403,403,403,403,403,403,403,403]},
     {'url':'/checkin/person_data',                       'resp':[403,403,500,403,403,403,403,403,403,403,403]},
-    {'url':'/checkin/update_fulfilments',                'resp':[403,403,500,403,403,403,403,403,403,403,403]},
+    {'url':'/checkin/people_data',                       'resp':[403,403,500,403,403,403,403,403,403,403,403]},
+    {'url':'/checkin/update_fulfilments',                'resp':[403,403,400,403,403,403,403,403,403,403,403]},
     {'url':'/checkin/get_talk',                          'resp':[403,403,500,403,403,403,403,403,403,403,403]},
     {'url':'/checkin/bio_list',                          'resp':[403,403,500,403,403,403,403,403,403,403,403]},
     {'url':'/db_content/__before__',                     'resp':[500,500,500,500,500,500,500,500,500,500,500]},
@@ -797,6 +801,8 @@ controller_id_entry_points = [
     {'url':'/admin/23/rej_proposals_abstracts',          'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/23/_collect_garbage',                 'resp':[404,404,404,404,404,404,404,404,404,404,404]},
     {'url':'/admin/23/_known_objects',                   'resp':[404,404,404,404,404,404,404,404,404,404,404]},
+    {'url':'/admin/23/action_stats',                     'resp':[403,403,200,403,403,403,403,403,403,403,403]},
+    {'url':'/admin/23/action_stats_json',                'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/23/list_attachments',                 'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/23/auth_users',                       'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/23/proposal_list',                    'resp':[403,403,200,403,403,403,403,403,403,403,403]},
@@ -858,6 +864,7 @@ controller_id_entry_points = [
     {'url':'/admin/23/_volunteer_grid',                  'resp':[404,404,404,404,404,404,404,404,404,404,404]},
     {'url':'/admin/23/paid_counts_by_date',              'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/23/paid_product_by_date',             'resp':[403,403,200,403,403,403,403,403,403,403,403]},
+    {'url':'/admin/23/paid_category_by_date',            'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/23/paid_ticket_by_date',              'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/23/paid_accom_by_date',               'resp':[403,403,200,403,403,403,403,403,403,403,403]},
     {'url':'/admin/23/av_norelease',                     'resp':[403,403,200,403,403,403,403,403,403,403,403]},
@@ -901,7 +908,8 @@ controller_id_entry_points = [
     {'url':'/checkin/23/get_talk',                       'resp':[403,403,500,403,403,403,403,403,403,403,403]},
     {'url':'/checkin/23/lookup',                         'resp':[403,403,500,403,403,403,403,403,403,403,403]},
     {'url':'/checkin/23/person_data',                    'resp':[403,403,500,403,403,403,403,403,403,403,403]},
-    {'url':'/checkin/23/update_fulfilments',             'resp':[403,403,500,403,403,403,403,403,403,403,403]},
+    {'url':'/checkin/23/people_data',                    'resp':[403,403,500,403,403,403,403,403,403,403,403]},
+    {'url':'/checkin/23/update_fulfilments',             'resp':[403,403,400,403,403,403,403,403,403,403,403]},
     {'url':'/db_content/23/__before__',                  'resp':[404,404,404,404,404,404,404,404,404,404,404]},
     {'url':'/db_content/23/_new',                        'resp':[404,404,404,404,404,404,404,404,404,404,404]},
     {'url':'/db_content/23/view',                        'resp':[404,404,404,404,404,404,404,404,404,404,404]},
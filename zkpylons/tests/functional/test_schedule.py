@@ -86,3 +86,31 @@ class TestSchedule(CrudHelper):
 
         CrudHelper.test_edit(self, app, db_session, initial_values=initial_values, new_values=new_values, target=target)
 
+
+    def test_feed_validators(self, app, db_session):
+        schedule = ScheduleFactory(event=EventFactory(title="First title"), time_slot=TimeSlotFactory(primary=True))
+        ConfigFactory(key="time_zone", value="UTC") # Required for ical
+        ConfigFactory(key="event_host", value="localhost:80") # Feeds are only cached for it
+        db_session.commit()
+
+        etags = {}
+        for action in ('ical', 'json'):
+            resp = app.get(url_for(controller='schedule', action=action))
+            etags[action] = resp.headers['ETag']
+            assert "First title" in resp.body
+
+            # Unchanged, so the client's copy is still good
+            resp = app.get(url_for(controller='schedule', action=action), headers={'If-None-Match': etags[action]}, status=304)
+            assert resp.body == ''
+            resp = app.get(url_for(controller='schedule', action=action), headers={'If-Modified-Since': resp.headers['Last-Modified']}, status=304)
+
+        schedule.event.title = "Second title"
+        db_session.commit()
+
+        for action in ('ical', 'json'):
+            resp = app.get(url_for(controller='schedule', action=action), headers={'If-None-Match': etags[action]}, status=200)
+            assert "Second title" in resp.body
+
+            # Any other host gets the same feed, built for it
+            resp = app.get(url_for(controller='schedule', action=action), headers={'Host': 'elsewhere.example.org'})
+            assert "Second title" in resp.body
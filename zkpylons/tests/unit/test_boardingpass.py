@@ -0,0 +1,74 @@
+import os
+
+from pylons import config
+
+from zkpylons.lib import boardingpass, pdfgen
+from zkpylons.lib.boardingpass import JobProgress
+
+def test_progress(tmpdir):
+    path = str(tmpdir.join('.progress.json'))
+    progress = JobProgress(path)
+    assert str(progress) == 'Not run yet'
+
+    progress.start(3)
+    progress.record('a.pdf', 'aaa', made=False)
+    progress.record('b.pdf', 'bbb')
+    assert progress.running
+
+    # Picked up again after a crash
+    saved = JobProgress(path).load()
+    assert saved.running
+    assert saved.total == 3
+
+    progress.record('c.pdf', None)
+    progress.finish()
+
+    saved = JobProgress(path).load()
+    assert not saved.running
+    assert saved.outputs == {'a.pdf': 'aaa', 'b.pdf': 'bbb'}
+    assert str(saved) == 'Completed: 3 of 3 done, 1 made, 1 up to date, 1 failed'
+
+class FakeRenderer(pdfgen.Renderer):
+    def render(self, svg):
+        return 'PDF'
+
+def test_make_pdf(tmpdir, monkeypatch):
+    xsl = tmpdir.join('pdf.xsl')
+    xsl.write('<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">'
+              '<xsl:template match="/"><svg/></xsl:template></xsl:stylesheet>')
+    monkeypatch.setitem(pdfgen.renderers, 'fake', FakeRenderer)
+    monkeypatch.setitem(config, 'pdf_renderer', 'fake')
+    path = str(tmpdir.join('bob@example.com.pdf'))
+
+    result = boardingpass._make_pdf(('bob@example.com.pdf', 'abc', '<boardingpass/>', str(xsl), path))
+    assert result == ('bob@example.com.pdf', 'abc', None)
+    assert open(path).read() == 'PDF'
+
+    filename, digest, error = boardingpass._make_pdf(('bad.pdf', 'abc', '<not xml', str(xsl), path))
+    assert digest is None
+    assert error.startswith('bad.pdf: ')
+
+def test_init_worker(monkeypatch):
+    # A worker never shares the parent's renderer, or its lock
+    renderer, lock = object(), pdfgen._renderer_lock
+    monkeypatch.setattr(pdfgen, '_renderer', ('fake', renderer))
+    monkeypatch.setattr(pdfgen, '_renderer_lock', lock)
+    boardingpass._init_worker()
+    assert pdfgen._renderer is None
+    assert pdfgen._renderer_lock is not lock
+
+def test_make_pdfs(tmpdir, monkeypatch):
+    xsl = tmpdir.join('pdf.xsl')
+    xsl.write('<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">'
+              '<xsl:template match="/"><svg/></xsl:template></xsl:stylesheet>')
+    monkeypatch.setitem(pdfgen.renderers, 'fake', FakeRenderer)
+    monkeypatch.setitem(config, 'pdf_renderer', 'fake')
+    good = [('%d.pdf' % i, str(i), '<boardingpass/>', str(xsl), str(tmpdir.join('%d.pdf' % i))) for i in range(2)]
+
+    assert boardingpass._make_pdfs(good) == [('0.pdf', '0', None), ('1.pdf', '1', None)]
+    assert open(str(tmpdir.join('1.pdf'))).read() == 'PDF'
+
+    # One bad document doesn't lose the rest of the batch
+    bad = ('bad.pdf', 'abc', '<not xml', str(xsl), str(tmpdir.join('bad.pdf')))
+    results = boardingpass._make_pdfs([good[0], bad, good[1]])
+    assert [digest for (filename, digest, error) in results] == ['0', None, '1']
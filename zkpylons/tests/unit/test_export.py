@@ -0,0 +1,46 @@
+import csv
+import tarfile
+from StringIO import StringIO
+
+from zkpylons.lib import badges, export
+
+def test_csv_chunks():
+    rows = [[n, 'row %d' % n] for n in range(export.batch_size * 2 + 1)]
+    chunks = list(export.csv_chunks(['id', 'name'], iter(rows)))
+
+    # A chunk per full batch, and the remainder
+    assert len(chunks) == 3
+
+    read = list(csv.reader(StringIO(''.join(chunks))))
+    assert read[0] == ['id', 'name']
+    assert read[1:] == [[str(n), name] for (n, name) in rows]
+
+def test_csv_chunks_empty():
+    assert ''.join(export.csv_chunks(['id'], [])) == 'id\r\n'
+
+def test_tar_chunks():
+    members = [('badges/badges-%04d.svg' % n, '<svg>%d</svg>' % n) for n in range(1, 4)]
+    chunks = list(export.tar_chunks(iter(members)))
+
+    # A chunk per file, and the end of the tarball
+    assert len(chunks) == 4
+
+    tar = tarfile.open(fileobj=StringIO(''.join(chunks)), mode='r:gz')
+    assert [(info.name, tar.extractfile(info).read()) for info in tar] == members
+
+def test_badge_sheets():
+    assert badges.sheets([]) == []
+    sheets = badges.sheets([{'firstname': str(n)} for n in range(5)])
+    assert [len(sheet) for sheet in sheets] == [4, 4]
+    assert sheets[1][0] == {'firstname': '4'}
+    assert sheets[1][1:] == [badges.blank_badge()] * 3
+
+def test_render_sheets(tmpdir):
+    from mako.lookup import TemplateLookup
+    tmpdir.mkdir('registration').join('badges_svg.mako').write(
+        '<svg>${ ",".join(badge["firstname"] for badge in c.data) }</svg>')
+    lookup = TemplateLookup(directories=[str(tmpdir)])
+
+    rendered = list(badges.render_sheets([{'firstname': str(n)} for n in range(5)], lookup=lookup))
+    assert rendered == [('badges/badges-0001.svg', '<svg>0,1,2,3</svg>'),
+                        ('badges/badges-0002.svg', '<svg>4,,,</svg>')]
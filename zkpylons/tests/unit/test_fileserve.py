@@ -0,0 +1,86 @@
+from webob import Request
+
+from zkpylons.lib import fileserve
+from zkpylons.lib.fileserve import FileApp
+
+def get(app, **headers):
+    # if_none_match='x' sends If-None-Match: x
+    headers = dict((name.replace('_', '-').title(), value) for (name, value) in headers.items())
+    return Request.blank('/', headers=headers).get_response(app)
+
+def test_file(tmpdir):
+    path = tmpdir.join('slides.pdf')
+    path.write('0123456789' * 10000)
+    app = FileApp(str(path))
+
+    res = get(app)
+    assert res.status_int == 200
+    assert res.content_type == 'application/pdf'
+    assert res.content_length == 100000
+    assert res.body == '0123456789' * 10000
+    etag = res.headers['ETag']
+
+    # Sent a block at a time
+    res = Request.blank('/').get_response(app)
+    assert len(list(res.app_iter)) == 100000 / fileserve.block_size + 1
+
+    assert get(app, if_none_match=etag).status_int == 304
+    assert get(app, if_none_match='"other"').status_int == 200
+    assert get(app, if_modified_since=res.headers['Last-Modified']).status_int == 304
+
+def test_range(tmpdir):
+    path = tmpdir.join('photo.jpg')
+    path.write('0123456789')
+    app = FileApp(str(path))
+    etag = get(app).headers['ETag']
+
+    res = get(app, range='bytes=2-4')
+    assert res.status_int == 206
+    assert res.headers['Content-Range'] == 'bytes 2-4/10'
+    assert res.body == '234'
+
+    assert get(app, range='bytes=7-').body == '789'
+    assert get(app, range='bytes=-3').body == '789'
+    assert get(app, range='bytes=5-100').body == '56789'
+    assert get(app, range='bytes=20-').status_int == 416
+
+    # Several ranges, or a stale If-Range, get everything
+    assert get(app, range='bytes=1-2,4-5').status_int == 200
+    assert get(app, range='bytes=2-4', if_range='"old"').status_int == 200
+    assert get(app, range='bytes=2-4', if_range=etag).status_int == 206
+
+def test_file_wrapper(tmpdir):
+    path = tmpdir.join('photo.jpg')
+    path.write('0123456789')
+
+    class Wrapper(object):
+        def __init__(self, f, block_size):
+            self.f = f
+        def __iter__(self):
+            return iter([self.f.read()])
+
+    req = Request.blank('/', environ={'wsgi.file_wrapper': Wrapper})
+    res = req.get_response(FileApp(str(path)))
+    assert isinstance(res.app_iter, Wrapper)
+    assert res.body == '0123456789'
+
+def test_sendfile_header(tmpdir):
+    path = tmpdir.join('photo.jpg')
+    path.write('0123456789')
+    app = FileApp(str(path), sendfile_header='X-Sendfile')
+
+    # Left to the front end server
+    res = get(app)
+    assert res.status_int == 200
+    assert res.headers['X-Sendfile'] == str(path)
+    assert res.body == ''
+
+    # Still answered here
+    assert get(app, if_none_match=res.headers['ETag']).status_int == 304
+    res = get(app, range='bytes=2-4')
+    assert res.status_int == 206
+    assert res.body == '234'
+    assert 'X-Sendfile' not in res.headers
+
+def test_missing(tmpdir):
+    assert get(FileApp(str(tmpdir.join('missing.jpg')))).status_int == 404
@@ -0,0 +1,51 @@
+from sqlalchemy import create_engine
+
+from zkpylons.lib import instrument
+
+def make_app(engine, repeats):
+    def app(environ, start_response):
+        environ['wsgiorg.routing_args'] = ((), {'controller': 'thing', 'action': 'view'})
+        conn = engine.connect()
+        conn.execute('select 1')
+        for i in range(repeats):
+            conn.execute('select ?', (i,))
+        conn.close()
+        instrument.add_render_time(0.5)
+        start_response('200 OK', [('Content-type', 'text/plain')])
+        return ['done']
+    return app
+
+def call(app):
+    app_iter = app({}, lambda status, headers: None)
+    body = ''.join(app_iter)
+    app_iter.close()
+    return body
+
+def test_middleware_records_actions():
+    engine = create_engine('sqlite://')
+    store = instrument.ActionStats(window=2)
+    assert call(instrument.InstrumentMiddleware(make_app(engine, 2), store)) == 'done'
+    assert call(instrument.InstrumentMiddleware(make_app(engine, 6), store)) == 'done'
+    assert call(instrument.InstrumentMiddleware(make_app(engine, 8), store)) == 'done'
+
+    # Not recording once the request is finished
+    assert instrument.current() is None
+
+    [row] = store.summary()
+    assert row['action'] == 'thing/view'
+    assert row['requests'] == 3
+    assert row['sampled'] == 2
+    assert row['statements_mean'] == 8
+    assert row['statements_max'] == 9
+    assert row['render_ms_mean'] == 500
+    assert row['repeated_requests'] == 2
+    assert row['repeated_max'] == 8
+    assert row['repeated_statement'] == 'select ?'
+
+def test_unrouted_requests_are_ignored():
+    def app(environ, start_response):
+        start_response('404 Not Found', [])
+        return []
+    store = instrument.ActionStats()
+    call(instrument.InstrumentMiddleware(app, store))
+    assert store.summary() == []
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+from pylons import config
+
+from zkpylons.lib import pdfgen
+
+XSL = '''<?xml version="1.0"?>
+<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+  <xsl:template match="/invoice">
+    <svg xmlns="http://www.w3.org/2000/svg"><text>%s <xsl:value-of select="@id"/></text></svg>
+  </xsl:template>
+</xsl:stylesheet>
+'''
+
+def test_transform_cached(tmpdir):
+    xsl = tmpdir.join('pdf.xsl')
+    xsl.write(XSL % 'Invoice')
+
+    transform = pdfgen.get_transform(str(xsl))
+    assert pdfgen.get_transform(str(xsl)) is transform
+    assert 'Invoice 42' in pdfgen.generate_svg('<invoice id="42"/>', str(xsl))
+
+    # Changing the style sheet compiles it again
+    xsl.write(XSL % 'Receipt')
+    os.utime(str(xsl), (0, 0))
+    assert pdfgen.get_transform(str(xsl)) is not transform
+    assert 'Receipt 42' in pdfgen.generate_svg('<invoice id="42"/>', str(xsl))
+
+class FakeRenderer(pdfgen.Renderer):
+    def render(self, svg):
+        return 'PDF ' + svg
+
+def test_generate_pdfs(tmpdir, monkeypatch):
+    xsl = tmpdir.join('pdf.xsl')
+    xsl.write(XSL % 'Invoice')
+    monkeypatch.setitem(pdfgen.renderers, 'fake', FakeRenderer)
+    monkeypatch.setitem(config, 'pdf_renderer', 'fake')
+
+    pdfs = pdfgen.generate_pdfs([('<invoice id="1"/>', str(xsl)), ('<invoice id="2"/>', str(xsl))])
+    assert len(pdfs) == 2
+    assert pdfs[0].startswith('PDF ') and 'Invoice 1' in pdfs[0]
+    assert 'Invoice 2' in pdfgen.generate_pdf('<invoice id="2"/>', str(xsl))
+    assert isinstance(pdfgen.get_renderer(), FakeRenderer)
+
+def test_unknown_renderer(monkeypatch):
+    monkeypatch.setitem(config, 'pdf_renderer', 'nonesuch')
+    with pytest.raises(pdfgen.RendererError):
+        pdfgen.get_renderer()
@@ -0,0 +1,110 @@
+import datetime
+import os
+
+import Image
+
+from zkpylons.lib.photocomp import PhotoCompEntry, PhotoCompIndex, ThumbnailQueue, make_scales
+
+open_date = datetime.datetime(2016, 2, 1, 9, 0, 0)
+
+def touch(db_dir, *names):
+    for name in names:
+        open(os.path.join(db_dir, name), 'w').close()
+
+def test_rebuild(tmpdir):
+    db_dir = str(tmpdir)
+    touch(db_dir,
+        '20160201-00000007-0-orig-beach.jpg',
+        '20160201-00000007-0-68x51-beach.jpg',
+        '20160202-00000007-1-orig-sunset.jpg',
+        '20160202-00000009-0-orig-dog.jpg',
+        # No original, so thrown away
+        '20160203-00000009-1-68x51-cat.jpg',
+    )
+
+    index = PhotoCompIndex(db_dir)
+    index.rebuild(open_date)
+
+    assert len(index) == 3
+    beach = index.photo(7, 0, 0)
+    assert beach.image_name == 'beach.jpg'
+    assert beach.scales == set(['orig', '68x51'])
+    assert sorted(p.key for p in index.for_person(7)) == [(7, 0, 0), (7, 1, 1)]
+    assert sorted(p.key for p in index.for_day(1)) == [(7, 1, 1), (9, 1, 0)]
+    assert index.for_day(3) == []
+    assert not os.path.exists(os.path.join(db_dir, '20160203-00000009-1-68x51-cat.jpg'))
+
+def test_add_remove(tmpdir):
+    db_dir = str(tmpdir)
+    index = PhotoCompIndex(db_dir)
+    index.refresh(open_date)
+    assert len(index) == 0
+
+    photo = PhotoCompEntry(7, 2, 1, 'beach.jpg', open_date, db_dir)
+    photo.scales.add('orig')
+    photo.add(index)
+    assert index.photo(7, 2, 1) is photo
+
+    # Another process sees the change through the index file
+    other = PhotoCompIndex(db_dir)
+    other.refresh(open_date)
+    assert [p.filename('orig') for p in other.for_day(2)] == ['20160203-00000007-1-orig-beach.jpg']
+
+    other.photo(7, 2, 1).delete(other)
+    index.refresh(open_date)
+    assert index.photo(7, 2, 1) is None
+    assert index.for_person(7) == []
+
+def test_out_of_range(tmpdir):
+    index = PhotoCompIndex(str(tmpdir))
+    index.refresh(open_date)
+    PhotoCompEntry(7, 10, 0, 'late.jpg', open_date).add(index)
+    PhotoCompEntry(7, 0, 5, 'extra.jpg', open_date).add(index)
+    assert len(index) == 0
+
+def test_make_scales(tmpdir):
+    orig = str(tmpdir.join('orig.jpg'))
+    Image.new('RGB', (3000, 2000), 'red').save(orig)
+
+    made = make_scales(orig, [('68x51', str(tmpdir.join('small.jpg'))), ('1024x768', str(tmpdir.join('large.jpg')))])
+
+    assert sorted(made) == ['1024x768', '68x51']
+    assert Image.open(str(tmpdir.join('large.jpg'))).size == (1024, 682)
+    assert Image.open(str(tmpdir.join('small.jpg'))).size == (68, 45)
+
+def test_thumbnail_queue(tmpdir):
+    db_dir = str(tmpdir)
+    index = PhotoCompIndex(db_dir)
+    index.refresh(open_date)
+    photo = PhotoCompEntry(7, 0, 0, 'beach.jpg', open_date, db_dir)
+    Image.new('RGB', (1600, 1200), 'blue').save(photo.pathname('orig'))
+    photo.scales.add('orig')
+    photo.add(index)
+
+    queue = ThumbnailQueue(processes=1)
+    queue.start()
+    assert queue.submit(photo, index)
+    assert queue.pending(photo)
+    queue.wait()
+
+    assert not queue.pending(photo)
+    assert queue.progress(photo) == (3, 3)
+    assert index.photo(7, 0, 0).scales == PhotoCompEntry.SCALES
+    assert Image.open(photo.pathname('250x250')).size == (250, 187)
+    # Nothing left to do
+    assert not queue.submit(index.photo(7, 0, 0), index)
+
+def test_thumbnail_queue_not_started(tmpdir):
+    db_dir = str(tmpdir)
+    index = PhotoCompIndex(db_dir)
+    index.refresh(open_date)
+    photo = PhotoCompEntry(7, 0, 0, 'beach.jpg', open_date, db_dir)
+    Image.new('RGB', (1600, 1200), 'blue').save(photo.pathname('orig'))
+    photo.scales.add('orig')
+    photo.add(index)
+
+    # Made straight away, without a pool
+    queue = ThumbnailQueue(processes=1)
+    assert not queue.submit(photo, index)
+    assert not queue.pending(photo)
+    assert index.photo(7, 0, 0).scales == PhotoCompEntry.SCALES